@@ -18,7 +18,7 @@ from store import MessageStore
 from rules import RuleStore
 from summaries import SummaryStore
 from jobs import JobStore
-from schedules import ScheduleStore, parse_schedule_spec
+from schedules import ScheduleRunner, ScheduleStore, cron_from_spec, parse_schedule_spec
 from router import Router
 from agents import AgentTrigger
 from registry import RuntimeRegistry
@@ -35,6 +35,7 @@ rules: RuleStore | None = None
 summaries: SummaryStore | None = None
 jobs: JobStore | None = None
 schedules: ScheduleStore | None = None
+schedule_runner: ScheduleRunner | None = None
 router: Router | None = None
 agents: AgentTrigger | None = None
 registry: RuntimeRegistry | None = None
@@ -167,8 +168,9 @@ def _resolve_authenticated_agent(request: Request) -> dict | None:
 _PUBLIC_PREFIXES = ("/", "/static/")
 
 
-def _install_security_middleware(token: str, cfg: dict):
-    """Add token validation and origin checking middleware to the app."""
+def _install_security_middleware(token: str, cfg: dict, target=None):
+    """Add token validation and origin checking middleware to the app
+    (or to target, another app sharing this module's token)."""
     import app as _self
     _self.session_token = token
     port = cfg.get("server", {}).get("port", 8300)
@@ -176,6 +178,7 @@ def _install_security_middleware(token: str, cfg: dict):
         f"http://127.0.0.1:{port}",
         f"http://localhost:{port}",
     }
+    mcp_mounted = bool(cfg.get("mcp", {}).get("mount"))
 
     class SecurityMiddleware(BaseHTTPMiddleware):
         async def dispatch(self, request: Request, call_next):
@@ -187,15 +190,21 @@ def _install_security_middleware(token: str, cfg: dict):
             if path == "/" or path.startswith(("/static/", "/uploads/", "/api/roles")):
                 return await call_next(request)
 
-            # Agent registration/heartbeat: loopback only (no remote agent minting).
-            if path.startswith(("/api/register", "/api/deregister/", "/api/heartbeat/")):
+            # Mounted MCP transports and agent registration/heartbeat: loopback
+            # only (no remote agent minting). MCP tool calls authenticate per call.
+            mcp_path = mcp_mounted and (
+                path == "/mcp" or path.startswith(("/mcp/", "/sse", "/messages/"))
+            )
+            if mcp_path or path.startswith(("/api/register", "/api/deregister/", "/api/heartbeat/", "/api/recovered/")):
                 client_ip = request.client.host if request.client else ""
                 if client_ip not in ("127.0.0.1", "::1", "localhost"):
+                    what = "MCP" if mcp_path else "agent registration"
                     return JSONResponse(
-                        {"error": f"forbidden: agent registration is restricted to local loopback. Source {client_ip} is not allowed."},
+                        {"error": f"forbidden: {what} is restricted to local loopback. Source {client_ip} is not allowed."},
                         status_code=403,
                     )
-                return await call_next(request)
+                if not mcp_path:
+                    return await call_next(request)
 
             # --- Origin check (blocks cross-origin / DNS-rebinding attacks) ---
             origin = request.headers.get("origin")
@@ -205,11 +214,20 @@ def _install_security_middleware(token: str, cfg: dict):
                     status_code=403,
                 )
 
+            if mcp_path:
+                return await call_next(request)
+
             # --- Token check ---
             # Allow registered agents to authenticate via Bearer token
-            # for /api/messages and /api/send (no browser session needed).
+            # for /api/messages, /api/send and streaming updates
+            # (no browser session needed).
             auth_header = request.headers.get("authorization", "")
-            if auth_header.lower().startswith("bearer ") and (path in ("/api/messages", "/api/send") or path.startswith("/api/rules/")):
+            bearer_path = (
+                path in ("/api/messages", "/api/send")
+                or path.startswith("/api/rules/")
+                or (path.startswith("/api/messages/") and path.endswith("/stream"))
+            )
+            if auth_header.lower().startswith("bearer ") and bearer_path:
                 bearer = auth_header[7:].strip()
                 if _self.registry and _self.registry.resolve_token(bearer):
                     return await call_next(request)
@@ -226,11 +244,11 @@ def _install_security_middleware(token: str, cfg: dict):
 
             return await call_next(request)
 
-    app.add_middleware(SecurityMiddleware)
+    (target or app).add_middleware(SecurityMiddleware)
 
 
 def configure(cfg: dict, session_token: str = ""):
-    global store, rules, summaries, jobs, schedules, router, agents, registry, session_store, session_engine, config
+    global store, rules, summaries, jobs, schedules, schedule_runner, router, agents, registry, session_store, session_engine, config
     config = cfg
     # --- Security: store the session token and install middleware ---
     _install_security_middleware(session_token, cfg)
@@ -245,6 +263,8 @@ def configure(cfg: dict, session_token: str = ""):
         log_path = legacy_log_path
 
     store = MessageStore(str(log_path))
+    # No wrapper survives a restart mid-stream; settle its placeholders
+    store.close_streams()
     # Initialize store upload dir from config
     raw_upload_dir = cfg.get("images", {}).get("upload_dir", "./uploads")
     store.upload_dir = Path(raw_upload_dir)
@@ -285,8 +305,8 @@ def configure(cfg: dict, session_token: str = ""):
         agent_names=agent_names,
         default_mention=cfg.get("routing", {}).get("default", "none"),
         max_hops=max_hops,
-        online_checker=lambda: set(registry.get_active_names()) if registry else set(),
     )
+    _sync_router_snapshot()
     agents = AgentTrigger(registry, data_dir=data_dir)
 
     # Sessions
@@ -295,7 +315,14 @@ def configure(cfg: dict, session_token: str = ""):
         str(Path(data_dir) / "session_runs.json"),
         templates_dir=str(ROOT / "session_templates"),
     )
-    session_engine = SessionEngine(session_store, store, agents, registry)
+    sess_cfg = cfg.get("sessions", {})
+    session_engine = SessionEngine(
+        session_store, store, agents, registry,
+        turn_timeout=float(sess_cfg.get("turn_timeout_seconds", 0)),
+        timeout_action=sess_cfg.get("timeout_action", "retrigger"),
+        max_retries=int(sess_cfg.get("max_retries", 1)),
+    )
+    session_engine.start()
     session_store.on_change(_on_session_change)
 
     # Bridge: when ANY message is added to store (including via MCP),
@@ -309,179 +336,66 @@ def configure(cfg: dict, session_token: str = ""):
     if "max_agent_hops" in room_settings:
         router.max_hops = room_settings["max_agent_hops"]
 
-    # Background thread: check for wrapper recovery flag files
-    _data_dir = Path(data_dir)
-
-    _known_online: set[str] = set()  # agents we've seen join — track for leave messages
     _posted_leave: set[str] = set()  # agents we've already posted a leave for — debounce
 
-    _known_active = set()
-
-    def _background_checks():
-        import time as _time
-        import mcp_bridge
-
-        while True:
-            _time.sleep(3)
-            # Recovery flags
-            try:
-                for flag in _data_dir.glob("*_recovered"):
-                    agent_name = flag.read_text("utf-8").strip()
-                    flag.unlink()
-                    store.add(
-                        "system",
-                        f"Agent routing for {agent_name} interrupted — auto-recovered. "
-                        "If agents aren't responding, try sending your message again."
-                    )
-            except Exception:
-                pass
-
-            # Pending instances (slot 2+) wait for human naming or agent claim.
-            # No auto-confirm — identity must be explicitly resolved.
+    # Presence transitions arrive as events from mcp_bridge.presence the moment
+    # they happen (no polling): post leave messages and push status on
+    # online/offline/active/idle, and deregister crashed wrappers on "lost".
+    # Deregistration only happens via /api/deregister (wrapper shutdown)
+    # OR the crash timeout. Pending instances (slot 2+) wait for human naming
+    # or agent claim — identity must be explicitly resolved.
+    import mcp_bridge
 
-            # Presence expiry — post leave messages (but do NOT deregister).
-            # Deregistration only happens via /api/deregister (wrapper shutdown)
-            # OR the 60s crash timeout below.
-            # Short timeout (10s) prevents slot theft when MCP tool calls are intermittent.
-            try:
-                now = _time.time()
-                with mcp_bridge._presence_lock:
-                    currently_online = {
-                        name for name, ts in mcp_bridge._presence.items()
-                        if now - ts < mcp_bridge.PRESENCE_TIMEOUT
-                    }
-                    currently_active = set()
-                    for name, active in mcp_bridge._activity.items():
-                        if active:
-                            if now - mcp_bridge._activity_ts.get(name, 0) < mcp_bridge.ACTIVITY_TIMEOUT:
-                                currently_active.add(name)
-                            else:
-                                mcp_bridge._activity[name] = False  # auto-expire
-
-                # Crash timeout: if a wrapper hasn't heartbeated for 60s,
-                # it's dead — deregister it to free the slot.
-                _CRASH_TIMEOUT = 15
-                registered = set(registry.get_all_names())
-                for name in registered:
-                    with mcp_bridge._presence_lock:
-                        last_seen = mcp_bridge._presence.get(name, 0)
-                    if last_seen > 0 and now - last_seen > _CRASH_TIMEOUT:
-                        log.info(f"Crash timeout: deregistering {name} (no heartbeat for {_CRASH_TIMEOUT}s)")
-                        result = registry.deregister(name)
-                        if result:
-                            mcp_bridge.purge_identity(name)
-                            registry.clean_renames_for(name)
-                            renamed = result.get("_renamed_back")
-                            if renamed:
-                                mcp_bridge.migrate_identity(renamed["old"], renamed["new"])
-                                store.rename_sender(renamed["old"], renamed["new"])
-                                if _event_loop:
-                                    rename_event = json.dumps({
-                                        "type": "agent_renamed",
-                                        "old_name": renamed["old"],
-                                        "new_name": renamed["new"],
-                                    })
-                                    asyncio.run_coroutine_threadsafe(_broadcast(rename_event), _event_loop)
-                            store.add(name, f"{name} disconnected (timeout)", msg_type="leave", channel=_last_active_channel)
-                            _posted_leave.add(name)
-
-                # Re-fetch registered names (may have changed from crash timeout above)
-                registered = set(registry.get_all_names())
-
-                # Detect registered instances going offline (leave message only)
-                timed_out = registered - currently_online
-                for name in timed_out:
-                    inst = registry.get_instance(name)
-                    if not inst:
-                        continue
-                    # Skip names that were just renamed (not actually offline)
-                    with mcp_bridge._presence_lock:
-                        was_renamed = name in mcp_bridge._renamed_from
-                        if was_renamed:
-                            mcp_bridge._renamed_from.discard(name)
-                    if was_renamed:
-                        continue
-                    # Post leave message ONCE per offline transition (debounced)
-                    if name not in _posted_leave:
-                        _posted_leave.add(name)
-                        store.add(name, f"{name} disconnected", msg_type="leave", channel=_last_active_channel)
-
-                # Clear leave debounce for agents that came back online
-                _posted_leave -= currently_online
-
-                # Detect other agents (non-registered) going offline
-                went_offline = (_known_online - currently_online) - timed_out
-                for name in went_offline:
-                    # Skip leave messages for names that were just renamed
-                    with mcp_bridge._presence_lock:
-                        was_renamed = name in mcp_bridge._renamed_from
-                        if was_renamed:
-                            mcp_bridge._renamed_from.discard(name)
-                    if was_renamed:
-                        continue
-                    if not registry.is_registered(name) and name not in _posted_leave:
-                        _posted_leave.add(name)
-                        store.add(name, f"{name} disconnected", msg_type="leave", channel=_last_active_channel)
-
-                if _known_online != currently_online and _event_loop:
-                    asyncio.run_coroutine_threadsafe(broadcast_status(), _event_loop)
-
-                # Clear stale activity for agents that went offline
-                with mcp_bridge._presence_lock:
-                    stale_active = [n for n in mcp_bridge._activity
-                                    if mcp_bridge._activity.get(n) and n not in currently_online]
-                    for n in stale_active:
-                        mcp_bridge._activity[n] = False
-                    if stale_active:
-                        currently_active -= set(stale_active)
-
-                # Broadcast status on any change (online set or activity set)
-                if currently_active != _known_active or _known_online != currently_online:
-                    _known_active.clear()
-                    _known_active.update(currently_active)
-                    if _event_loop:
-                        asyncio.run_coroutine_threadsafe(broadcast_status(), _event_loop)
-                _known_online.clear()
-                _known_online.update(currently_online)
-            except Exception:
-                pass
+    def _on_agent_lost(name: str):
+        # Crash timeout: a registered wrapper that hasn't heartbeated for
+        # CRASH_TIMEOUT is dead — deregister it to free the slot.
+        if not registry.is_registered(name):
+            return
+        log.info(f"Crash timeout: deregistering {name} (no heartbeat for {mcp_bridge.CRASH_TIMEOUT}s)")
+        result = registry.deregister(name)
+        if not result:
+            return
+        _posted_leave.add(name)  # the timeout notice below replaces the plain leave
+        _close_orphaned_streams(name)
+        mcp_bridge.purge_identity(name)
+        registry.clean_renames_for(name)
+        renamed = result.get("_renamed_back")
+        if renamed:
+            mcp_bridge.migrate_identity(renamed["old"], renamed["new"])
+            store.rename_sender(renamed["old"], renamed["new"])
+            if _event_loop:
+                rename_event = json.dumps({
+                    "type": "agent_renamed",
+                    "old_name": renamed["old"],
+                    "new_name": renamed["new"],
+                })
+                asyncio.run_coroutine_threadsafe(_broadcast(rename_event), _event_loop)
+        store.add(name, f"{name} disconnected (timeout)", msg_type="leave", channel=_last_active_channel)
 
-    threading.Thread(target=_background_checks, daemon=True).start()
+    def _on_presence_change(event: str, name: str):
+        if event == "lost":
+            _on_agent_lost(name)
+            return
+        if event == "online":
+            _posted_leave.discard(name)
+        elif event == "offline" and name not in _posted_leave:
+            # Post leave message ONCE per offline transition (debounced).
+            # Renames fire "renamed" instead, so no leave for the old name.
+            _posted_leave.add(name)
+            store.add(name, f"{name} disconnected", msg_type="leave", channel=_last_active_channel)
+        if _event_loop:
+            asyncio.run_coroutine_threadsafe(broadcast_status(), _event_loop)
 
-    # --- Schedule runner: fires due scheduled prompts every 30s ---
-    def _schedule_runner():
-        import time as _time
-        while True:
-            _time.sleep(30)
-            try:
-                if not schedules:
-                    continue
-                due = schedules.run_due()
-                for s in due:
-                    prompt = s.get("prompt", "")
-                    targets = s.get("targets", [])
-                    channel = s.get("channel", "general")
-                    if not prompt or not targets:
-                        schedules.mark_run(s["id"])
-                        continue
-                    sender = s.get("created_by", "user")
-                    mention_str = " ".join(f"@{t}" for t in targets)
-                    full_text = f"{mention_str} {prompt}" if mention_str else prompt
-                    # store.add triggers _handle_new_message via callback,
-                    # which routes @mentions to agents — no manual trigger needed.
-                    store.add(
-                        sender,
-                        full_text,
-                        channel=channel,
-                    )
-                    if s.get("one_shot"):
-                        schedules.delete(s["id"])
-                    else:
-                        schedules.mark_run(s["id"])
-            except Exception:
-                log.exception("schedule runner error")
+    mcp_bridge.presence.on_change(_on_presence_change)
 
-    threading.Thread(target=_schedule_runner, daemon=True).start()
+    # --- Schedule runner: fires each scheduled prompt when it falls due ---
+    sched_cfg = cfg.get("schedules", {})
+    schedule_runner = ScheduleRunner(
+        schedules, _fire_schedule,
+        misfire_policy=sched_cfg.get("misfire_policy", "fire_once"),
+        misfire_grace=float(sched_cfg.get("misfire_grace_seconds", 60)),
+    )
+    schedule_runner.start()
 
 
 # --- Store → WebSocket bridge ---
@@ -490,6 +404,16 @@ _event_loop = None  # set by run.py after starting the event loop
 _last_active_channel: str = "general"  # last channel any message was sent in
 
 
+def _close_orphaned_streams(sender: str):
+    """Settle streaming placeholders left by a wrapper that went away
+    mid-reply. Finished ones are broadcast and routed by the on_message
+    callback; deleted (empty) ones are broadcast here."""
+    _, deleted = store.close_streams(sender)
+    if deleted and _event_loop:
+        asyncio.run_coroutine_threadsafe(
+            _broadcast(json.dumps({"type": "delete", "ids": deleted})), _event_loop)
+
+
 def set_event_loop(loop):
     global _event_loop
     _event_loop = loop
@@ -539,6 +463,19 @@ def _on_job_change(action: str, data: dict):
     asyncio.run_coroutine_threadsafe(broadcast_job(action, data), _event_loop)
 
 
+def _fire_schedule(s: dict):
+    """Post a scheduled prompt as a chat message from its creator."""
+    prompt = s.get("prompt", "")
+    targets = s.get("targets", [])
+    if not prompt or not targets:
+        return
+    mention_str = " ".join(f"@{t}" for t in targets)
+    full_text = f"{mention_str} {prompt}" if mention_str else prompt
+    # store.add triggers _handle_new_message via callback,
+    # which routes @mentions to agents — no manual trigger needed.
+    store.add(s.get("created_by", "user"), full_text, channel=s.get("channel", "general"))
+
+
 def _on_schedule_change(action: str, schedule: dict):
     """Called from any thread when a schedule changes."""
     if _event_loop is None:
@@ -650,16 +587,15 @@ async def _handle_new_message(msg: dict):
     global _last_active_channel
     if msg_type not in ("system", "leave", "join"):
         _last_active_channel = channel
-    # Strip @mentions to find the slash command (e.g. "@claude @codex /hatmaking")
-    stripped = _re.sub(r"@[\w-]+\s*", "", text).strip().lower()
+    # One scan: mentions, the slash command sans @mentions (e.g.
+    # "@claude @codex /hatmaking") and any session draft block
+    info = router.classify(text)
+    stripped = info.stripped
     _broadcast_cmds = ("/hatmaking", "/artchallenge", "/roastreview", "/poetry")
-    cmd_word = stripped.split()[0] if stripped else ""
-    is_broadcast_cmd = cmd_word in _broadcast_cmds
+    is_broadcast_cmd = info.command in _broadcast_cmds
     known_agents = set(registry.get_all_names()) if registry else set()
     known_agents.update(config.get("agents", {}).keys())
-    _session_draft_re = _re.compile(r'```session\s*\n(.*?)\n```', _re.DOTALL)
-    draft_match = _session_draft_re.search(text)
-    is_agent_session_draft = bool(draft_match and sender in known_agents)
+    is_agent_session_draft = bool(info.session_draft is not None and sender in known_agents)
     is_hidden_session_request = msg_type == "session_request"
 
     is_agent_continue = (stripped == "/continue" and sender in known_agents)
@@ -670,13 +606,26 @@ async def _handle_new_message(msg: dict):
         or is_agent_continue
     )
 
-    if not suppress_broadcast:
+    # A finished streaming reply is already on screen as its placeholder
+    streamed = bool((msg.get("metadata") or {}).get("streamed"))
+    if streamed and not suppress_broadcast:
+        await _broadcast(json.dumps({"type": "edit", "message": msg}))
+    elif not suppress_broadcast:
         await broadcast(msg)
 
+    # Streaming drafts are placeholders: they are routed once finished in
+    # place (see api_stream_update), arriving here again with "streamed".
+    if (msg.get("metadata") or {}).get("streaming"):
+        await broadcast_typing(sender, True)
+        return
+
     # If the raw slash command was persisted (MCP path), silently remove it.
-    # It was never broadcast to WebSocket clients, so no delete event needed.
+    # It was never broadcast to WebSocket clients, so no delete event needed
+    # unless it was shown while streaming.
     if suppress_broadcast and msg.get("id"):
-        store.delete([msg["id"]])
+        deleted = store.delete([msg["id"]])
+        if streamed and deleted:
+            await _broadcast(json.dumps({"type": "delete", "ids": deleted}))
 
     # System messages never trigger routing - prevents infinite callback loops
     if sender == "system":
@@ -752,16 +701,12 @@ async def _handle_new_message(msg: dict):
     # The session request prompt contains an example ```session block,
     # so treating every non-system sender as a draft source creates a false
     # invalid-draft card the moment the user asks for a custom session.
-    _session_draft_re = _re.compile(r'```session\s*\n(.*?)\n```', _re.DOTALL)
-    draft_match = _session_draft_re.search(text)
-    known_agents = set(registry.get_all_names()) if registry else set()
-    known_agents.update(config.get("agents", {}).keys())
-    if draft_match and sender in known_agents:
+    if is_agent_session_draft:
         # Check if this is a revision of an existing draft
         draft_id, revision = _resolve_draft_lineage(text, channel)
 
         try:
-            draft_json = json.loads(draft_match.group(1))
+            draft_json = json.loads(info.session_draft)
             errors = validate_session_template(draft_json)
             if errors:
                 store.add(
@@ -792,27 +737,30 @@ async def _handle_new_message(msg: dict):
                            "errors": ["Invalid JSON in session block"], "valid": False},
             )
 
-    raw_targets = router.get_targets(sender, text, channel)
+    route = router.route(sender, text, channel, msg_id=msg.get("id"),
+                         reply_to=msg.get("reply_to"), mentions=info.mentions)
     # Resolve base family names to actual registered instances
     # e.g. 'claude' → 'claude-prime' when slot-1 was renamed
     targets = []
-    for t in raw_targets:
+    for t in route.targets:
         if registry:
             targets.extend(registry.resolve_to_instances(t))
         else:
             targets.append(t)
     targets = list(dict.fromkeys(targets))  # dedupe, preserve order
+    router.bind(channel, targets, route.thread)
 
-    if router.is_paused(channel):
-        # Only emit the loop guard notice once per pause
-        if not router.is_guard_emitted(channel):
-            router.set_guard_emitted(channel)
+    if route.paused:
+        # Only the runaway thread is paused; emit its notice once per pause
+        if not router.is_guard_emitted(channel, route.thread):
+            router.set_guard_emitted(channel, route.thread)
             store.add(
                 "system",
-                f"Loop guard: {router.max_hops} agent-to-agent hops reached. "
+                f"Loop guard: {router.max_hops} agent-to-agent hops reached in this thread. "
                 "Type /continue to resume.",
                 channel=channel
             )
+            await broadcast_status()
         return
 
     # Build a readable message string for the wake prompt
@@ -820,10 +768,11 @@ async def _handle_new_message(msg: dict):
     custom_prompt = text if is_hidden_session_request else ""
 
     # Session turn guard: if a session is active on this channel and the sender
-    # is an agent, only allow triggering the agent whose turn it is.
-    # Human @mentions are always allowed (the session engine handles pausing).
+    # is an agent, only allow triggering the agents whose turn it is (several
+    # in a parallel phase). Human @mentions are always allowed (the session
+    # engine handles pausing).
     sender_is_agent = sender in known_agents
-    allowed_agent = session_engine.get_allowed_agent(channel) if session_engine and sender_is_agent else None
+    allowed_agents = session_engine.get_allowed_agents(channel) if session_engine and sender_is_agent else None
 
     import mcp_bridge
     for target in targets:
@@ -833,7 +782,7 @@ async def _handle_new_message(msg: dict):
             if inst and inst.get("state") == "pending":
                 continue
         # Session guard: suppress out-of-turn agent triggers
-        if allowed_agent and target != allowed_agent:
+        if allowed_agents and target not in allowed_agents:
             continue
         if not mcp_bridge.is_online(target):
             store.add("system", f"{target} appears offline — message queued.", msg_type="system", channel=channel)
@@ -993,15 +942,19 @@ async def broadcast_agents():
     ws_clients.difference_update(dead)
 
 
+def _sync_router_snapshot():
+    """Push registry names and the online set to the router as one versioned snapshot."""
+    if router and registry:
+        version, base_names, instance_names = registry.get_routing_names()
+        # Only include active instances in routing (pending ones are inert);
+        # active instances are also the online set @all expands to
+        router.update_snapshot(list(set(base_names + instance_names)),
+                               online=instance_names, version=version)
+
+
 def _on_registry_change():
     """Called from registry (any thread) when instances register/deregister/claim/rename."""
-    # Update router with current agent names (base names + registered instances)
-    if router and registry:
-        base_names = list(registry.get_bases().keys())
-        # Only include active instances in routing (pending ones are inert)
-        instance_names = registry.get_active_names()
-        all_names = list(set(base_names + instance_names))
-        router.update_agents(all_names)
+    _sync_router_snapshot()
     # Broadcast to WebSocket clients
     if _event_loop:
         asyncio.run_coroutine_threadsafe(broadcast_agents(), _event_loop)
@@ -1104,7 +1057,7 @@ async def websocket_endpoint(websocket: WebSocket):
                         await broadcast_clear(channel=channel)
                         continue
                     if cmd == "/continue":
-                        router.continue_routing()
+                        router.continue_routing(channel)
                         store.add("system", "Resuming agent conversation...", msg_type="system", channel=channel)
                         await broadcast_status()
                         continue
@@ -1501,9 +1454,11 @@ async def import_history(file: UploadFile = File(...)):
 @app.get("/api/messages")
 async def get_messages(since_id: int = 0, limit: int = 50, channel: str = ""):
     ch = channel if channel else None
+    # Read the epoch first: a delete racing this read then shows up next time
+    headers = {"X-Message-Epoch": str(store.epoch())}
     if since_id:
-        return store.get_since(since_id, channel=ch)
-    return store.get_recent(limit, channel=ch)
+        return JSONResponse(store.get_since(since_id, channel=ch), headers=headers)
+    return JSONResponse(store.get_recent(limit, channel=ch), headers=headers)
 
 
 @app.post("/api/send")
@@ -1524,14 +1479,66 @@ async def api_send(request: Request):
     sender = inst["name"]
     body = await request.json()
     text = body.get("text", "").strip()
-    if not text:
+    streaming = bool(body.get("streaming"))
+    if not text and not streaming:
         return JSONResponse({"error": "text is required"}, status_code=400)
     channel = body.get("channel", "general")
 
-    msg = store.add(sender, text, channel=channel)
+    if streaming:
+        # Placeholder for a reply that's still generating — filled in via
+        # POST /api/messages/{id}/stream and routed only once finished.
+        msg = store.add(sender, text, channel=channel, metadata={"streaming": True})
+    else:
+        msg = store.add(sender, text, channel=channel)
     return JSONResponse(msg)
 
 
+@app.post("/api/messages/{msg_id}/stream")
+async def api_stream_update(msg_id: int, request: Request):
+    """Update a streaming placeholder posted via /api/send.
+
+    Body: {"text": full text so far, "done": bool}. Partial updates are kept
+    in memory and broadcast as edits. On done the placeholder keeps its id
+    and is finished in place (store.finish_stream), which routes it like a
+    new message; an empty reply is deleted instead.
+    """
+    auth = request.headers.get("authorization", "")
+    if not auth.lower().startswith("bearer "):
+        return JSONResponse({"error": "missing Authorization: Bearer <token>"}, status_code=401)
+    inst = registry.resolve_token(auth[7:].strip()) if registry else None
+    if not inst:
+        return JSONResponse({"error": "invalid or expired token"}, status_code=403)
+
+    msg = store.get_by_id(msg_id)
+    if not msg or not (msg.get("metadata") or {}).get("streaming"):
+        return JSONResponse({"error": "streaming message not found"}, status_code=404)
+    sender = inst["name"]
+    if msg.get("sender") != sender:
+        return JSONResponse({"error": "not your message"}, status_code=403)
+
+    body = await request.json()
+    text = str(body.get("text", ""))
+
+    if not body.get("done"):
+        updated = store.update_message(msg_id, {"text": text}, persist=False)
+        if updated:
+            await _broadcast(json.dumps({"type": "edit", "message": updated}))
+        return JSONResponse({"ok": True})
+
+    await broadcast_typing(sender, False)
+    text = text.strip()
+    if not text:
+        deleted = store.delete([msg_id])
+        if deleted:
+            await _broadcast(json.dumps({"type": "delete", "ids": deleted}))
+        return JSONResponse({"ok": True})
+    # The on_message callback broadcasts the final text as an edit and routes it
+    final = store.finish_stream(msg_id, text)
+    if not final:
+        return JSONResponse({"error": "streaming message not found"}, status_code=404)
+    return JSONResponse(final)
+
+
 @app.get("/api/status")
 async def get_status():
     status = agents.get_status()
@@ -1539,6 +1546,17 @@ async def get_status():
     return status
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Operational counters (MCP rate limiting, per-channel routing hops/pauses)."""
+    import mcp_bridge
+    limiter = mcp_bridge.rate_limiter
+    return {
+        "rate_limits": limiter.stats() if limiter else None,
+        "routing": router.stats() if router else None,
+    }
+
+
 @app.get("/api/settings")
 async def get_settings():
     return room_settings
@@ -1570,9 +1588,17 @@ async def create_schedule(request: Request):
     created_by = body.get("created_by", "user")
     if not prompt or not targets or not spec:
         return JSONResponse({"error": "prompt, targets, and spec are required"}, status_code=400)
-    interval_sec, daily_at = parse_schedule_spec(spec)
-    if interval_sec is None:
-        return JSONResponse({"error": f"Invalid schedule spec: {spec}"}, status_code=400)
+    try:
+        cron = cron_from_spec(spec)
+        jitter = int(body.get("jitter_seconds") or 0)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if cron:
+        interval_sec, daily_at = None, None
+    else:
+        interval_sec, daily_at = parse_schedule_spec(spec)
+        if interval_sec is None:
+            return JSONResponse({"error": f"Invalid schedule spec: {spec}"}, status_code=400)
     # For one-shot, compute exact send_at timestamp from date + daily_at time
     send_at = None
     if one_shot and daily_at and send_at_date:
@@ -1582,12 +1608,15 @@ async def create_schedule(request: Request):
             send_at = dt.timestamp()
         except ValueError:
             pass
-    s = schedules.create(
-        prompt=prompt, targets=targets, channel=channel,
-        interval_seconds=interval_sec, daily_at=daily_at,
-        one_shot=one_shot, send_at=send_at,
-        created_by=created_by,
-    )
+    try:
+        s = schedules.create(
+            prompt=prompt, targets=targets, channel=channel,
+            interval_seconds=interval_sec, daily_at=daily_at,
+            one_shot=one_shot, send_at=send_at,
+            created_by=created_by, cron=cron, jitter_seconds=jitter,
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
     return JSONResponse(s)
 
 
@@ -1908,9 +1937,13 @@ async def reorder_jobs(request: Request):
 
 
 @app.get("/api/jobs/{job_id}/messages")
-async def get_job_messages(job_id: int):
-    """Get all messages in a job."""
-    msgs = jobs.get_messages(job_id)
+async def get_job_messages(job_id: int, since_id: int | None = None, limit: int = 0):
+    """Get messages in a job, oldest first.
+
+    ?since_id=N returns only messages after id N; ?limit=K caps the page
+    (page forward by passing the last id as since_id).
+    """
+    msgs = jobs.get_messages(job_id, since_id=since_id, limit=max(0, limit))
     if msgs is None:
         return JSONResponse({"error": "not found"}, status_code=404)
     return msgs
@@ -1935,14 +1968,15 @@ async def post_job_message(job_id: int, request: Request):
     job = jobs.get(job_id)
     if job:
         channel = job.get("channel", "general")
-        raw_targets = router.get_targets(sender, text, channel)
+        route = router.route(sender, text, channel, thread=f"job:{job_id}")
         targets = []
-        for t in raw_targets:
+        for t in route.targets:
             if registry:
                 targets.extend(registry.resolve_to_instances(t))
             else:
                 targets.append(t)
         targets = list(dict.fromkeys(targets))
+        router.bind(channel, targets, route.thread)
 
         import mcp_bridge
         chat_msg = f"{sender}: {text}" if text else ""
@@ -1975,12 +2009,9 @@ async def resolve_job_message(job_id: int, msg_index: int, request: Request):
     job = jobs.get(job_id)
     if not job:
         return JSONResponse({"error": "not found"}, status_code=404)
-    msgs = job.get("messages", [])
-    if msg_index < 0 or msg_index >= len(msgs):
+    msg = jobs.resolve_message(job_id, msg_index, resolution)
+    if msg is None:
         return JSONResponse({"error": "invalid message index"}, status_code=400)
-    msg = msgs[msg_index]
-    msg["resolved"] = resolution
-    jobs._save()
 
     # If accepted, trigger the suggesting agent with context
     if resolution == "accepted" and msg.get("sender"):
@@ -2000,6 +2031,10 @@ async def delete_job(job_id: int, request: Request):
     permanent = request.query_params.get("permanent", "").lower() == "true"
     if permanent:
         result = jobs.delete(job_id)
+        if result is not None:
+            # Job ids can be reused after a restart; don't hide the new thread
+            import mcp_bridge
+            mcp_bridge.migrate_cursors_delete(f"job:{job_id}")
     else:
         result = jobs.update_status(job_id, "archived")
     if result is None:
@@ -2093,8 +2128,7 @@ async def register_agent(request: Request):
         return JSONResponse({"error": f"unknown base: {base}"}, status_code=400)
     # Touch presence so the instance doesn't immediately time out
     import mcp_bridge
-    with mcp_bridge._presence_lock:
-        mcp_bridge._presence[result["name"]] = __import__("time").time()
+    mcp_bridge.presence.touch(result["name"])
     # If slot 1 was renamed (e.g. "claude" → "claude-1"), migrate state
     renamed = result.pop("_renamed_slot1", None)
     if renamed:
@@ -2137,6 +2171,7 @@ async def deregister_agent(name: str, request: Request):
         return JSONResponse({"error": "not found"}, status_code=404)
     # Clean up runtime state (presence, activity, cursors, rename chains)
     import mcp_bridge
+    _close_orphaned_streams(name)
     mcp_bridge.purge_identity(name)
     registry.clean_renames_for(name)
     # If the remaining instance was renamed back (e.g. "claude-1" → "claude"), migrate state
@@ -2206,22 +2241,15 @@ async def heartbeat(agent_name: str, request: Request):
         return JSONResponse({"error": "authenticated agent session required"}, status_code=403)
 
     current_name = auth_inst["name"] if auth_inst else agent_name
-    with mcp_bridge._presence_lock:
-        mcp_bridge._presence[current_name] = __import__("time").time()
-    # Optional activity report from wrapper's terminal monitor
-    _activity_changed = False
+    mcp_bridge.presence.touch(current_name)
+    # Optional activity report from wrapper's terminal monitor. Active/idle
+    # transitions broadcast status via the presence tracker's callbacks.
     try:
         body = await request.json()
         if "active" in body:
-            active_val = bool(body["active"])
-            was_active = mcp_bridge._activity.get(current_name, False)
-            mcp_bridge.set_active(current_name, active_val)
-            _activity_changed = was_active != active_val
+            mcp_bridge.set_active(current_name, bool(body["active"]))
     except Exception:
         pass  # No body = plain heartbeat
-    # Immediately broadcast on activity state change (don't wait for background checker)
-    if _activity_changed:
-        await broadcast_status()
     # Return canonical name so wrapper can track renames
     resp = {"ok": True, "name": current_name}
     if registry:
@@ -2242,12 +2270,29 @@ async def heartbeat(agent_name: str, request: Request):
             resp["pending"] = inst.get("state") == "pending"
             # Also update presence under the canonical name
             if canonical != current_name:
-                now = __import__("time").time()
-                with mcp_bridge._presence_lock:
-                    mcp_bridge._presence[canonical] = now
+                mcp_bridge.presence.touch(canonical)
     return resp
 
 
+@app.post("/api/recovered/{agent_name}")
+async def agent_recovered(agent_name: str, request: Request):
+    """Wrapper calls this after re-registering or restarting its queue watcher."""
+    auth_inst = _resolve_authenticated_agent(request)
+    presented_token = _extract_agent_token(request)
+    if presented_token and not auth_inst:
+        return JSONResponse({"error": "stale_session"}, status_code=409)
+    if registry and registry.is_agent_family(agent_name) and not auth_inst:
+        return JSONResponse({"error": "authenticated agent session required"}, status_code=403)
+
+    name = auth_inst["name"] if auth_inst else agent_name
+    store.add(
+        "system",
+        f"Agent routing for {name} interrupted — auto-recovered. "
+        "If agents aren't responding, try sending your message again."
+    )
+    return JSONResponse({"ok": True})
+
+
 # --- Open agent session in terminal ---
 
 @app.get("/api/platform")
@@ -2431,7 +2476,9 @@ async def request_session_draft(request: Request):
         "```\n"
         "Rules: max 6 roles, max 6 phases, max 4 participants per phase, max 200 chars per prompt. "
         "Mark exactly one phase as `is_output: true` (the final deliverable). "
-        f"Keep it focused and sequential. Use the chat_send tool to post your response in the #{channel} channel. "
+        'Phases run one participant at a time; add `"turn_order": "parallel"` to a phase whose '
+        "participants answer independently (optional `quorum` and `timeout` seconds). "
+        f"Keep it focused. Use the chat_send tool to post your response in the #{channel} channel. "
         "Do NOT respond only in your terminal.",
         channel=channel,
         msg_type="session_request",
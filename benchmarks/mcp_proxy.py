@@ -0,0 +1,150 @@
+"""Benchmark: MCP identity proxy, asyncio/pooled vs threaded/urllib.
+
+Starts a stub upstream MCP endpoint (uvicorn) that answers every POST /mcp
+with a JSON-RPC result of --payload bytes, puts each proxy in front of it
+(each in its own process, as in a real wrapper), and measures:
+
+  latency     — sequential tools/call round-trips through the proxy
+  throughput  — --clients concurrent keep-alive clients, mixed tools/call
+                and notification bodies (the zero-parse fast path)
+
+Usage:  python benchmarks/mcp_proxy.py [--requests 500] [--clients 8] [--payload 4000]
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from mcp_proxy import McpIdentityProxy, ThreadedMcpIdentityProxy  # noqa: E402
+
+TOOL_CALL = json.dumps({
+    "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+    "params": {"name": "chat_read", "arguments": {"sender": "bench", "channel": "general"}},
+}).encode()
+NOTIFICATION = json.dumps({"jsonrpc": "2.0", "method": "notifications/initialized"}).encode()
+
+
+def _start_upstream(payload: int):
+    body = json.dumps({
+        "jsonrpc": "2.0", "id": 1,
+        "result": {"content": [{"type": "text", "text": "x" * payload}]},
+    }).encode()
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        more = True
+        while more:
+            more = (await receive()).get("more_body", False)
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(256)
+    server = uvicorn.Server(uvicorn.Config(app, log_level="error", lifespan="off"))
+    print(sock.getsockname()[1], flush=True)
+    asyncio.run(server.serve(sockets=[sock]))
+
+
+def _serve_proxy(kind: str, upstream: str):
+    cls = McpIdentityProxy if kind == "async" else ThreadedMcpIdentityProxy
+    proxy = cls(upstream, "/mcp", "bench", "token")
+    proxy.start()
+    print(proxy.port, flush=True)
+    threading.Event().wait()
+
+
+def _spawn(*args) -> tuple[subprocess.Popen, int]:
+    """Run this script in a child process in a serve mode; returns (proc, port)."""
+    proc = subprocess.Popen([sys.executable, __file__, *args], stdout=subprocess.PIPE, text=True)
+    for line in proc.stdout:
+        if line.strip().isdigit():
+            return proc, int(line)
+    raise RuntimeError(f"child {args} exited without a port")
+
+
+def _client() -> httpx.Client:
+    # Agent CLIs (Node) set TCP_NODELAY; match them so Nagle doesn't skew results
+    return httpx.Client(transport=httpx.HTTPTransport(
+        socket_options=[(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]))
+
+
+def _post(client: httpx.Client, url: str, body: bytes) -> float:
+    start = time.perf_counter()
+    resp = client.post(url, content=body, headers={
+        "content-type": "application/json", "accept": "application/json, text/event-stream",
+    })
+    resp.read()
+    assert resp.status_code == 200, resp.status_code
+    return time.perf_counter() - start
+
+
+def _bench(label: str, port: int, requests: int, clients: int):
+    url = f"http://127.0.0.1:{port}/mcp"
+    with _client() as client:
+        for _ in range(20):
+            _post(client, url, TOOL_CALL)  # warm up
+        samples = sorted(_post(client, url, TOOL_CALL) * 1000 for _ in range(requests))
+
+    def worker(n):
+        with _client() as client:
+            for i in range(n):
+                _post(client, url, TOOL_CALL if i % 2 else NOTIFICATION)
+
+    per_client = max(1, requests // clients)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(worker, [per_client] * clients))
+    elapsed = time.perf_counter() - start
+
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"  {label:<9} latency median {statistics.median(samples):6.2f} ms  p95 {p95:6.2f} ms   "
+          f"throughput {per_client * clients / elapsed:7.0f} req/s ({clients} clients)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--payload", type=int, default=4000, help="upstream response text size (bytes)")
+    parser.add_argument("--serve-upstream", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--serve-proxy", nargs=2, metavar=("KIND", "UPSTREAM"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve_upstream:
+        return _start_upstream(args.payload)
+    if args.serve_proxy:
+        return _serve_proxy(*args.serve_proxy)
+
+    upstream_proc, upstream_port = _spawn("--serve-upstream", "--payload", str(args.payload))
+    upstream = f"http://127.0.0.1:{upstream_port}"
+    print(f"{args.requests} requests, {args.payload}-byte responses")
+    try:
+        for label in ("threaded", "async"):
+            proc, port = _spawn("--serve-proxy", label, upstream)
+            try:
+                _bench(label, port, args.requests, args.clients)
+            finally:
+                proc.kill()
+    finally:
+        upstream_proc.kill()
+
+
+if __name__ == "__main__":
+    main()
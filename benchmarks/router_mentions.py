@@ -0,0 +1,126 @@
+"""Benchmark: per-message routing classification with many agents.
+
+Classifies a mix of chat messages against N agent names with two strategies:
+
+  legacy    — regex alternation over every name, a separate re.sub to strip
+              @handles for the slash command, the session-draft regex
+              compiled twice per message, and an online_checker call (which
+              takes the registry lock) on every @all
+  classify  — Router.classify: one trie scan over a pushed, versioned
+              snapshot; @all expands from the precomputed online tuple
+
+Also times a snapshot push (what each registry change costs).
+
+Usage:  python benchmarks/router_mentions.py [--agents 100] [--messages 2000] [--length 4000]
+"""
+
+import argparse
+import random
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from router import Router  # noqa: E402
+
+
+class LegacyClassifier:
+    """The pre-trie routing path, kept here for comparison."""
+
+    def __init__(self, names, online):
+        self.agent_names = set(names)
+        self._lock = threading.Lock()
+        self._online = list(online)
+        alts = "|".join([re.escape(n) for n in sorted(self.agent_names, key=len, reverse=True)]
+                        + ["both", "all"])
+        self._mention_re = re.compile(rf"@({alts})(?![\w-])", re.IGNORECASE)
+
+    def _online_checker(self):
+        with self._lock:
+            return set(self._online)
+
+    def classify(self, text):
+        mentions = set()
+        for match in self._mention_re.finditer(text):
+            name = match.group(1).lower()
+            if name in ("both", "all"):
+                online = self._online_checker()
+                mentions.update(n for n in self.agent_names if n in online)
+            else:
+                mentions.add(name)
+        stripped = re.sub(r"@[\w-]+\s*", "", text).strip().lower()
+        cmd = stripped.split()[0] if stripped else ""
+        draft = None
+        for _ in range(2):
+            draft = re.compile(r'```session\s*\n(.*?)\n```', re.DOTALL).search(text)
+        return list(mentions), cmd, draft
+
+
+def _messages(names, count, length, rng):
+    words = ("the", "build", "is", "green", "please", "review", "this", "diff", "ok", "ship")
+    out = []
+    for i in range(count):
+        parts = []
+        while sum(len(p) + 1 for p in parts) < length:
+            r = rng.random()
+            if r < 0.01:
+                parts.append("@" + rng.choice(names))
+            elif r < 0.012:
+                parts.append("@all")
+            elif r < 0.015:
+                parts.append("user@example.com")
+            else:
+                parts.append(rng.choice(words))
+        if i % 10 == 0:
+            parts.insert(0, "/poetry")
+        out.append(" ".join(parts))
+    return out
+
+
+def _time(label, fn, msgs, baseline=None):
+    start = time.perf_counter()
+    for m in msgs:
+        fn(m)
+    elapsed = time.perf_counter() - start
+    per = elapsed / len(msgs) * 1e6
+    speedup = f"  ({baseline / per:4.1f}x)" if baseline else ""
+    print(f"  {label:<9} {per:8.1f} us/message{speedup}")
+    return per
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--agents", type=int, default=100)
+    ap.add_argument("--messages", type=int, default=2000)
+    ap.add_argument("--length", type=int, default=4000, help="approximate characters per message")
+    args = ap.parse_args()
+
+    rng = random.Random(7)
+    names = [f"{rng.choice(['claude', 'codex', 'gemini', 'qwen'])}-{i}" for i in range(args.agents)]
+    online = names[::2]
+    msgs = _messages(names, args.messages, args.length, rng)
+
+    legacy = LegacyClassifier(names, online)
+    router = Router(names, default_mention="none")
+    router.update_online(online)
+
+    for m in msgs[:50]:  # same answers before timing anything
+        assert sorted(legacy.classify(m)[0]) == sorted(router.classify(m).mentions), m
+
+    print(f"{args.agents} agents, {args.messages} messages of ~{args.length} chars")
+    base = _time("legacy", legacy.classify, msgs)
+    _time("classify", router.classify, msgs, base)
+
+    start = time.perf_counter()
+    pushes = 200
+    for v in range(pushes):
+        router.update_snapshot(names + [f"extra-{v}"], online=online)
+    print(f"  snapshot push with new names: {(time.perf_counter() - start) / pushes * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark: CPU cost of tmux activity detection with many agents.
+
+Starts N throwaway tmux sessions that print a line every 200 ms (a busy agent
+TUI), then runs each detection strategy at the wrapper's 1 s cadence:
+
+  poll     — legacy capture-pane + hash, one fork per agent per second
+  control  — one `tmux -C` client per agent reading %output events
+
+CPU is reported for this process, its children (tmux clients), and the tmux
+server. Also measures idle->active detection latency for control mode.
+
+Usage:  python benchmarks/tmux_activity.py [--agents 10] [--seconds 20]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from wrapper_unix import ActivityMonitor, _capture_pane_checker, _ready_client  # noqa: E402
+
+PREFIX = "acbench"
+TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _server_pid():
+    out = subprocess.run(
+        ["tmux", "display-message", "-p", "#{pid}"], capture_output=True, text=True,
+    ).stdout.strip()
+    return int(out) if out.isdigit() else None
+
+
+def _proc_cpu(pid):
+    """CPU seconds used by pid (Linux /proc only)."""
+    try:
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / TICKS
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _cpu_now(server_pid):
+    t = os.times()
+    return t.user + t.system, t.children_user + t.children_system, _proc_cpu(server_pid)
+
+
+def _run(label, checkers, seconds, server_pid):
+    stop = threading.Event()
+    before = _cpu_now(server_pid)
+
+    def loop(check):
+        while not stop.is_set():
+            check()
+            time.sleep(1)
+
+    threads = [threading.Thread(target=loop, args=(c,), daemon=True) for c in checkers]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    for c in checkers:
+        if hasattr(c, "close"):
+            c.close()  # reap tmux -C clients so their CPU lands in children
+    after = _cpu_now(server_pid)
+
+    own = after[0] - before[0]
+    children = after[1] - before[1]
+    server = (after[2] - before[2]) if before[2] is not None and after[2] is not None else None
+    total = own + children + (server or 0)
+    server_txt = f"{server:6.2f}s" if server is not None else "   n/a"
+    print(f"  {label:<8} self {own:6.2f}s  children {children:6.2f}s  "
+          f"server {server_txt}  total {total:6.2f}s  ({total / seconds * 100:5.1f}% of a core)")
+
+
+def _latency(name, samples=5):
+    monitor = ActivityMonitor(name)
+    _ready_client(name, wait=5.0)
+    results = []
+    for _ in range(samples):
+        time.sleep(0.3)
+        monitor()  # drain
+        start = time.monotonic()
+        subprocess.run(["tmux", "send-keys", "-t", name, "-l", "x"], capture_output=True)
+        if monitor.wait(2):
+            results.append((time.monotonic() - start) * 1000)
+    monitor.close()
+    if results:
+        print(f"  control-mode detection latency: median {sorted(results)[len(results) // 2]:.1f} ms "
+              f"(n={len(results)}, includes send-keys fork)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+
+    names = [f"{PREFIX}-{i}" for i in range(args.agents)]
+    busy = "while true; do date +%s.%N; sleep 0.2; done"
+    for name in names:
+        subprocess.run(["tmux", "kill-session", "-t", name], capture_output=True)
+        subprocess.run(["tmux", "new-session", "-d", "-s", name, "-x", "200", "-y", "50", busy], check=True)
+    try:
+        server_pid = _server_pid()
+        print(f"{args.agents} agents, {args.seconds:.0f}s per strategy")
+        _run("poll", [_capture_pane_checker(n) for n in names], args.seconds, server_pid)
+
+        monitors = [ActivityMonitor(n) for n in names]
+        _run("control", monitors, args.seconds, server_pid)
+
+        idle = f"{PREFIX}-idle"
+        subprocess.run(["tmux", "new-session", "-d", "-s", idle, "cat"], check=True)
+        names.append(idle)
+        _latency(idle)
+    finally:
+        for name in names:
+            subprocess.run(["tmux", "kill-session", "-t", name], capture_output=True)
+
+
+if __name__ == "__main__":
+    main()
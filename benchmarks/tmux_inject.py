@@ -0,0 +1,65 @@
+"""Benchmark: tmux injection latency, fork-per-key vs control-mode pipe.
+
+Sends N prompts into a throwaway session running `cat` and times the
+send-keys round-trips (the inter-key delay inject() sleeps is excluded).
+
+Usage:  python benchmarks/tmux_inject.py [--count 50]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from wrapper_unix import _ready_client  # noqa: E402
+
+SESSION = "acbench-inject"
+
+
+def _report(label, samples):
+    samples = sorted(s * 1000 for s in samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"  {label:<8} median {statistics.median(samples):6.2f} ms   p95 {p95:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=50)
+    args = parser.parse_args()
+
+    text = "mcp read #general - you were mentioned, take appropriate action"
+    subprocess.run(["tmux", "kill-session", "-t", SESSION], capture_output=True)
+    subprocess.run(["tmux", "new-session", "-d", "-s", SESSION, "cat"], check=True)
+    try:
+        forked = []
+        for _ in range(args.count):
+            start = time.perf_counter()
+            subprocess.run(["tmux", "send-keys", "-t", SESSION, "-l", text], capture_output=True)
+            subprocess.run(["tmux", "send-keys", "-t", SESSION, "Enter"], capture_output=True)
+            forked.append(time.perf_counter() - start)
+
+        client = _ready_client(SESSION, wait=2.0)
+        if client is None:
+            print("  control mode unavailable")
+            return
+        piped = []
+        for _ in range(args.count):
+            start = time.perf_counter()
+            client.command("send-keys", "-t", SESSION, "-l", text)
+            client.command("send-keys", "-t", SESSION, "Enter")
+            piped.append(time.perf_counter() - start)
+
+        print(f"{args.count} injections (text + Enter)")
+        _report("fork", forked)
+        _report("control", piped)
+    finally:
+        subprocess.run(["tmux", "kill-session", "-t", SESSION], capture_output=True)
+
+
+if __name__ == "__main__":
+    main()
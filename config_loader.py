@@ -135,3 +135,17 @@ def load_config(root: Path | None = None) -> dict:
     _apply_env_overrides(config)
 
     return config
+
+
+def mcp_config(config: dict) -> dict:
+    """Return the [mcp] section with the effective transport ports.
+
+    With `mount = true` both MCP transports are served by the web server
+    itself, so http_port/sse_port resolve to server.port.
+    """
+    mcp_cfg = dict(config.get("mcp", {}))
+    if mcp_cfg.get("mount"):
+        port = config.get("server", {}).get("port", 8300)
+        mcp_cfg["http_port"] = port
+        mcp_cfg["sse_port"] = port
+    return mcp_cfg
@@ -1,75 +1,221 @@
-"""Job store — bounded work conversations with threaded messages."""
+"""Job store — bounded work conversations with threaded messages.
+
+On disk, job metadata and job threads are kept apart so that no write
+costs more than the change it records:
+
+  jobs.json              metadata snapshot (no messages)
+  jobs.journal           metadata changes since the snapshot, one JSON line
+                         each; folded into the snapshot once it grows
+  job_threads/<id>.jsonl one line per message write — a later line for the
+                         same message id (delete, resolve) replaces it
+
+Legacy jobs.json files with embedded messages are split on first load.
+"""
 
 import json
+import os
 import time
 import threading
 import uuid
 from pathlib import Path
 
+JOURNAL_MAX_LINES = 500  # fold the journal into the snapshot past this
+
 
 class JobStore:
     def __init__(self, path: str):
         self._path = Path(path)
         self._path.parent.mkdir(parents=True, exist_ok=True)
-        self._jobs: list[dict] = []
+        self._journal_path = self._path.with_suffix(".journal")
+        self._threads_dir = self._path.parent / "job_threads"
+        # Indexes: id → job (id order), plus status and channel buckets of
+        # id → job. A bucket whose id order a status move broke is re-sorted
+        # lazily on its next read.
+        self._by_id: dict[int, dict] = {}
+        self._buckets: dict[str, dict] = {"status": {}, "channel": {}}
+        self._unsorted: set[tuple[str, str | None]] = set()
+        self._max_order: dict[str | None, int] = {}  # status → highest sort_order seen
         self._next_id = 1
+        self._journal_lines = 0
         self._lock = threading.Lock()
         self._callbacks: list = []  # (action, job) on any change
         self._load()
 
+    # --- Persistence ---
+
+    @property
+    def _jobs(self) -> list[dict]:
+        """All jobs in id order (the live dicts, as archive import expects)."""
+        return list(self._by_id.values())
+
     def _load(self):
-        if not self._path.exists():
+        by_id: dict[int, dict] = {}
+        if self._path.exists():
+            try:
+                raw = json.loads(self._path.read_text("utf-8"))
+                if isinstance(raw, list):
+                    by_id = {a["id"]: a for a in raw if isinstance(a, dict) and "id" in a}
+            except json.JSONDecodeError:
+                pass
+        self._replay_journal(by_id)
+
+        migrated = False
+        for job_id in sorted(by_id):
+            a = by_id[job_id]
+            legacy = a.pop("messages", None)
+            thread = self._thread_path(job_id)
+            if legacy and not thread.exists():
+                self._write_thread(job_id, legacy)
+                migrated = True
+            a["messages"] = self._read_thread(job_id)
+            self._index_locked(a)
+        if self._by_id:
+            self._next_id = max(self._by_id) + 1
+        if self._ensure_sort_orders_locked() or migrated:
+            self._save()
+
+    def _replay_journal(self, by_id: dict[int, dict]):
+        if not self._journal_path.exists():
             return
-        try:
-            raw = json.loads(self._path.read_text("utf-8"))
-            if isinstance(raw, list):
-                self._jobs = raw
-                if self._jobs:
-                    self._next_id = max(a["id"] for a in self._jobs) + 1
-                    if self._ensure_sort_orders_locked():
-                        self._save()
-        except (json.JSONDecodeError, KeyError):
-            self._jobs = []
+        with open(self._journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    op, job_id = entry["op"], entry["id"]
+                except (ValueError, TypeError, KeyError):
+                    continue  # torn final line from a crash mid-append
+                if op == "create":
+                    by_id[job_id] = dict(entry["job"])
+                elif op == "update" and job_id in by_id:
+                    by_id[job_id].update(entry["fields"])
+                elif op == "delete":
+                    by_id.pop(job_id, None)
+                self._journal_lines += 1
 
     def _save(self):
-        self._path.write_text(
-            json.dumps(self._jobs, indent=2, ensure_ascii=False) + "\n",
-            "utf-8",
-        )
+        """Write a full metadata snapshot atomically and truncate the journal.
+
+        Thread messages are not part of the snapshot — they are appended to
+        their job's log as they are written.
+        """
+        snapshot = [{k: v for k, v in a.items() if k != "messages"} for a in self._by_id.values()]
+        tmp = self._path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(snapshot, indent=2, ensure_ascii=False) + "\n", "utf-8")
+        os.replace(tmp, self._path)
+        self._journal_path.unlink(missing_ok=True)
+        self._journal_lines = 0
+
+    def _journal_locked(self, op: str, job_id: int, **data):
+        """Record one metadata change; compacts into the snapshot when long."""
+        if self._journal_lines >= JOURNAL_MAX_LINES:
+            self._save()
+            return
+        entry = {"op": op, "id": job_id, **data}
+        with open(self._journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._journal_lines += 1
+
+    def _thread_path(self, job_id: int) -> Path:
+        return self._threads_dir / f"{job_id}.jsonl"
+
+    def _read_thread(self, job_id: int) -> list[dict]:
+        path = self._thread_path(job_id)
+        if not path.exists():
+            return []
+        msgs: list[dict] = []
+        index: dict = {}  # message id → position
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    msg = json.loads(line)
+                    mid = msg["id"]
+                except (ValueError, TypeError, KeyError):
+                    continue
+                if mid in index:
+                    msgs[index[mid]] = msg
+                else:
+                    index[mid] = len(msgs)
+                    msgs.append(msg)
+        return msgs
+
+    def _write_thread(self, job_id: int, msgs: list[dict]):
+        self._threads_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._thread_path(job_id).with_suffix(".tmp")
+        tmp.write_text("".join(json.dumps(m, ensure_ascii=False) + "\n" for m in msgs), "utf-8")
+        os.replace(tmp, self._thread_path(job_id))
+
+    def _append_thread(self, job_id: int, msg: dict):
+        self._threads_dir.mkdir(parents=True, exist_ok=True)
+        with open(self._thread_path(job_id), "a", encoding="utf-8") as f:
+            f.write(json.dumps(msg, ensure_ascii=False) + "\n")
+
+    # --- Indexes (caller holds self._lock) ---
+
+    def _index_locked(self, a: dict):
+        self._by_id[a["id"]] = a
+        self._bucket_add_locked("status", a.get("status"), a)
+        self._bucket_add_locked("channel", a.get("channel"), a)
+        self._note_order_locked(a)
+
+    def _unindex_locked(self, a: dict):
+        self._by_id.pop(a["id"], None)
+        self._bucket_remove_locked("status", a.get("status"), a["id"])
+        self._bucket_remove_locked("channel", a.get("channel"), a["id"])
+
+    def _bucket_add_locked(self, kind: str, key, a: dict):
+        bucket = self._buckets[kind].setdefault(key, {})
+        if bucket and next(reversed(bucket)) > a["id"]:
+            self._unsorted.add((kind, key))
+        bucket[a["id"]] = a
+
+    def _bucket_remove_locked(self, kind: str, key, job_id: int):
+        bucket = self._buckets[kind].get(key)
+        if bucket is not None:
+            bucket.pop(job_id, None)
+            if not bucket:
+                del self._buckets[kind][key]
+                self._unsorted.discard((kind, key))
+
+    def _bucket_items_locked(self, kind: str, key) -> list[dict]:
+        """Jobs in a bucket, in id order."""
+        bucket = self._buckets[kind].get(key)
+        if not bucket:
+            return []
+        if (kind, key) in self._unsorted:
+            bucket = self._buckets[kind][key] = dict(sorted(bucket.items()))
+            self._unsorted.discard((kind, key))
+        return list(bucket.values())
+
+    def _move_status_locked(self, a: dict, status: str):
+        self._bucket_remove_locked("status", a.get("status"), a["id"])
+        a["status"] = status
+        self._bucket_add_locked("status", status, a)
+
+    def _note_order_locked(self, a: dict):
+        try:
+            order = int(a.get("sort_order", 0))
+        except (TypeError, ValueError):
+            return
+        status = a.get("status")
+        if order > self._max_order.get(status, 0):
+            self._max_order[status] = order
 
     def _next_sort_order_locked(self, status: str) -> int:
-        max_order = 0
-        for a in self._jobs:
-            if a.get("status") != status:
-                continue
-            try:
-                max_order = max(max_order, int(a.get("sort_order", 0)))
-            except (TypeError, ValueError):
-                continue
-        return max_order + 1
+        # The cached max never goes down when jobs leave a lane, so a new
+        # arrival always lands on top.
+        return self._max_order.get(status, 0) + 1
 
-    def _ensure_sort_orders_locked(self):
-        max_by_group: dict[str, int] = {}
+    def _ensure_sort_orders_locked(self) -> bool:
+        """Give jobs without a positive sort_order one (legacy data, at load)."""
         changed = False
-        for a in self._jobs:
-            key = a.get("status", "open")
-            try:
-                cur = int(a.get("sort_order", 0))
-            except (TypeError, ValueError):
-                cur = 0
-            if cur > 0:
-                max_by_group[key] = max(max_by_group.get(key, 0), cur)
-
-        for a in self._jobs:
-            key = a.get("status", "open")
+        for a in self._by_id.values():
             try:
                 cur = int(a.get("sort_order", 0))
             except (TypeError, ValueError):
                 cur = 0
             if cur <= 0:
-                next_order = max_by_group.get(key, 0) + 1
-                a["sort_order"] = next_order
-                max_by_group[key] = next_order
+                a["sort_order"] = self._next_sort_order_locked(a.get("status"))
+                self._note_order_locked(a)
                 changed = True
         return changed
 
@@ -89,22 +235,25 @@ class JobStore:
                  status: str | None = None) -> list[dict]:
         """List jobs, optionally filtered by channel and/or status."""
         with self._lock:
-            changed = self._ensure_sort_orders_locked()
-            if changed:
-                self._save()
-            result = list(self._jobs)
-        if channel:
-            result = [a for a in result if a.get("channel") == channel]
-        if status:
-            result = [a for a in result if a.get("status") == status]
-        return result
+            if channel and status:
+                # Walk the smaller bucket, filter on the other field
+                by_status = self._buckets["status"].get(status, {})
+                by_channel = self._buckets["channel"].get(channel, {})
+                if len(by_status) <= len(by_channel):
+                    return [a for a in self._bucket_items_locked("status", status)
+                            if a.get("channel") == channel]
+                return [a for a in self._bucket_items_locked("channel", channel)
+                        if a.get("status") == status]
+            if status:
+                return self._bucket_items_locked("status", status)
+            if channel:
+                return self._bucket_items_locked("channel", channel)
+            return list(self._by_id.values())
 
     def get(self, job_id: int) -> dict | None:
         with self._lock:
-            for a in self._jobs:
-                if a["id"] == job_id:
-                    return dict(a)
-            return None
+            a = self._by_id.get(job_id)
+            return dict(a) if a else None
 
     def create(self, title: str, job_type: str, channel: str,
                created_by: str, anchor_msg_id: int | None = None,
@@ -135,8 +284,8 @@ class JobStore:
                 "sort_order": self._next_sort_order_locked(st),
             }
             self._next_id += 1
-            self._jobs.append(a)
-            self._save()
+            self._index_locked(a)
+            self._journal_locked("create", a["id"], job={k: v for k, v in a.items() if k != "messages"})
         self._fire("create", a)
         return a
 
@@ -145,51 +294,46 @@ class JobStore:
         if status not in ("open", "done", "archived"):
             return None
         with self._lock:
-            for a in self._jobs:
-                if a["id"] == job_id:
-                    old_status = a.get("status")
-                    next_order = None
-                    if old_status != status:
-                        # Compute destination order before moving this job so
-                        # the job doesn't count itself in the target lane.
-                        next_order = self._next_sort_order_locked(status)
-                    a["status"] = status
-                    a["updated_at"] = time.time()
-                    if next_order is not None:
-                        a["sort_order"] = next_order
-                    self._save()
-                    result = dict(a)
-                    break
-            else:
+            a = self._by_id.get(job_id)
+            if a is None:
                 return None
+            if a.get("status") != status:
+                self._move_status_locked(a, status)
+                a["sort_order"] = self._next_sort_order_locked(status)
+                self._note_order_locked(a)
+            a["updated_at"] = time.time()
+            self._journal_locked("update", job_id, fields={
+                "status": status, "updated_at": a["updated_at"], "sort_order": a.get("sort_order"),
+            })
+            result = dict(a)
         self._fire("update", result)
         return result
 
     def update_title(self, job_id: int, title: str) -> dict | None:
         with self._lock:
-            for a in self._jobs:
-                if a["id"] == job_id:
-                    a["title"] = title.strip()[:120]
-                    a["updated_at"] = time.time()
-                    self._save()
-                    result = dict(a)
-                    break
-            else:
+            a = self._by_id.get(job_id)
+            if a is None:
                 return None
+            a["title"] = title.strip()[:120]
+            a["updated_at"] = time.time()
+            self._journal_locked("update", job_id, fields={
+                "title": a["title"], "updated_at": a["updated_at"],
+            })
+            result = dict(a)
         self._fire("update", result)
         return result
 
     def update_assignee(self, job_id: int, assignee: str) -> dict | None:
         with self._lock:
-            for a in self._jobs:
-                if a["id"] == job_id:
-                    a["assignee"] = assignee.strip()
-                    a["updated_at"] = time.time()
-                    self._save()
-                    result = dict(a)
-                    break
-            else:
+            a = self._by_id.get(job_id)
+            if a is None:
                 return None
+            a["assignee"] = assignee.strip()
+            a["updated_at"] = time.time()
+            self._journal_locked("update", job_id, fields={
+                "assignee": a["assignee"], "updated_at": a["updated_at"],
+            })
+            result = dict(a)
         self._fire("update", result)
         return result
 
@@ -201,85 +345,107 @@ class JobStore:
                     time_str: str | None = None) -> dict | None:
         """Add a message to a job's conversation. Returns the message."""
         with self._lock:
-            for a in self._jobs:
-                if a["id"] == job_id:
-                    msg_id = len(a["messages"])
-                    ts = timestamp if timestamp is not None else time.time()
-                    msg = {
-                        "id": msg_id,
-                        "uid": uid or str(uuid.uuid4()),
-                        "sender": sender,
-                        "text": text.strip(),
-                        "time": time_str or time.strftime("%H:%M:%S"),
-                        "timestamp": ts,
-                        "attachments": attachments or [],
-                    }
-                    if msg_type != "chat":
-                        msg["type"] = msg_type
-                    a["messages"].append(msg)
-                    a["updated_at"] = time.time()
-                    self._save()
-                    result_msg = dict(msg)
-                    result_msg["job_id"] = job_id
-                    break
-            else:
+            a = self._by_id.get(job_id)
+            if a is None:
                 return None
+            ts = timestamp if timestamp is not None else time.time()
+            msg = {
+                "id": len(a["messages"]),
+                "uid": uid or str(uuid.uuid4()),
+                "sender": sender,
+                "text": text.strip(),
+                "time": time_str or time.strftime("%H:%M:%S"),
+                "timestamp": ts,
+                "attachments": attachments or [],
+            }
+            if msg_type != "chat":
+                msg["type"] = msg_type
+            a["messages"].append(msg)
+            a["updated_at"] = time.time()
+            self._append_thread(job_id, msg)
+            self._journal_locked("update", job_id, fields={"updated_at": a["updated_at"]})
+            result_msg = dict(msg)
+            result_msg["job_id"] = job_id
         self._fire("message", {"job_id": job_id, "message": result_msg})
         return result_msg
 
-    def get_messages(self, job_id: int) -> list[dict] | None:
-        """Get all messages for a job."""
+    def get_messages(self, job_id: int, since_id: int | None = None,
+                     limit: int = 0) -> list[dict] | None:
+        """Get a job's messages, oldest first.
+
+        since_id: only messages with a higher id (None = from the start).
+        limit: at most this many, starting from the oldest match (0 = all).
+        Message ids are thread positions, so a page is a slice.
+        """
         with self._lock:
-            for a in self._jobs:
-                if a["id"] == job_id:
-                    return list(a["messages"])
-            return None
+            a = self._by_id.get(job_id)
+            if a is None:
+                return None
+            start = 0 if since_id is None else max(0, since_id + 1)
+            end = start + limit if limit > 0 else None
+            return a["messages"][start:end]
+
+    def get_recent_messages(self, job_id: int, count: int = 20) -> list[dict] | None:
+        """Get the newest `count` messages of a job, oldest first."""
+        with self._lock:
+            a = self._by_id.get(job_id)
+            if a is None:
+                return None
+            return a["messages"][-count:] if count > 0 else []
 
     def delete_message(self, job_id: int, msg_id: int) -> dict | None:
         """Soft-delete a message from a job conversation by message id."""
         with self._lock:
-            for a in self._jobs:
-                if a["id"] != job_id:
-                    continue
-                msgs = a.get("messages", [])
-                hit = None
-                for i, m in enumerate(msgs):
-                    try:
-                        mid = int(m.get("id", -1))
-                    except (TypeError, ValueError):
-                        mid = -1
-                    if mid == msg_id:
-                        hit = (i, m)
-                        break
-                if hit is None:
-                    return None
-                _, msg = hit
-                if msg.get("deleted"):
-                    return {"job_id": job_id, "message_id": msg_id}
-                msg["deleted"] = True
-                msg["text"] = ""
-                msg["attachments"] = []
-                msg["updated_at"] = time.time()
-                a["updated_at"] = time.time()
-                self._save()
-                payload = {"job_id": job_id, "message_id": msg_id}
-                break
-            else:
+            a = self._by_id.get(job_id)
+            if a is None:
                 return None
+            msg = None
+            for m in a.get("messages", []):
+                try:
+                    mid = int(m.get("id", -1))
+                except (TypeError, ValueError):
+                    mid = -1
+                if mid == msg_id:
+                    msg = m
+                    break
+            if msg is None:
+                return None
+            if msg.get("deleted"):
+                return {"job_id": job_id, "message_id": msg_id}
+            msg["deleted"] = True
+            msg["text"] = ""
+            msg["attachments"] = []
+            msg["updated_at"] = time.time()
+            a["updated_at"] = time.time()
+            self._append_thread(job_id, msg)
+            self._journal_locked("update", job_id, fields={"updated_at": a["updated_at"]})
+            payload = {"job_id": job_id, "message_id": msg_id}
         self._fire("message_delete", payload)
         return payload
 
+    def resolve_message(self, job_id: int, msg_index: int, resolution: str) -> dict | None:
+        """Mark a suggestion message accepted/dismissed. Returns the message,
+        or None if the job or message index doesn't exist."""
+        with self._lock:
+            a = self._by_id.get(job_id)
+            msgs = a.get("messages", []) if a else []
+            if msg_index < 0 or msg_index >= len(msgs):
+                return None
+            msg = msgs[msg_index]
+            msg["resolved"] = resolution
+            self._append_thread(job_id, msg)
+            return dict(msg)
+
     def delete(self, job_id: int) -> dict | None:
         """Permanently delete a job."""
         with self._lock:
-            for i, a in enumerate(self._jobs):
-                if a["id"] == job_id:
-                    removed = self._jobs.pop(i)
-                    self._save()
-                    result = dict(removed)
-                    break
-            else:
+            removed = self._by_id.get(job_id)
+            if removed is None:
                 return None
+            self._unindex_locked(removed)
+            self._journal_locked("delete", job_id)
+            self._thread_path(job_id).unlink(missing_ok=True)
+            result = dict(removed)
         self._fire("delete", result)
         return result
 
@@ -288,11 +454,7 @@ class JobStore:
         if status not in ("open", "done", "archived"):
             return []
         with self._lock:
-            self._ensure_sort_orders_locked()
-            group = [
-                a for a in self._jobs
-                if a.get("status") == status
-            ]
+            group = self._bucket_items_locked("status", status)
             if not group:
                 return []
 
@@ -331,11 +493,10 @@ class JobStore:
                 old_order = int(item.get("sort_order", 0) or 0)
                 if old_order != new_order:
                     item["sort_order"] = new_order
+                    self._note_order_locked(item)
+                    self._journal_locked("update", aid, fields={"sort_order": new_order})
                     changed.append(dict(item))
 
-            if changed:
-                self._save()
-
         for item in changed:
             self._fire("update", item)
         return changed
@@ -3,17 +3,25 @@
 Serves two transports for compatibility:
   - streamable-http on port 8200 (Claude Code, Codex, Qwen)
   - SSE on port 8201 (Gemini)
+
+or, with [mcp] mount = true, both on the web server's port (see mount_on).
 """
 
+import asyncio
+import functools
 import json
 import os
+import re
 import time
 import logging
 import threading
 from pathlib import Path
 
+import anyio
 from mcp.server.fastmcp import Context, FastMCP
 
+from presence import PresenceTracker
+
 log = logging.getLogger(__name__)
 
 # Shared state — set by run.py before starting
@@ -26,14 +34,13 @@ registry = None       # set by run.py — RuntimeRegistry instance
 config = None         # set by run.py — full config.toml dict
 router = None         # set by run.py — Router instance
 agents = None         # set by run.py — AgentManager instance
-_presence: dict[str, float] = {}
-_activity: dict[str, bool] = {}   # True = screen changed on last poll
-_activity_ts: dict[str, float] = {}  # timestamp of last active=True heartbeat
+rate_limiter = None   # set by run.py — ratelimit.RateLimiter (None = unlimited)
 ACTIVITY_TIMEOUT = 8  # auto-expire activity after 8s without a fresh active=True
-_presence_lock = threading.Lock()   # guards both _presence and _activity
-_renamed_from: set[str] = set()    # old names from renames — suppress leave messages
 _cursors: dict[str, dict[str, int]] = {}  # agent_name → {channel_name → last_id}
 _cursors_lock = threading.Lock()
+# Streaming placeholders an agent read before their reply landed. They are
+# finished in place behind the read cursor, so the next read picks them up.
+_held_streams: dict[str, dict[str, set[int]]] = {}  # agent_name → {channel_key → ids}
 _empty_read_count: dict[str, int] = {}  # sender → consecutive empty reads
 # Last channel (or job_id) each agent explicitly read from. chat_send
 # falls back to this when the caller omits the channel/job_id, so agents
@@ -43,13 +50,27 @@ _last_read_channel: dict[str, str] = {}
 _last_read_job_id: dict[str, int] = {}
 _last_read_lock = threading.Lock()
 PRESENCE_TIMEOUT = 10  # ~2 missed heartbeats (5s interval) = offline
+CRASH_TIMEOUT = 15     # no heartbeat for this long = wrapper is dead ("lost" event)
+presence = PresenceTracker(PRESENCE_TIMEOUT, ACTIVITY_TIMEOUT, CRASH_TIMEOUT)  # run.py starts its expiry thread
 
 # Roles — per-instance, persisted to roles.json
 _roles: dict[str, str] = {}  # agent_name → role string
 _ROLES_FILE: Path | None = None
 
-# Cursor persistence — set by run.py to enable saving cursors across restarts
+# Cursor persistence — set by run.py to enable saving cursors across restarts.
+# Cursor moves are buffered in memory and written by a background thread:
+# appended to a journal every CURSOR_FLUSH_INTERVAL, folded into the
+# snapshot file every CURSOR_SNAPSHOT_INTERVAL (or once the journal grows).
 _CURSORS_FILE: Path | None = None
+CURSOR_FLUSH_INTERVAL = 1.0
+CURSOR_SNAPSHOT_INTERVAL = 30.0
+CURSOR_JOURNAL_MAX_LINES = 5000
+_cursor_journal_pending: list[list] = []  # [agent, channel_key, last_id] not yet on disk
+_cursor_journal_lines = 0
+_cursor_snapshot_due = False  # set by structural changes (rename/purge) the journal can't express
+_cursor_last_snapshot = 0.0
+_cursor_flush_lock = threading.Lock()  # serialises flushes (writer thread vs shutdown)
+_cursor_writer_started = False
 
 _MCP_INSTRUCTIONS = (
     "agentchattr — a shared chat channel for coordinating development between AI agents and humans. "
@@ -82,7 +103,10 @@ _MCP_INSTRUCTIONS = (
     "Each chat_read call costs tokens. Default: one read per relevant channel per turn. "
     "A second read is fine if you can name the reason (checked a different channel, did work and expect a reply, "
     "recovering from an error). After an empty read ('No new messages'), do NOT read the same channel again — "
-    "stop and wait for your next prompt. Never use chat_read as a sleep/wait loop.\n\n"
+    "stop and wait for your next prompt. Never use chat_read as a sleep/wait loop. "
+    "If you genuinely need to wait for a reply (e.g. you asked another agent something), call chat_wait once — "
+    "it blocks server-side until you are mentioned or replied to (or, with channel set, anything is posted there) "
+    "and returns the new messages.\n\n"
     "Rules are the shared working style for your agents. They are short imperative instructions that all agents should follow. "
     "At session start, call chat_rules(action='list') to read active rules — treat them as authoritative guidance. "
     "When you notice a repeated correction, a cross-agent convention, or a preference that should persist, "
@@ -161,6 +185,35 @@ def _resolve_tool_identity(
     *,
     field_name: str,
     required: bool = False,
+    tool: str = "",
+) -> tuple[str, str | None]:
+    """Resolve the caller's identity, then charge the call to its rate limit."""
+    name, err = _resolve_identity(raw_name, ctx, field_name=field_name, required=required)
+    if err is None and tool and rate_limiter:
+        err = _rate_limit_error(name, tool)
+    return name, err
+
+
+def _rate_limit_error(name: str, tool: str) -> str | None:
+    wait = rate_limiter.check(name or "(anonymous)", tool)
+    if not wait:
+        return None
+    return json.dumps({
+        "error": "rate_limited",
+        "tool": tool,
+        "sender": name,
+        "limit_per_minute": rate_limiter.limit_for(tool),
+        "retry_after": round(wait, 1),
+        "message": f"Too many {tool} calls. Wait {wait:.1f}s before retrying — do not loop.",
+    })
+
+
+def _resolve_identity(
+    raw_name: str,
+    ctx: Context | None,
+    *,
+    field_name: str,
+    required: bool = False,
 ) -> tuple[str, str | None]:
     provided = raw_name.strip() if raw_name else ""
     token = _extract_agent_token(ctx)
@@ -216,7 +269,7 @@ def chat_send(
       chat_send(sender="claude", message="Should I merge?", choices=["Yes", "No", "Show diff first"])
     For normal messages without choices, pass choices=[]:
       chat_send(sender="claude", message="Done.", choices=[])"""
-    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=True)
+    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=True, tool="chat_send")
     if err:
         return err
 
@@ -279,22 +332,22 @@ def chat_send(
                                attachments=job_attachments)
         if msg is None:
             return f"Error: job #{job_id} not found."
-        with _presence_lock:
-            _presence[sender] = time.time()
+        _touch_presence(sender)
 
         # Route @mentions in job messages to trigger other agents
         if router and agents:
             job = jobs.get(job_id)
             if job:
                 job_channel = job.get("channel", "general")
-                raw_targets = router.get_targets(sender, text, job_channel)
+                route = router.route(sender, text, job_channel, thread=f"job:{job_id}")
                 targets = []
-                for t in raw_targets:
+                for t in route.targets:
                     if registry:
                         targets.extend(registry.resolve_to_instances(t))
                     else:
                         targets.append(t)
                 targets = list(dict.fromkeys(targets))
+                router.bind(job_channel, targets, route.thread)
                 chat_msg = f"{sender}: {text}" if text else ""
                 for target in targets:
                     if registry:
@@ -346,8 +399,7 @@ def chat_send(
                     reply_to=reply_id, channel=channel,
                     msg_type=msg_type, metadata=metadata)
     _update_cursor(sender, [msg], channel)
-    with _presence_lock:
-        _presence[sender] = time.time()
+    _touch_presence(sender)
     return f"Sent (id={msg['id']})"
 
 
@@ -367,7 +419,7 @@ def chat_propose_job(
         body: Detailed description of the work (max 1000 chars)
         channel: Channel to post the proposal in
     """
-    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=True)
+    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=True, tool="chat_propose_job")
     if err:
         return err
     if not title.strip():
@@ -382,11 +434,16 @@ def chat_propose_job(
         metadata={"title": title, "body": body, "status": "pending"},
     )
     _update_cursor(sender, [msg], channel)
-    with _presence_lock:
-        _presence[sender] = time.time()
+    _touch_presence(sender)
     return f"Proposed job (msg_id={msg['id']}): {title}"
 
 
+@functools.lru_cache(maxsize=4096)
+def _upload_file_path(raw_dir: str, url: str) -> str:
+    """Absolute path of an /uploads/ URL. Uploads are immutable, so cache it."""
+    return str(Path(raw_dir).resolve() / url.split("/")[-1])
+
+
 def _resolve_attachments(attachments: list[dict]) -> list[dict]:
     """Add absolute file_path to attachments so agents can read images."""
     if not attachments:
@@ -394,66 +451,315 @@ def _resolve_attachments(attachments: list[dict]) -> list[dict]:
     raw_dir = "./uploads"
     if config and "images" in config:
         raw_dir = config["images"].get("upload_dir", raw_dir)
-    upload_dir = Path(raw_dir).resolve()
     resolved = []
     for att in attachments:
         a = dict(att)
         url = a.get("url", "")
         if url.startswith("/uploads/"):
-            filename = url.split("/")[-1]
-            a["file_path"] = str(upload_dir / filename)
+            a["file_path"] = _upload_file_path(raw_dir, url)
         resolved.append(a)
     return resolved
 
 
-def _serialize_messages(msgs: list[dict]) -> str:
-    """Serialize store messages into MCP chat_read output shape."""
-    out = []
-    for m in msgs:
-        entry = {
-            "id": m["id"],
-            "sender": m["sender"],
-            "text": m["text"],
-            "type": m["type"],
-            "time": m["time"],
-            "channel": m.get("channel", "general"),
-        }
-        if m.get("attachments"):
-            entry["attachments"] = _resolve_attachments(m["attachments"])
-        if m.get("reply_to") is not None:
-            entry["reply_to"] = m["reply_to"]
-        out.append(entry)
-    return json.dumps(out, ensure_ascii=False) if out else ""
+# Bodies longer than this are elided (head + tail) in read results; the full
+# text stays available through chat_get_message(id).
+READ_ELIDE_CHARS = 4000
+_MIN_ELIDED_CHARS = 400  # don't squeeze a body below this to fit a budget
+
+
+def _elide(text: str, limit: int, msg_id: int) -> str:
+    if len(text) <= limit:
+        return text
+    head = limit * 3 // 4
+    tail = limit - head
+    omitted = len(text) - head - tail
+    return (f"{text[:head]}\n[... {omitted} chars elided — "
+            f"chat_get_message(id={msg_id}) for the full text ...]\n{text[-tail:]}")
+
+
+def _message_entry(m: dict, elide_at: int = READ_ELIDE_CHARS) -> dict:
+    entry = {
+        "id": m["id"],
+        "sender": m["sender"],
+        "text": _elide(m["text"], elide_at, m["id"]) if elide_at else m["text"],
+        "type": m["type"],
+        "time": m["time"],
+        "channel": m.get("channel", "general"),
+    }
+    if m.get("attachments"):
+        entry["attachments"] = _resolve_attachments(m["attachments"])
+    if m.get("reply_to") is not None:
+        entry["reply_to"] = m["reply_to"]
+    if (m.get("metadata") or {}).get("streaming"):
+        entry["streaming"] = True  # partial reply, still being generated
+    return entry
+
+
+def _summary_entries(msgs: list[dict]) -> tuple[list[dict], list[dict]]:
+    """Replace messages already covered by their channel's summary.
+
+    Returns (summary entries, remaining messages).
+    """
+    if not summaries:
+        return [], msgs
+    entries = []
+    covered_ids = set()
+    for ch in dict.fromkeys(m.get("channel", "general") for m in msgs):
+        summary = summaries.get(ch)
+        through = (summary or {}).get("message_id") or 0
+        if not through:
+            continue
+        covered = [m["id"] for m in msgs
+                   if m.get("channel", "general") == ch and m["id"] <= through]
+        if not covered:
+            continue
+        covered_ids.update(covered)
+        entries.append({
+            "id": -1,
+            "sender": summary.get("author", ""),
+            "text": summary["text"],
+            "type": "summary",
+            "time": "",
+            "channel": ch,
+            "covers_through": through,
+            "replaced": len(covered),
+        })
+    return entries, [m for m in msgs if m["id"] not in covered_ids]
+
+
+def _json_size(entry: dict) -> int:
+    return len(json.dumps(entry, ensure_ascii=False))
+
+
+def _compact_size(entry: dict) -> int:
+    return len(json.dumps(_compact_row(entry, None), ensure_ascii=False))
+
+
+def _fit_budget(entries: list[dict], max_chars: int, measure=_json_size) -> tuple[list[dict], int]:
+    """Keep the newest entries that fit in max_chars of output.
+
+    Long bodies are elided further to squeeze in; returns (kept, dropped).
+    """
+    kept = []
+    used = 0
+    for i in range(len(entries) - 1, -1, -1):
+        entry = entries[i]
+        size = measure(entry)
+        if used + size > max_chars:
+            overhead = size - len(entry["text"])
+            room = max_chars - used - overhead
+            if room < _MIN_ELIDED_CHARS or entry["id"] < 0:
+                return list(reversed(kept)), i + 1
+            entry = dict(entry, text=_elide(entry["text"], room - 100, entry["id"]))
+            size = measure(entry)
+            if used + size > max_chars:
+                return list(reversed(kept)), i + 1
+        kept.append(entry)
+        used += size
+    return list(reversed(kept)), 0
+
+
+# Compact read format: one row per message instead of one object.
+# Default fields are omitted and channel carries over from the previous row.
+COMPACT_COLUMNS = ["id", "sender", "time", "text"]
+_COMPACT_EXTRAS = ("reply_to", "streaming", "covers_through", "replaced")
+
+
+def _compact_row(entry: dict, prev_channel: str | None) -> list:
+    """[id, sender, time, text] plus a dict of non-default fields, if any."""
+    row = [entry["id"], entry["sender"], entry["time"], entry["text"]]
+    extras = {}
+    channel = entry.get("channel")
+    if channel and channel != prev_channel:
+        extras["channel"] = channel
+    if entry.get("type", "chat") != "chat":
+        extras["type"] = entry["type"]
+    if entry.get("attachments"):
+        extras["files"] = [a.get("file_path") or a.get("url", "") for a in entry["attachments"]]
+    for key in _COMPACT_EXTRAS:
+        if key in entry:
+            extras[key] = entry[key]
+    if extras:
+        row.append(extras)
+    return row
+
+
+def _compact(entries: list[dict]) -> dict:
+    rows = []
+    channel = None
+    for entry in entries:
+        rows.append(_compact_row(entry, channel))
+        channel = entry.get("channel") or channel
+    return {"cols": COMPACT_COLUMNS, "rows": rows}
+
+
+def _serialize_messages(msgs: list[dict], max_chars: int = 0, use_summary: bool = False,
+                        compact: bool = False) -> str:
+    """Serialize store messages into MCP chat_read output shape.
+
+    use_summary swaps messages at or before a channel summary's message_id
+    for the summary itself. max_chars caps the output size: the newest
+    messages are kept, older ones dropped with a notice saying how to fetch
+    them. compact emits {"cols": [...], "rows": [...]} (see _compact_row).
+    """
+    prefix = []
+    if use_summary:
+        prefix, msgs = _summary_entries(msgs)
+    entries = [_message_entry(m) for m in msgs]
+    if max_chars:
+        measure = _compact_size if compact else _json_size
+        budget = max_chars - sum(measure(e) for e in prefix)
+        entries, dropped = _fit_budget(entries, max(budget, 0), measure)
+        if dropped:
+            first, last = msgs[0]["id"], msgs[dropped - 1]["id"]
+            prefix.append({
+                "id": -1,
+                "sender": "system",
+                "text": (f"{dropped} older message(s) (ids {first}-{last}) omitted to fit "
+                         f"max_chars={max_chars}. Fetch any of them with chat_get_message(id) if needed."),
+                "type": "notice",
+                "time": "",
+            })
+    out = prefix + entries
+    if not out:
+        return ""
+    if compact:
+        return json.dumps(_compact(out), ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(out, ensure_ascii=False)
+
+
+def _read_budget(max_chars: int, max_tokens: int) -> int:
+    """Resolve a chat_read budget; tokens are approximated as 4 chars."""
+    if max_chars > 0:
+        return max_chars
+    if max_tokens > 0:
+        return max_tokens * 4
+    return 0
+
+
+def _cursor_journal_path() -> Path:
+    return _CURSORS_FILE.with_suffix(".journal")
 
 
 def _load_cursors():
-    """Load cursor state from disk (called by run.py after store init)."""
-    global _cursors
-    if _CURSORS_FILE is None or not _CURSORS_FILE.exists():
+    """Load cursor state from disk (called by run.py after store init).
+
+    Reads the snapshot, then replays journal entries written since it.
+    """
+    global _cursor_journal_lines
+    if _CURSORS_FILE is None:
+        return
+    if _CURSORS_FILE.exists():
+        try:
+            data = json.loads(_CURSORS_FILE.read_text("utf-8"))
+            with _cursors_lock:
+                _cursors.update(data)
+        except Exception:
+            log.warning("Failed to load cursor state from %s", _CURSORS_FILE)
+    journal = _cursor_journal_path()
+    if not journal.exists():
         return
+    replayed = 0
     try:
-        data = json.loads(_CURSORS_FILE.read_text("utf-8"))
-        with _cursors_lock:
-            _cursors.update(data)
+        with open(journal, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    agent, ch_key, last_id = json.loads(line)
+                except (ValueError, TypeError):
+                    continue  # torn final line from a crash mid-append
+                with _cursors_lock:
+                    _cursors.setdefault(agent, {})[ch_key] = last_id
+                replayed += 1
     except Exception:
-        log.warning("Failed to load cursor state from %s", _CURSORS_FILE)
+        log.warning("Failed to replay cursor journal %s", journal)
+    _cursor_journal_lines = replayed
 
 
 def _save_cursors():
-    """Persist cursor state to disk atomically (write temp + rename)."""
+    """Persist a full cursor snapshot atomically (write temp + rename).
+
+    Truncates the journal, whose entries the snapshot now contains.
+    """
+    global _cursor_journal_lines, _cursor_last_snapshot
     if _CURSORS_FILE is None:
         return
     try:
         with _cursors_lock:
-            snapshot = dict(_cursors)
+            snapshot = {agent: dict(chans) for agent, chans in _cursors.items()}
+            _cursor_journal_pending.clear()
         _CURSORS_FILE.parent.mkdir(parents=True, exist_ok=True)
         tmp = _CURSORS_FILE.with_suffix(".tmp")
         tmp.write_text(json.dumps(snapshot), "utf-8")
         os.replace(tmp, _CURSORS_FILE)  # atomic on POSIX
+        _cursor_journal_path().unlink(missing_ok=True)
+        _cursor_journal_lines = 0
+        _cursor_last_snapshot = time.time()
     except Exception:
         log.warning("Failed to save cursor state to %s", _CURSORS_FILE)
 
 
+def _mark_cursors_snapshot():
+    """Request a full snapshot on the next flush (structural cursor changes)."""
+    global _cursor_snapshot_due
+    with _cursors_lock:
+        _cursor_snapshot_due = True
+
+
+def flush_cursors(force_snapshot: bool = False):
+    """Write buffered cursor moves to disk.
+
+    Appends pending moves to the journal, or writes a full snapshot when one
+    is due (structural change, journal too long, snapshot interval elapsed).
+    Called by the background writer and at shutdown.
+    """
+    global _cursor_snapshot_due, _cursor_journal_lines
+    if _CURSORS_FILE is None:
+        return
+    with _cursor_flush_lock:
+        with _cursors_lock:
+            pending = list(_cursor_journal_pending)
+            snapshot_due = (
+                force_snapshot
+                or _cursor_snapshot_due
+                or _cursor_journal_lines + len(pending) > CURSOR_JOURNAL_MAX_LINES
+                or (_cursor_journal_lines + len(pending) > 0
+                    and time.time() - _cursor_last_snapshot >= CURSOR_SNAPSHOT_INTERVAL)
+            )
+            _cursor_snapshot_due = False
+            if not snapshot_due:
+                _cursor_journal_pending.clear()
+        if snapshot_due:
+            _save_cursors()
+            return
+        if not pending:
+            return
+        try:
+            _CURSORS_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(_cursor_journal_path(), "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(entry) + "\n" for entry in pending))
+            _cursor_journal_lines += len(pending)
+        except Exception:
+            log.warning("Failed to append cursor journal for %s", _CURSORS_FILE)
+
+
+def _cursor_writer():
+    while True:
+        time.sleep(CURSOR_FLUSH_INTERVAL)
+        flush_cursors()
+
+
+def start_cursor_writer():
+    """Start the background cursor flusher and flush on interpreter exit."""
+    global _cursor_writer_started, _cursor_last_snapshot
+    if _cursor_writer_started:
+        return
+    _cursor_writer_started = True
+    _cursor_last_snapshot = time.time()
+    import atexit
+    atexit.register(flush_cursors, force_snapshot=True)
+    threading.Thread(target=_cursor_writer, daemon=True, name="cursor-writer").start()
+
+
 def _load_roles():
     """Load persisted roles from disk."""
     global _roles
@@ -499,35 +805,25 @@ def get_all_roles() -> dict[str, str]:
 
 def migrate_identity(old_name: str, new_name: str):
     """Migrate all runtime state when an agent is renamed (presence, cursors, activity, roles)."""
-    with _presence_lock:
-        if old_name in _presence:
-            _presence[new_name] = _presence.pop(old_name)
-        if old_name in _activity:
-            _activity[new_name] = _activity.pop(old_name)
-        if old_name in _activity_ts:
-            _activity_ts[new_name] = _activity_ts.pop(old_name)
-        _renamed_from.add(old_name)  # suppress leave message for old name
+    presence.rename(old_name, new_name)  # no offline transition for the old name
     with _cursors_lock:
         if old_name in _cursors:
             _cursors[new_name] = _cursors.pop(old_name)
     if old_name in _roles:
         _roles[new_name] = _roles.pop(old_name)
         _save_roles()
-    _save_cursors()
+    _mark_cursors_snapshot()
 
 
 def purge_identity(name: str):
     """Remove all runtime state for a deregistered agent (presence, activity, cursors, roles)."""
-    with _presence_lock:
-        _presence.pop(name, None)
-        _activity.pop(name, None)
-        _activity_ts.pop(name, None)
+    presence.remove(name)
     with _cursors_lock:
         _cursors.pop(name, None)
     if name in _roles:
         del _roles[name]
         _save_roles()
-    _save_cursors()
+    _mark_cursors_snapshot()
 
 
 def migrate_cursors_rename(old_name: str, new_name: str):
@@ -536,24 +832,114 @@ def migrate_cursors_rename(old_name: str, new_name: str):
         for agent_cursors in _cursors.values():
             if old_name in agent_cursors:
                 agent_cursors[new_name] = agent_cursors.pop(old_name)
-    _save_cursors()
+    _mark_cursors_snapshot()
 
 
 def migrate_cursors_delete(channel: str):
-    """Remove cursor entries for a deleted channel."""
+    """Remove cursor entries for a deleted channel (or "job:<id>" thread)."""
     with _cursors_lock:
         for agent_cursors in _cursors.values():
             agent_cursors.pop(channel, None)
-    _save_cursors()
+    _mark_cursors_snapshot()
+
+
+def _is_streaming(msg: dict) -> bool:
+    return bool((msg.get("metadata") or {}).get("streaming"))
 
 
 def _update_cursor(sender: str, msgs: list[dict], channel: str | None):
     if sender and msgs:
         ch_key = channel if channel else "__all__"
+        last_id = msgs[-1]["id"]
+        streaming = {m["id"] for m in msgs if _is_streaming(m) and m.get("sender") != sender}
         with _cursors_lock:
             agent_cursors = _cursors.setdefault(sender, {})
-            agent_cursors[ch_key] = msgs[-1]["id"]
-        _save_cursors()
+            agent_cursors[ch_key] = last_id
+            # Persisted by the background writer — no disk I/O on the tool path
+            _cursor_journal_pending.append([sender, ch_key, last_id])
+            if streaming:
+                _held_streams.setdefault(sender, {}).setdefault(ch_key, set()).update(streaming)
+
+
+def _finished_streams(sender: str, channel: str | None, take: bool = True) -> list[dict]:
+    """Held streaming messages (see _update_cursor) whose reply has since
+    landed. take=False peeks without releasing them."""
+    ch_key = channel if channel else "__all__"
+    with _cursors_lock:
+        ids = sorted(_held_streams.get(sender, {}).get(ch_key, ()))
+    if not ids:
+        return []
+    msgs = [store.get_by_id(i) for i in ids]
+    finished = [m for m in msgs if m and not _is_streaming(m)]
+    release = {i for i, m in zip(ids, msgs) if m is None or (take and not _is_streaming(m))}
+    if release:
+        with _cursors_lock:
+            _held_streams.get(sender, {}).get(ch_key, set()).difference_update(release)
+    return finished
+
+
+def _read_job(job_id: int, sender: str, since_id: int, limit: int, resync: bool = False) -> str:
+    """Job-scoped read: job metadata plus thread messages.
+
+    Uses a per-agent cursor like channel reads (key "job:<id>"): the first
+    read (or a resync) returns the header and the last `limit` messages,
+    later reads only messages added since.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return f"Error: job #{job_id} not found."
+    # Remember so chat_send defaults back to this job thread.
+    if sender:
+        with _last_read_lock:
+            _last_read_job_id[sender] = job_id
+            _last_read_channel.pop(sender, None)
+    job_key = f"job:{job_id}"
+    cursor = None
+    if since_id:
+        cursor = since_id
+    elif sender and not resync:
+        with _cursors_lock:
+            cursor = _cursors.get(sender, {}).get(job_key)
+    if cursor is None:
+        msgs = jobs.get_recent_messages(job_id, limit) or []
+    else:
+        msgs = (jobs.get_messages(job_id, since_id=cursor) or [])[-limit:]
+    # An empty thread still counts as read, so the header isn't repeated
+    _update_cursor(sender, msgs or ([{"id": -1}] if cursor is None else []), job_key)
+
+    out = []
+    if cursor is None:
+        # Header only on a first read — later reads are deltas
+        title = (job.get("title") or "").strip()
+        body = (job.get("body") or "").strip()
+        header_text = f"Job: {title}" if title else f"Job #{job_id}"
+        if body:
+            header_text += f"\nDescription: {body}"
+        out.append({
+            "id": -1,
+            "sender": "system",
+            "text": header_text,
+            "type": "job_header",
+            "time": "",
+            "job_id": job_id,
+            "title": title,
+            "body": body,
+            "status": job.get("status", ""),
+            "channel": job.get("channel", ""),
+            "created_by": job.get("created_by", ""),
+            "assignee": job.get("assignee", ""),
+        })
+    for m in msgs:
+        entry = {"id": m["id"], "sender": m["sender"], "text": m["text"],
+                 "time": m.get("time", ""), "job_id": job_id}
+        if m.get("attachments"):
+            entry["attachments"] = _resolve_attachments(m["attachments"])
+        if m.get("type"):
+            entry["type"] = m["type"]
+        if m.get("resolved"):
+            entry["resolved"] = m["resolved"]
+        out.append(entry)
+    return json.dumps(out, ensure_ascii=False)
 
 
 def chat_read(
@@ -562,6 +948,10 @@ def chat_read(
     limit: int = 20,
     channel: str = "",
     job_id: int = 0,
+    max_chars: int = 0,
+    max_tokens: int = 0,
+    use_summary: bool = False,
+    compact: bool = False,
     ctx: Context | None = None,
 ) -> str:
     """Read chat messages. Returns JSON array with: id, sender, text, type, time, channel.
@@ -572,53 +962,25 @@ def chat_read(
     - Pass since_id to override and read from a specific point.
     - Omit sender to always get the last `limit` messages (no cursor).
     - Pass channel to filter by channel name (default: all channels).
-    - Pass job_id to read a specific job. Job reads return a header entry first,
-      including title and body, followed by the thread messages."""
-    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=False)
+    - Pass job_id to read a specific job. The first read returns a header entry
+      (title, body, status) followed by the last `limit` thread messages; later
+      reads with the same sender return only new thread messages.
+    - Very long message bodies are elided (head + tail); fetch the full text
+      with chat_get_message(id).
+    - Pass max_chars (or max_tokens) to cap the response size: the newest
+      messages are kept and older ones replaced by a notice.
+    - Pass use_summary=true to get the channel summary in place of messages
+      it already covers.
+    - Pass compact=true for a smaller result: {"cols": ["id","sender","time","text"],
+      "rows": [[...], ...]}. A row may end with an object of extra fields
+      (type when not "chat", channel when it differs from the row above,
+      files = absolute attachment paths, reply_to)."""
+    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=False, tool="chat_read")
     if err:
         return err
 
-    # Job-scoped read: return job metadata plus the thread messages
     if job_id and jobs:
-        job = jobs.get(job_id)
-        msgs = jobs.get_messages(job_id)
-        if job is None or msgs is None:
-            return f"Error: job #{job_id} not found."
-        # Remember so chat_send defaults back to this job thread.
-        if sender:
-            with _last_read_lock:
-                _last_read_job_id[sender] = job_id
-                _last_read_channel.pop(sender, None)
-        title = (job.get("title") or "").strip()
-        body = (job.get("body") or "").strip()
-        header_text = f"Job: {title}" if title else f"Job #{job_id}"
-        if body:
-            header_text += f"\nDescription: {body}"
-        out = [{
-            "id": -1,
-            "sender": "system",
-            "text": header_text,
-            "type": "job_header",
-            "time": "",
-            "job_id": job_id,
-            "title": title,
-            "body": body,
-            "status": job.get("status", ""),
-            "channel": job.get("channel", ""),
-            "created_by": job.get("created_by", ""),
-            "assignee": job.get("assignee", ""),
-        }]
-        for m in msgs:
-            entry = {"id": m["id"], "sender": m["sender"], "text": m["text"],
-                     "time": m.get("time", ""), "job_id": job_id}
-            if m.get("attachments"):
-                entry["attachments"] = _resolve_attachments(m["attachments"])
-            if m.get("type"):
-                entry["type"] = m["type"]
-            if m.get("resolved"):
-                entry["resolved"] = m["resolved"]
-            out.append(entry)
-        return json.dumps(out, ensure_ascii=False)
+        return _read_job(job_id, sender, since_id, limit)
 
     ch = channel if channel else None
     # Remember the channel this agent just read so chat_send without an
@@ -645,7 +1007,9 @@ def chat_read(
 
     msgs = msgs[-limit:]
     _update_cursor(sender, msgs, ch)
-    serialized = _serialize_messages(msgs)
+    if sender and not since_id:
+        msgs = _finished_streams(sender, ch) + msgs
+    serialized = _serialize_messages(msgs, _read_budget(max_chars, max_tokens), use_summary, compact)
 
     # Escalating empty-read hints to discourage polling loops
     if not serialized and sender:
@@ -677,6 +1041,11 @@ def chat_resync(
     sender: str,
     limit: int = 50,
     channel: str = "",
+    job_id: int = 0,
+    max_chars: int = 0,
+    max_tokens: int = 0,
+    use_summary: bool = False,
+    compact: bool = False,
     ctx: Context | None = None,
 ) -> str:
     """Explicit full-context fetch.
@@ -684,20 +1053,127 @@ def chat_resync(
     Returns the latest `limit` messages and resets the sender cursor
     to the latest returned message id.
     Pass channel to filter by channel name (default: all channels).
+    Pass job_id to re-read a job thread from its header.
+    max_chars/max_tokens, use_summary and compact work as in chat_read.
     """
-    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=True)
+    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=True, tool="chat_resync")
     if err:
         return err
+    if job_id and jobs:
+        return _read_job(job_id, sender, 0, limit, resync=True)
     ch = channel if channel else None
     msgs = store.get_recent(limit, channel=ch)
+    _finished_streams(sender, ch)  # a resync starts over; don't replay held replies
     _update_cursor(sender, msgs, ch)
-    serialized = _serialize_messages(msgs)
+    serialized = _serialize_messages(msgs, _read_budget(max_chars, max_tokens), use_summary, compact)
     return serialized
 
 
+def chat_get_message(id: int, sender: str = "", ctx: Context | None = None) -> str:
+    """Fetch one message in full (no elision) — e.g. after chat_read elided a long body."""
+    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=False, tool="chat_get_message")
+    if err:
+        return err
+    msg = store.get_by_id(id)
+    if not msg:
+        return f"Error: message #{id} not found."
+    return json.dumps(_message_entry(msg, elide_at=0), ensure_ascii=False)
+
+
+CHAT_WAIT_DEFAULT_TIMEOUT = 30
+CHAT_WAIT_MAX_TIMEOUT = 300
+_CHAT_WAIT_SLICE = 5.0  # re-check presence / cancellation this often while blocked
+
+
+def _is_relevant_to(msg: dict, sender: str, channel: str | None) -> bool:
+    """Would a message wake a chat_wait for sender?"""
+    author = msg.get("sender", "")
+    if author == sender or _is_streaming(msg):
+        return False  # a streaming placeholder is empty until its reply lands
+    if channel and msg.get("channel", "general") == channel and author != "system":
+        return True  # channel activity
+    text = msg.get("text", "")
+    if re.search(rf"@({re.escape(sender)}|all|both)(?![\w-])", text, re.IGNORECASE):
+        return True
+    reply_to = msg.get("reply_to")
+    if reply_to is not None:
+        parent = store.get_by_id(reply_to)
+        if parent and parent.get("sender") == sender:
+            return True
+    return False
+
+
+async def chat_wait(
+    sender: str,
+    channel: str = "",
+    since_id: int = 0,
+    timeout: int = CHAT_WAIT_DEFAULT_TIMEOUT,
+    limit: int = 20,
+    max_chars: int = 0,
+    max_tokens: int = 0,
+    ctx: Context | None = None,
+) -> str:
+    """Wait for a reply instead of polling chat_read.
+
+    Blocks server-side until a relevant message arrives, then returns the
+    new messages (same shape as chat_read, at most the last `limit`) and
+    advances your read cursor. max_chars/max_tokens cap the response size as
+    in chat_read.
+    Relevant = mentions you (@you, @all), replies to one of your messages, or —
+    when channel is set — anything posted in that channel by someone else.
+    Waits from your read cursor (or from now if you have none); pass since_id
+    to wait from a specific message. timeout is in seconds (max 300).
+    Returns a short notice if nothing relevant arrived in time."""
+    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=True, tool="chat_wait")
+    if err:
+        return err
+    ch = channel if channel else None
+    ch_key = ch if ch else "__all__"
+    timeout = max(1, min(int(timeout or CHAT_WAIT_DEFAULT_TIMEOUT), CHAT_WAIT_MAX_TIMEOUT))
+
+    start = since_id
+    if not start:
+        with _cursors_lock:
+            start = _cursors.get(sender, {}).get(ch_key, 0)
+    if not start:
+        start = store.latest_id()
+
+    scanned = start
+    streaming: set[int] = set()  # placeholders seen during this wait
+    deadline = time.monotonic() + timeout
+    while True:
+        # Read the high-water marks first: every surviving id up to latest
+        # is in `new`, and deleted ones must still move the cursor or
+        # wait_for_new returns immediately forever.
+        finished_count = store.streams_finished()
+        latest = store.latest_id()
+        new = store.get_since(scanned)
+        scanned = max(scanned, latest)
+        if new:
+            scanned = max(scanned, new[-1]["id"])
+        streaming.update(m["id"] for m in new if _is_streaming(m))
+        landed = [m for m in map(store.get_by_id, streaming) if m and not _is_streaming(m)]
+        streaming.difference_update(m["id"] for m in landed)
+        candidates = new + landed + _finished_streams(sender, ch, take=False)
+        if any(_is_relevant_to(m, sender, ch) for m in candidates):
+            msgs = store.get_since(start, channel=ch)[-max(1, limit):]
+            _update_cursor(sender, msgs, ch)
+            _empty_read_count[sender] = 0
+            return _serialize_messages(_finished_streams(sender, ch) + msgs,
+                                       _read_budget(max_chars, max_tokens))
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return f"Nothing relevant arrived within {timeout}s. Wait for your next prompt."
+        # Block on the store's condition in a worker thread so the MCP
+        # server's event loop keeps serving other agents meanwhile.
+        await anyio.to_thread.run_sync(store.wait_for_new, scanned, min(remaining, _CHAT_WAIT_SLICE),
+                                       finished_count)
+        _touch_presence(sender)  # still connected — don't go offline while waiting
+
+
 def chat_join(name: str, channel: str = "general", ctx: Context | None = None) -> str:
     """Announce that you've connected to agentchattr."""
-    name, err = _resolve_tool_identity(name, ctx, field_name="name", required=True)
+    name, err = _resolve_tool_identity(name, ctx, field_name="name", required=True, tool="chat_join")
     if err:
         return err
     # Block pending instances (identity not yet confirmed)
@@ -726,41 +1202,23 @@ def chat_who() -> str:
 
 def _touch_presence(name: str):
     """Update presence timestamp — called on any MCP tool use."""
-    with _presence_lock:
-        _presence[name] = time.time()
+    presence.touch(name)
 
 
 def _get_online() -> list[str]:
-    now = time.time()
-    with _presence_lock:
-        return [name for name, ts in _presence.items()
-                if now - ts < PRESENCE_TIMEOUT]
+    return presence.online()
 
 
 def is_online(name: str) -> bool:
-    now = time.time()
-    with _presence_lock:
-        return name in _presence and now - _presence.get(name, 0) < PRESENCE_TIMEOUT
+    return presence.is_online(name)
 
 
 def set_active(name: str, active: bool):
-    with _presence_lock:
-        _activity[name] = active
-        if active:
-            _activity_ts[name] = __import__("time").time()
+    presence.set_active(name, active)
 
 
 def is_active(name: str) -> bool:
-    import time as _time
-    with _presence_lock:
-        if not _activity.get(name, False):
-            return False
-        # Auto-expire stale activity
-        ts = _activity_ts.get(name, 0)
-        if _time.time() - ts > ACTIVITY_TIMEOUT:
-            _activity[name] = False
-            return False
-        return True
+    return presence.is_active(name)
 
 
 def chat_rules(
@@ -779,7 +1237,7 @@ def chat_rules(
 
     Pass channel to place the proposal card in the correct chat channel (default: 'general').
     Agents cannot activate, edit, or delete rules — only humans can do that from the web UI."""
-    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=False)
+    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=False, tool="chat_rules")
     if err:
         return err
     action = action.strip().lower()
@@ -835,7 +1293,7 @@ def chat_set_hat(sender: str, svg: str, target: str = "", ctx: Context | None =
     The hat will appear above your avatar in chat. To remove, users can drag it to the trash.
     Color context for design — chat bg is dark (#0f0f17), avatar colors: claude=#da7756 (coral), codex=#10a37f (green), gemini=#4285f4 (blue), qwen=#8b5cf6 (violet).
     Optional: pass target to set a hat on another agent (e.g. target="qwen")."""
-    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=True)
+    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=True, tool="chat_set_hat")
     if err:
         return err
     hat_owner = target.strip() if target.strip() else sender
@@ -856,7 +1314,7 @@ def chat_claim(sender: str, name: str = "", ctx: Context | None = None) -> str:
 
     Your sender must be your current registered name (the one assigned at registration).
     The identity breadcrumb in chat_read responses shows your current identity."""
-    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=True)
+    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=True, tool="chat_claim")
     if err:
         return err
     if not registry:
@@ -892,7 +1350,7 @@ def chat_summary(
 
     Keep summaries factual and concise (under 150 words). Focus on decisions made,
     tasks completed, and open questions."""
-    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=False)
+    sender, err = _resolve_tool_identity(sender, ctx, field_name="sender", required=False, tool="chat_summary")
     if err:
         return err
     action = action.strip().lower()
@@ -927,7 +1385,7 @@ def chat_summary(
 
 
 _ALL_TOOLS = [
-    chat_send, chat_read, chat_resync, chat_join, chat_who, chat_rules, chat_decision,
+    chat_send, chat_read, chat_resync, chat_wait, chat_get_message, chat_join, chat_who, chat_rules, chat_decision,
     chat_channels, chat_set_hat, chat_claim, chat_summary, chat_propose_job,
 ]
 
@@ -961,3 +1419,70 @@ def run_sse_server():
     """Block — run SSE MCP in a background thread."""
     mcp_sse.run(transport="sse")
 
+
+def _single_response(asgi_app):
+    """Wrap an ASGI app so nothing is sent after its response completes.
+
+    FastMCP's SSE endpoint returns an empty Response once the client
+    disconnects; standalone uvicorn ignores it, but behind the web app's
+    middleware the second http.response.start is an error.
+    """
+    async def guarded(scope, receive, send):
+        state = {"started": False, "done": False}
+
+        async def guarded_send(message):
+            if state["done"]:
+                return
+            if message["type"] == "http.response.start":
+                if state["started"]:
+                    return
+                state["started"] = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                state["done"] = True
+            await send(message)
+
+        await asgi_app(scope, receive, guarded_send)
+
+    return guarded
+
+
+def mount_on(app):
+    """Serve both MCP transports from an existing Starlette/FastAPI app.
+
+    Adds /mcp (streamable-http) and /sse + /messages/ (SSE) to the app's
+    routes so tool calls run on the web server's event loop. The
+    streamable-http session manager is held open for the app's lifetime.
+    """
+    app.router.routes.extend(mcp_http.streamable_http_app().routes)
+    sse_routes = mcp_sse.sse_app().routes
+    for route in sse_routes:
+        if getattr(route, "path", "") == mcp_sse.settings.sse_path:
+            route.app = _single_response(route.app)
+    app.router.routes.extend(sse_routes)
+
+    state = {}
+
+    async def _hold_session_manager(ready: asyncio.Event, stop: asyncio.Event):
+        try:
+            async with mcp_http.session_manager.run():
+                ready.set()
+                await stop.wait()
+        finally:
+            ready.set()
+
+    async def _start():
+        ready, stop = asyncio.Event(), asyncio.Event()
+        state["stop"] = stop
+        state["task"] = asyncio.create_task(_hold_session_manager(ready, stop))
+        await ready.wait()
+        if state["task"].done():
+            state["task"].result()  # surface a failed start
+
+    async def _stop():
+        if "task" in state:
+            state["stop"].set()
+            await state["task"]
+
+    app.router.on_startup.append(_start)
+    app.router.on_shutdown.append(_stop)
+
@@ -10,6 +10,12 @@ Supports both transports:
   - streamable-http (Claude, Codex, Qwen): POST /mcp, GET /mcp, DELETE /mcp
   - SSE (Gemini): GET /sse → event stream, POST /messages/ → tool calls
 
+Two implementations share one interface:
+  - McpIdentityProxy: asyncio (uvicorn + pooled keep-alive upstream
+    connections), relays response bodies chunk by chunk as they arrive
+  - ThreadedMcpIdentityProxy: stdlib thread-per-request fallback, used when
+    uvicorn is unavailable and as the benchmark baseline
+
 Usage (from wrapper.py):
     proxy = McpIdentityProxy(
         upstream_base="http://127.0.0.1:8200",
@@ -23,8 +29,10 @@ Usage (from wrapper.py):
     proxy.stop()
 """
 
+import asyncio
 import json
 import re
+import socket
 import threading
 import logging
 import sys
@@ -33,6 +41,17 @@ from socketserver import ThreadingMixIn
 from urllib.request import Request, urlopen
 from urllib.error import HTTPError, URLError
 
+try:
+    import uvicorn
+except ImportError:  # fall back to the stdlib proxy
+    uvicorn = None
+
+try:
+    import uvloop  # installed with uvicorn[standard] except on Windows
+    _new_event_loop = uvloop.new_event_loop
+except ImportError:
+    _new_event_loop = asyncio.new_event_loop
+
 log = logging.getLogger(__name__)
 
 # MCP tools and which parameter carries the agent identity
@@ -40,6 +59,8 @@ _SENDER_PARAMS = {
     "chat_send": "sender",
     "chat_read": "sender",
     "chat_resync": "sender",
+    "chat_wait": "sender",
+    "chat_get_message": "sender",
     "chat_join": "name",
     "chat_who": None,          # no sender param
     "chat_decision": "sender",
@@ -49,6 +70,61 @@ _SENDER_PARAMS = {
 }
 
 
+_UPSTREAM_ENDPOINT = re.compile(rb'data:\s*http://127\.0\.0\.1:\d+/')
+
+
+def _rewrite_sse_endpoint(data: bytes, proxy_url: str) -> bytes:
+    """Rewrite upstream endpoint URLs in SSE data lines.
+
+    FastMCP SSE sends: data: http://127.0.0.1:8201/messages/?session_id=xxx
+    We rewrite to:     data: http://127.0.0.1:{proxy_port}/messages/?session_id=xxx
+    so the client routes tool call POSTs through our proxy.
+    """
+    return _UPSTREAM_ENDPOINT.sub(f"data: {proxy_url}/".encode("utf-8"), data)
+
+
+def _inject_sender(raw: bytes, agent_name: str) -> bytes:
+    """Stamp agent_name on the sender param of JSON-RPC tools/call requests.
+
+    Bodies that cannot contain a tools/call (initialize, notifications,
+    list requests, responses) are passed through without being parsed.
+    """
+    if not raw or b"tools/call" not in raw:
+        return raw
+    try:
+        data = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return raw
+
+    # Handle both single requests and batches
+    messages = data if isinstance(data, list) else [data]
+    modified = False
+
+    for msg in messages:
+        if not isinstance(msg, dict):
+            continue
+        if msg.get("method") != "tools/call":
+            continue
+
+        params = msg.get("params", {})
+        tool_name = params.get("name", "")
+        args = params.get("arguments", {})
+
+        sender_key = _SENDER_PARAMS.get(tool_name)
+        if sender_key is None:
+            continue
+
+        current = args.get(sender_key, "")
+        if current != agent_name:
+            args[sender_key] = agent_name
+            params["arguments"] = args
+            modified = True
+
+    if modified:
+        return json.dumps(data).encode("utf-8")
+    return raw
+
+
 class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
     """HTTPServer that handles each request in a new thread.
     Required for SSE: GET holds the stream open while POSTs arrive concurrently."""
@@ -70,8 +146,8 @@ def _is_benign_client_disconnect(exc: BaseException | None) -> bool:
     return False
 
 
-class McpIdentityProxy:
-    """Local HTTP proxy that stamps agent identity on MCP tool calls.
+class _IdentityProxyBase:
+    """Identity state shared by both proxy implementations.
 
     Args:
         upstream_base: Base URL without path, e.g. "http://127.0.0.1:8200"
@@ -88,13 +164,9 @@ class McpIdentityProxy:
         self._token = instance_token
         self._port = port  # 0 = OS-assigned (legacy), >0 = fixed
         self._lock = threading.Lock()
-        self._server: _ThreadingHTTPServer | None = None
-        self._thread: threading.Thread | None = None
 
     @property
     def port(self) -> int:
-        if self._server:
-            return self._server.server_address[1]
         return 0
 
     @property
@@ -122,10 +194,44 @@ class McpIdentityProxy:
         with self._lock:
             self._token = value
 
+    def _port_in_use(self):
+        # Fixed port in use — another wrapper instance owns the proxy
+        log.info(f"Proxy port {self._port} in use, skipping (another instance owns it)")
+        print(f"  MCP proxy: port {self._port} in use (shared with another instance)")
+
+
+# Per-connection request headers the threaded proxy never forwards upstream
+_THREADED_DROP_HEADERS = ("content-length", "host", "connection", "keep-alive", "transfer-encoding")
+
+
+class ThreadedMcpIdentityProxy(_IdentityProxyBase):
+    """Local HTTP proxy that stamps agent identity on MCP tool calls.
+
+    Thread-per-request stdlib implementation with a fresh upstream
+    connection per request; see McpIdentityProxy.
+    """
+
+    def __init__(self, upstream_base: str, upstream_path: str,
+                 agent_name: str, instance_token: str, port: int = 0):
+        super().__init__(upstream_base, upstream_path, agent_name, instance_token, port)
+        self._server: _ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def port(self) -> int:
+        if self._server:
+            return self._server.server_address[1]
+        return 0
+
     def start(self):
         proxy = self
 
         class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 so bodies of unknown length can be relayed with chunked framing
+            protocol_version = "HTTP/1.1"
+            timeout = 120  # close idle keep-alive connections instead of pinning a thread
+            disable_nagle_algorithm = True  # headers and body go out as separate writes
+
             def log_message(self, format, *args):
                 pass  # silence request logs
 
@@ -134,81 +240,107 @@ class McpIdentityProxy:
                 p = path if path else self.path
                 return f"{proxy._upstream_base}{p}"
 
+            def _upstream_request(self, method: str, data: bytes | None = None) -> Request:
+                req = Request(self._upstream_url(), data=data, method=method)
+                # Forward all headers from client except per-connection ones
+                for hdr, val in self.headers.items():
+                    if hdr.lower() not in _THREADED_DROP_HEADERS:
+                        req.add_header(hdr, val)
+                req.add_header("Authorization", f"Bearer {proxy.token}")
+                req.add_header("X-Agent-Token", proxy.token)
+                return req
+
             def _send_response_headers(self, headers):
+                # `headers` is case-insensitive — look each name up once, or
+                # Mcp-Session-Id goes out twice and clients see "id, id".
                 for key in (
                     "Content-Type",
+                    "Content-Encoding",
                     "Mcp-Session-Id",
-                    "mcp-session-id",
                     "Cache-Control",
                     "X-Accel-Buffering",
-                    "Connection",
                 ):
                     val = headers.get(key)
                     if val:
                         self.send_header(key, val)
 
-            def do_POST(self):
+            def _read_body(self) -> bytes:
+                if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+                    parts = []
+                    while True:
+                        size = int(self.rfile.readline().split(b";", 1)[0], 16)
+                        if size == 0:
+                            while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                                pass  # trailers
+                            return b"".join(parts)
+                        parts.append(self.rfile.read(size))
+                        self.rfile.readline()
                 length = int(self.headers.get("Content-Length", 0))
-                raw = self.rfile.read(length) if length else b""
+                return self.rfile.read(length) if length else b""
 
-                # Inject sender into MCP tool calls
-                body = self._maybe_inject_sender(raw)
+            def _relay(self, resp, status: int, rewrite_endpoint: bool = False):
+                """Send an upstream response, relaying the body as it arrives.
 
+                Bodies with a known length keep their Content-Length; anything
+                else (SSE streams, chunked JSON) is re-framed as chunked, one
+                chunk per upstream read, so events reach the client as soon
+                as the server produces them.
+                """
                 try:
-                    req = Request(
-                        self._upstream_url(),
-                        data=body,
-                        method="POST",
-                    )
-                    # Forward all headers from client
-                    for hdr, val in self.headers.items():
-                        if hdr.lower() not in ("content-length", "host"):
-                            req.add_header(hdr, val)
-                    
-                    req.add_header("Authorization", f"Bearer {proxy.token}")
-                    req.add_header("X-Agent-Token", proxy.token)
+                    self.send_response(status)
+                    self._send_response_headers(resp.headers)
+                    if status in (204, 304):
+                        self.end_headers()
+                        return
+                    length = resp.headers.get("Content-Length")
+                    chunked = length is None or rewrite_endpoint
+                    if chunked:
+                        self.send_header("Transfer-Encoding", "chunked")
+                    else:
+                        self.send_header("Content-Length", length)
+                    self.end_headers()
 
-                    resp = urlopen(req, timeout=30)
-                    status = resp.status
-                    resp_body = resp.read()
-                    resp_headers = resp.headers
+                    pending = b""
+                    while data := resp.read1(65536):
+                        if rewrite_endpoint:
+                            # Rewrite endpoint URLs in the first SSE event so the
+                            # client POSTs back through the proxy, not to upstream
+                            pending += data
+                            if b"\n\n" not in pending and b"\r\n\r\n" not in pending:
+                                continue
+                            data, pending, rewrite_endpoint = self._rewrite_sse_endpoint(pending), b"", False
+                        self._write_body(data, chunked)
+                    if pending:
+                        self._write_body(self._rewrite_sse_endpoint(pending), chunked)
+                    if chunked:
+                        self.wfile.write(b"0\r\n\r\n")
+                finally:
+                    resp.close()
+
+            def _write_body(self, data: bytes, chunked: bool):
+                if chunked:
+                    data = b"%x\r\n%s\r\n" % (len(data), data)
+                self.wfile.write(data)
+
+            def do_POST(self):
+                # Inject sender into MCP tool calls
+                body = self._maybe_inject_sender(self._read_body())
+                try:
+                    # Long enough to outlast chat_wait's max long-poll (300s)
+                    resp = urlopen(self._upstream_request("POST", body), timeout=330)
                 except HTTPError as e:
-                    status = e.code
-                    resp_body = e.read()
-                    resp_headers = e.headers
+                    resp = e
                 except (URLError, OSError) as e:
                     self.send_error(502, f"Upstream error: {e}")
                     return
-
-                self.send_response(status)
-                self._send_response_headers(resp_headers)
-                self.send_header("Content-Length", str(len(resp_body)))
-                self.end_headers()
-                self.wfile.write(resp_body)
+                self._relay(resp, resp.status)
 
             def do_GET(self):
                 """Forward GET — handles both streamable-http and SSE streams."""
                 try:
-                    req = Request(self._upstream_url(), method="GET")
-                    # Forward all headers from client
-                    for hdr, val in self.headers.items():
-                        if hdr.lower() not in ("host",):
-                            req.add_header(hdr, val)
-                    
-                    req.add_header("Authorization", f"Bearer {proxy.token}")
-                    req.add_header("X-Agent-Token", proxy.token)
-
-                    resp = urlopen(req, timeout=300)
+                    resp = urlopen(self._upstream_request("GET"), timeout=300)
                 except HTTPError as e:
-                    status = e.code
-                    resp_body = e.read()
-                    resp_headers = e.headers
-                    self.send_response(status)
-                    self._send_response_headers(resp_headers)
-                    self.send_header("Content-Length", str(len(resp_body)))
-                    self.end_headers()
-                    if resp_body:
-                        self.wfile.write(resp_body)
+                    self._relay(e, e.code)
                     return
                 except BrokenPipeError:
                     return
@@ -216,19 +348,9 @@ class McpIdentityProxy:
                     self.send_error(502, f"Upstream error: {e}")
                     return
 
-                self.send_response(resp.status)
-                self._send_response_headers(resp.headers)
-                self.end_headers()
-
+                rewrite = resp.headers.get("Content-Type", "").startswith("text/event-stream")
                 try:
-                    # Stream line-by-line for SSE (events are line-delimited)
-                    for line in resp:
-                        # Rewrite endpoint URLs in SSE events so the client
-                        # POSTs back through the proxy, not directly to upstream
-                        if line.startswith(b"data:"):
-                            line = self._rewrite_sse_endpoint(line)
-                        self.wfile.write(line)
-                        self.wfile.flush()
+                    self._relay(resp, resp.status, rewrite_endpoint=rewrite)
                 except BrokenPipeError:
                     pass
 
@@ -243,73 +365,22 @@ class McpIdentityProxy:
                     req.add_header("X-Agent-Token", proxy.token)
                     resp = urlopen(req, timeout=10)
                     self.send_response(resp.status)
+                    self.send_header("Content-Length", "0")
                     self.end_headers()
                 except Exception:
                     self.send_error(502)
 
             def _rewrite_sse_endpoint(self, line: bytes) -> bytes:
-                """Rewrite upstream endpoint URLs in SSE data lines.
-
-                FastMCP SSE sends: data: http://127.0.0.1:8201/messages/?session_id=xxx
-                We rewrite to:     data: http://127.0.0.1:{proxy_port}/messages/?session_id=xxx
-                so the client routes tool call POSTs through our proxy.
-                """
-                try:
-                    text = line.decode("utf-8")
-                    # Match "data: http://host:port/path..."
-                    rewritten = re.sub(
-                        r'data:\s*http://127\.0\.0\.1:\d+/',
-                        f'data: {proxy.url}/',
-                        text,
-                    )
-                    return rewritten.encode("utf-8")
-                except Exception:
-                    return line
+                return _rewrite_sse_endpoint(line, proxy.url)
 
             def _maybe_inject_sender(self, raw: bytes) -> bytes:
-                """Parse JSON-RPC, inject sender for tools/call if missing."""
-                if not raw:
-                    return raw
-                try:
-                    data = json.loads(raw)
-                except (json.JSONDecodeError, UnicodeDecodeError):
-                    return raw
-
-                # Handle both single requests and batches
-                messages = data if isinstance(data, list) else [data]
-                modified = False
-
-                for msg in messages:
-                    if not isinstance(msg, dict):
-                        continue
-                    if msg.get("method") != "tools/call":
-                        continue
-
-                    params = msg.get("params", {})
-                    tool_name = params.get("name", "")
-                    args = params.get("arguments", {})
-
-                    sender_key = _SENDER_PARAMS.get(tool_name)
-                    if sender_key is None:
-                        continue
-
-                    current = args.get(sender_key, "")
-                    if current != proxy.agent_name:
-                        args[sender_key] = proxy.agent_name
-                        params["arguments"] = args
-                        modified = True
-
-                if modified:
-                    return json.dumps(data).encode("utf-8")
-                return raw
+                return _inject_sender(raw, proxy.agent_name)
 
         try:
             self._server = _ThreadingHTTPServer(("127.0.0.1", self._port), Handler)
         except OSError as e:
             if self._port > 0:
-                # Fixed port in use — another wrapper instance owns the proxy
-                log.info(f"Proxy port {self._port} in use, skipping (another instance owns it)")
-                print(f"  MCP proxy: port {self._port} in use (shared with another instance)")
+                self._port_in_use()
                 self._server = None
                 return False
             raise
@@ -324,3 +395,312 @@ class McpIdentityProxy:
             self._server.shutdown()
             self._server.server_close()
             self._server = None
+
+
+# Hop-by-hop / per-connection request headers, plus the auth headers the
+# proxy sets itself — never forwarded upstream.
+_DROP_REQUEST_HEADERS = frozenset((
+    b"host", b"content-length", b"connection", b"keep-alive", b"proxy-connection",
+    b"transfer-encoding", b"te", b"upgrade", b"expect", b"authorization", b"x-agent-token",
+))
+_RESPONSE_HEADERS = frozenset((
+    b"content-type", b"content-length", b"content-encoding",
+    b"mcp-session-id", b"cache-control", b"x-accel-buffering",
+))
+_POST_TIMEOUT = 330  # long enough to outlast chat_wait's max long-poll (300s)
+_CONNECT_TIMEOUT = 5
+_MAX_IDLE = 16
+_UPSTREAM_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError, ValueError)
+
+
+class _UpstreamResponse:
+    """One HTTP/1.1 response from the upstream, body read incrementally.
+
+    `length` is the Content-Length, None for chunked bodies, or -1 for bodies
+    delimited by connection close. The connection goes back to the pool only
+    once the body has been read to the end; close() drops it otherwise.
+    """
+
+    def __init__(self, pool, reader, writer, status: int, headers: list, length: int | None, reusable: bool):
+        self.status = status
+        self.headers = headers
+        self.length = length
+        self._pool = pool
+        self._reader = reader
+        self._writer = writer
+        self._reusable = reusable
+        self._complete = False
+
+    @property
+    def streaming(self) -> bool:
+        """True if the body has no known length (SSE, chunked JSON)."""
+        return self.length is None or self.length < 0
+
+    def header(self, name: bytes) -> bytes:
+        for key, value in self.headers:
+            if key == name:
+                return value
+        return b""
+
+    async def body(self):
+        reader = self._reader
+        if self.length is None:
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";", 1)[0], 16)
+                if size == 0:
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass  # trailers
+                    break
+                yield await reader.readexactly(size)
+                await reader.readexactly(2)
+        elif self.length > 0:
+            remaining = self.length
+            while remaining:
+                chunk = await reader.read(min(remaining, 65536))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b"", remaining)
+                remaining -= len(chunk)
+                yield chunk
+        elif self.length < 0:
+            while chunk := await reader.read(65536):
+                yield chunk
+        self._complete = True
+
+    def close(self):
+        if self._writer is None:
+            return
+        if self._complete and self._reusable:
+            self._pool.release(self._reader, self._writer)
+        else:
+            self._writer.close()
+        self._writer = None
+
+
+class _UpstreamPool:
+    """Keep-alive HTTP/1.1 connections to the local MCP server.
+
+    The upstream is always our own uvicorn on loopback, so this speaks just
+    enough HTTP/1.1 for it: one write per request (head + body) on a
+    TCP_NODELAY socket, and Content-Length, chunked or close-delimited bodies.
+    """
+
+    def __init__(self, host: str, port: int, max_idle: int = _MAX_IDLE):
+        self._host = host
+        self._port = port
+        self._max_idle = max_idle
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def request(self, method: str, target: bytes, headers: list, body: bytes) -> _UpstreamResponse:
+        head = [method.encode("ascii"), b" ", target, b" HTTP/1.1\r\nhost: ",
+                f"{self._host}:{self._port}".encode("ascii"), b"\r\n"]
+        for name, value in headers:
+            head += [name, b": ", value, b"\r\n"]
+        if body or method in ("POST", "PUT", "PATCH"):
+            head += [b"content-length: ", str(len(body)).encode("ascii"), b"\r\n"]
+        payload = b"".join(head) + b"\r\n" + body
+
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if reader.at_eof() or writer.is_closing():
+                writer.close()
+                continue
+            try:
+                return await self._exchange(reader, writer, method, payload)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                writer.close()
+                if getattr(e, "partial", b""):
+                    raise
+                # Closed by the upstream's keep-alive timeout before it read
+                # the request — nothing was processed, so try the next one.
+            except BaseException:
+                writer.close()
+                raise
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self._host, self._port), _CONNECT_TIMEOUT)
+        try:
+            return await self._exchange(reader, writer, method, payload)
+        except BaseException:
+            writer.close()
+            raise
+
+    async def _exchange(self, reader, writer, method: str, payload: bytes) -> _UpstreamResponse:
+        writer.write(payload)
+        await writer.drain()
+        status_line, *lines = (await reader.readuntil(b"\r\n\r\n"))[:-4].split(b"\r\n")
+        status = int(status_line.split(None, 2)[1])
+        headers = []
+        for line in lines:
+            name, _, value = line.partition(b":")
+            headers.append((name.strip().lower(), value.strip()))
+        fields = dict(headers)
+
+        reusable = fields.get(b"connection", b"").lower() != b"close"
+        if method == "HEAD" or status in (204, 304) or status < 200:
+            length = 0
+        elif b"chunked" in fields.get(b"transfer-encoding", b"").lower():
+            length = None
+        elif b"content-length" in fields:
+            length = int(fields[b"content-length"])
+        else:
+            length, reusable = -1, False
+        return _UpstreamResponse(self, reader, writer, status, headers, length, reusable)
+
+    def release(self, reader, writer):
+        if len(self._idle) < self._max_idle and not reader.at_eof():
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class McpIdentityProxy(_IdentityProxyBase):
+    """Local HTTP proxy that stamps agent identity on MCP tool calls.
+
+    Runs an asyncio server (uvicorn, on uvloop when available) on a daemon
+    thread and forwards to the upstream MCP server over pooled keep-alive
+    connections. Response bodies — JSON or SSE, on GET or POST — are relayed
+    chunk by chunk as they arrive, and only bodies that contain a tools/call
+    are parsed.
+    """
+
+    def __init__(self, upstream_base: str, upstream_path: str,
+                 agent_name: str, instance_token: str, port: int = 0):
+        super().__init__(upstream_base, upstream_path, agent_name, instance_token, port)
+        host, _, upstream_port = self._upstream_base.split("://", 1)[-1].partition(":")
+        self._pool = _UpstreamPool(host, int(upstream_port or 80))
+        self._sock: socket.socket | None = None
+        self._server = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def port(self) -> int:
+        if self._sock:
+            return self._sock.getsockname()[1]
+        return 0
+
+    def start(self):
+        # Explicit IPPROTO_TCP so asyncio enables TCP_NODELAY on accepted connections
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        if sys.platform != "win32":
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(("127.0.0.1", self._port))
+        except OSError:
+            sock.close()
+            if self._port > 0:
+                self._port_in_use()
+                return False
+            raise
+        sock.listen(128)
+        self._sock = sock
+
+        config = uvicorn.Config(self._asgi, log_level="error", access_log=False,
+                                lifespan="off", interface="asgi3", timeout_keep_alive=60)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        log.info(f"MCP proxy for {self._agent_name} on port {self.port}")
+        print(f"  MCP proxy: port {self.port}")
+        return True
+
+    def stop(self):
+        if self._server:
+            self._server.should_exit = True
+            if self._thread:
+                self._thread.join(timeout=5)
+            self._server = None
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def _run(self):
+        loop = _new_event_loop()
+        try:
+            loop.run_until_complete(self._server.serve(sockets=[self._sock]))
+        finally:
+            self._pool.close()
+            loop.close()
+
+    async def _asgi(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(body)
+
+        method = scope["method"]
+        if method == "POST":
+            body = _inject_sender(body, self.agent_name)
+        token = self.token.encode("latin-1")
+        headers = [(k, v) for k, v in scope["headers"] if k not in _DROP_REQUEST_HEADERS]
+        headers += [(b"authorization", b"Bearer " + token), (b"x-agent-token", token)]
+        target = scope.get("raw_path") or scope["path"].encode("utf-8")
+        if scope.get("query_string"):
+            target += b"?" + scope["query_string"]
+
+        try:
+            request = self._pool.request(method, target, headers, body)
+            # Streams opened with GET stay idle between events — no timeout
+            resp = await (request if method == "GET" else asyncio.wait_for(request, _POST_TIMEOUT))
+        except _UPSTREAM_ERRORS as e:
+            await send({"type": "http.response.start", "status": 502,
+                        "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+            await send({"type": "http.response.body", "body": f"Upstream error: {e}".encode("utf-8")})
+            return
+
+        rewrite = (scope["path"] == "/sse"
+                   and resp.header(b"content-type").startswith(b"text/event-stream"))
+        out_headers = [(k, v) for k, v in resp.headers
+                       if k in _RESPONSE_HEADERS and not (rewrite and k == b"content-length")]
+        try:
+            await send({"type": "http.response.start", "status": resp.status, "headers": out_headers})
+            if not resp.streaming:
+                await self._relay(resp, send, rewrite)
+                return
+            # Open-ended streams: stop reading upstream as soon as the client goes away
+            relay = asyncio.ensure_future(self._relay(resp, send, rewrite))
+            disconnect = asyncio.ensure_future(receive())
+            try:
+                await asyncio.wait((relay, disconnect), return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                disconnect.cancel()
+                if not relay.done():
+                    relay.cancel()
+                elif relay.exception():
+                    raise relay.exception()
+        except _UPSTREAM_ERRORS as e:
+            # Headers are already out; dropping the connection tells the client
+            log.debug(f"MCP proxy: upstream response cut short: {e!r}")
+        finally:
+            resp.close()
+
+    async def _relay(self, resp: _UpstreamResponse, send, rewrite_endpoint: bool):
+        """Send upstream body chunks unchanged as they arrive.
+
+        For the legacy SSE stream, the first event (the endpoint URL) is
+        buffered whole and rewritten so the client POSTs back through us.
+        """
+        pending = b""
+        async for chunk in resp.body():
+            if rewrite_endpoint:
+                pending += chunk
+                if b"\n\n" not in pending and b"\r\n\r\n" not in pending:
+                    continue
+                chunk, pending, rewrite_endpoint = _rewrite_sse_endpoint(pending, self.url), b"", False
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": pending and _rewrite_sse_endpoint(pending, self.url)})
+
+
+if uvicorn is None:
+    McpIdentityProxy = ThreadedMcpIdentityProxy  # noqa: F811
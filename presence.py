@@ -0,0 +1,260 @@
+"""Agent presence and activity tracking with an expiry heap.
+
+Heartbeats and MCP tool calls only stamp a timestamp; an agent that is
+already online costs no lock. Transitions (online, offline, active, idle)
+are found by a min-heap of deadlines and fired to observers the moment
+they happen, so nobody has to rescan every agent on a timer. An optional
+lost_timeout adds a later "lost" event for agents that stay silent (crashed
+wrappers).
+
+Reads never lock: is_online/is_active compare timestamps directly, and
+snapshot() returns an immutable view that is swapped on each transition.
+"""
+
+import heapq
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PresenceSnapshot:
+    """Immutable view of who is online/active. version bumps on every change."""
+    online: frozenset = frozenset()
+    active: frozenset = frozenset()
+    version: int = 0
+
+
+class PresenceTracker:
+    def __init__(self, presence_timeout: float = 10, activity_timeout: float = 8,
+                 lost_timeout: float | None = None, clock=time.time):
+        self.presence_timeout = presence_timeout
+        self.activity_timeout = activity_timeout
+        self.lost_timeout = lost_timeout
+        self._clock = clock
+        self._seen: dict[str, float] = {}       # name → last heartbeat/tool call
+        self._active_ts: dict[str, float] = {}  # name → last active=True report
+        self._heap: list[tuple[float, str, str]] = []  # (deadline, kind, name)
+        self._due: dict[tuple[str, str], float] = {}   # (kind, name) → live heap deadline
+        self._lock = threading.Lock()  # transitions + heap only, never plain touches
+        self._wake = threading.Condition(self._lock)
+        self._snapshot = PresenceSnapshot()
+        self._callbacks: list = []
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+    # --- Observers ---
+
+    def on_change(self, callback):
+        """Register a callback(event, name) for "online", "offline", "active",
+        "idle", "lost" and "renamed" (fired with the old name) transitions."""
+        self._callbacks.append(callback)
+
+    def _fire(self, events: list[tuple[str, str]]):
+        for event, name in events:
+            for cb in self._callbacks:
+                try:
+                    cb(event, name)
+                except Exception:
+                    pass
+
+    # --- Writes ---
+
+    def touch(self, name: str):
+        """Record a heartbeat or tool call."""
+        self._seen[name] = self._clock()
+        if name not in self._snapshot.online:
+            self._fire(self._mark_online(name))
+
+    def set_active(self, name: str, active: bool):
+        """Record the wrapper's terminal-activity report."""
+        if active:
+            self._active_ts[name] = self._clock()
+            if name in self._snapshot.active:
+                return
+        else:
+            self._active_ts.pop(name, None)
+            if name not in self._snapshot.active:
+                return
+        with self._lock:
+            snap = self._snapshot
+            if active and name not in snap.active:
+                self._publish(active=snap.active | {name})
+                self._push(self._active_ts.get(name, 0) + self.activity_timeout, "active", name)
+                events = [("active", name)]
+            elif not active and name in snap.active:
+                self._publish(active=snap.active - {name})
+                self._due.pop(("active", name), None)
+                events = [("idle", name)]
+            else:
+                events = []
+        self._fire(events)
+
+    def rename(self, old_name: str, new_name: str):
+        """Move all state to a new name without an offline transition."""
+        if old_name in self._seen:
+            self._seen[new_name] = self._seen.pop(old_name)
+        if old_name in self._active_ts:
+            self._active_ts[new_name] = self._active_ts.pop(old_name)
+        with self._lock:
+            snap = self._snapshot
+            events = []
+            online, active = set(snap.online), set(snap.active)
+            if old_name in online:
+                online.discard(old_name)
+                if new_name not in online:
+                    online.add(new_name)
+                    events.append(("online", new_name))
+                self._push(self._seen.get(new_name, 0) + self.presence_timeout, "online", new_name)
+            if old_name in active:
+                active.discard(old_name)
+                active.add(new_name)
+                self._push(self._active_ts.get(new_name, 0) + self.activity_timeout, "active", new_name)
+            lost_due = self._due.pop(("lost", old_name), None)
+            if lost_due is not None:
+                self._push(lost_due, "lost", new_name)
+            self._due.pop(("online", old_name), None)
+            self._due.pop(("active", old_name), None)
+            if online != snap.online or active != snap.active:
+                self._publish(online=frozenset(online), active=frozenset(active))
+            events.insert(0, ("renamed", old_name))
+        self._fire(events)
+
+    def remove(self, name: str):
+        """Forget an agent entirely (deregistered). Fires offline if it was online."""
+        self._seen.pop(name, None)
+        self._active_ts.pop(name, None)
+        with self._lock:
+            snap = self._snapshot
+            events = []
+            if name in snap.active:
+                events.append(("idle", name))
+            if name in snap.online:
+                events.append(("offline", name))
+            self._due.pop(("online", name), None)
+            self._due.pop(("active", name), None)
+            self._due.pop(("lost", name), None)
+            if events:
+                self._publish(online=snap.online - {name}, active=snap.active - {name})
+        self._fire(events)
+
+    # --- Reads (lock-free) ---
+
+    def is_online(self, name: str) -> bool:
+        ts = self._seen.get(name)
+        return ts is not None and self._clock() - ts < self.presence_timeout
+
+    def is_active(self, name: str) -> bool:
+        if name not in self._snapshot.active:
+            return False
+        return self._clock() - self._active_ts.get(name, 0) <= self.activity_timeout
+
+    def last_seen(self, name: str) -> float:
+        """Timestamp of the last heartbeat/tool call, or 0 if never seen."""
+        return self._seen.get(name, 0)
+
+    def online(self) -> list[str]:
+        return [name for name in self._snapshot.online if self.is_online(name)]
+
+    def snapshot(self) -> PresenceSnapshot:
+        return self._snapshot
+
+    # --- Expiry ---
+
+    def expire(self) -> float | None:
+        """Apply every transition that is due now. Returns the next deadline."""
+        events = []
+        with self._lock:
+            now = self._clock()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, kind, name = heapq.heappop(self._heap)
+                if self._due.get((kind, name)) != deadline:
+                    continue  # superseded by remove/rename/re-push
+                del self._due[(kind, name)]
+                events.extend(self._expire_entry(kind, name, now))
+            next_deadline = self._heap[0][0] if self._heap else None
+        self._fire(events)
+        return next_deadline
+
+    def _expire_entry(self, kind: str, name: str, now: float) -> list[tuple[str, str]]:
+        snap = self._snapshot
+        if kind == "online":
+            if name not in snap.online:
+                return []
+            deadline = self._seen.get(name, 0) + self.presence_timeout
+            if deadline > now:
+                self._push(deadline, "online", name)  # touched since — look again later
+                return []
+            self._publish(online=snap.online - {name}, active=snap.active - {name})
+            # A touch that raced the removal saw the old snapshot; take it back.
+            if self._seen.get(name, 0) + self.presence_timeout > now:
+                self._publish(online=snap.online, active=snap.active)
+                self._push(self._seen[name] + self.presence_timeout, "online", name)
+                return []
+            self._due.pop(("active", name), None)
+            if self.lost_timeout is not None:
+                self._push(self._seen.get(name, 0) + self.lost_timeout, "lost", name)
+            events = [("idle", name)] if name in snap.active else []
+            return events + [("offline", name)]
+        if kind == "lost":
+            # Only if still silent; coming back online cancels it, and the
+            # next offline transition schedules a fresh one.
+            if name in snap.online or name not in self._seen:
+                return []
+            return [("lost", name)]
+        if name not in snap.active:
+            return []
+        deadline = self._active_ts.get(name, 0) + self.activity_timeout
+        if deadline > now:
+            self._push(deadline, "active", name)
+            return []
+        self._publish(active=snap.active - {name})
+        return [("idle", name)]
+
+    def start(self):
+        """Run expiry on a background thread that sleeps until the next deadline."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="presence")
+            self._thread.start()
+
+    def close(self):
+        with self._wake:
+            self._closed = True
+            self._wake.notify_all()
+
+    def _run(self):
+        while True:
+            self.expire()
+            with self._wake:
+                if self._closed:
+                    return
+                if not self._heap:
+                    self._wake.wait()
+                else:
+                    delay = self._heap[0][0] - self._clock()
+                    if delay > 0:
+                        self._wake.wait(delay)
+
+    # --- Internals (caller holds self._lock) ---
+
+    def _mark_online(self, name: str) -> list[tuple[str, str]]:
+        with self._lock:
+            snap = self._snapshot
+            if name in snap.online or name not in self._seen:
+                return []
+            self._publish(online=snap.online | {name})
+            self._push(self._seen[name] + self.presence_timeout, "online", name)
+        return [("online", name)]
+
+    def _push(self, deadline: float, kind: str, name: str):
+        self._due[(kind, name)] = deadline
+        heapq.heappush(self._heap, (deadline, kind, name))
+        self._wake.notify()
+
+    def _publish(self, online=None, active=None):
+        snap = self._snapshot
+        self._snapshot = PresenceSnapshot(
+            online=snap.online if online is None else frozenset(online),
+            active=snap.active if active is None else frozenset(active),
+            version=snap.version + 1,
+        )
@@ -0,0 +1,107 @@
+"""Token-bucket rate limiting for MCP tool calls, per identity and per tool.
+
+Configured from [mcp.rate_limits] in config.toml:
+
+  per_minute = 120   # sustained calls/minute allowed per agent per tool
+  burst = 20         # calls allowed back-to-back before the rate applies
+  chat_send = 30     # per-tool override of per_minute (0 = unlimited)
+
+Limiting is off unless some limit is set. Buckets that have refilled are
+dropped every SWEEP_INTERVAL seconds (a fresh bucket behaves the same), so
+departed agents don't accumulate. Counters for allowed/rejected calls are
+kept for /api/metrics.
+"""
+
+import threading
+import time
+
+SWEEP_INTERVAL = 60.0  # seconds between sweeps of idle (full) buckets
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate          # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take one token. Returns 0 if allowed, else seconds until one is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class RateLimiter:
+    def __init__(self, per_minute: float = 0, burst: int = 20,
+                 tools: dict[str, float] | None = None, clock=time.monotonic):
+        self.per_minute = per_minute
+        self.burst = max(1, burst)
+        self.tools = dict(tools or {})
+        self._clock = clock
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+        self._allowed: dict[str, int] = {}
+        self._rejected: dict[str, int] = {}
+        self._rejected_by_agent: dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, cfg: dict | None) -> "RateLimiter | None":
+        """Build from the [mcp.rate_limits] section; None when absent,
+        disabled, or no limit is set."""
+        if not cfg or not cfg.get("enabled", True):
+            return None
+        tools = {k: float(v) for k, v in cfg.items()
+                 if k not in ("enabled", "per_minute", "burst") and isinstance(v, (int, float))}
+        per_minute = float(cfg.get("per_minute", 0))
+        if per_minute <= 0 and not any(v > 0 for v in tools.values()):
+            return None
+        return cls(per_minute, int(cfg.get("burst", 20)), tools)
+
+    def limit_for(self, tool: str) -> float:
+        """Calls per minute allowed for a tool (0 = unlimited)."""
+        return self.tools.get(tool, self.per_minute)
+
+    def check(self, identity: str, tool: str) -> float:
+        """Record a call. Returns 0 if allowed, else seconds the caller should wait."""
+        limit = self.limit_for(tool)
+        with self._lock:
+            now = self._clock()
+            if now - self._last_sweep >= SWEEP_INTERVAL:
+                self._last_sweep = now
+                self._buckets = {k: b for k, b in self._buckets.items() if not b.full(now)}
+            if limit <= 0:
+                wait = 0.0
+            else:
+                key = (identity, tool)
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = TokenBucket(
+                        limit / 60.0, min(self.burst, max(1, limit)), now)
+                wait = bucket.take(now)
+            if wait:
+                self._rejected[tool] = self._rejected.get(tool, 0) + 1
+                self._rejected_by_agent[identity] = self._rejected_by_agent.get(identity, 0) + 1
+            else:
+                self._allowed[tool] = self._allowed.get(tool, 0) + 1
+        return wait
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "per_minute": self.per_minute,
+                "burst": self.burst,
+                "tool_limits": dict(self.tools),
+                "allowed": dict(self._allowed),
+                "rejected": dict(self._rejected),
+                "rejected_by_agent": dict(self._rejected_by_agent),
+            }
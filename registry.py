@@ -41,6 +41,7 @@ class RuntimeRegistry:
         self._reserved: dict[str, float] = {}       # name → deregister timestamp
         self._renames: dict[str, str] = {}           # old name → new name (for heartbeat redirect)
         self._on_change_cbs: list = []
+        self._version = 0                            # bumped on every change notification
         self._data_dir = Path(data_dir)
         self._load_renames()
 
@@ -57,6 +58,8 @@ class RuntimeRegistry:
         self._on_change_cbs.append(cb)
 
     def _notify(self):
+        with self._lock:
+            self._version += 1
         for cb in self._on_change_cbs:
             try:
                 cb()
@@ -403,6 +406,16 @@ class RuntimeRegistry:
         with self._lock:
             return [n for n, i in self._instances.items() if i.state == "active"]
 
+    def get_routing_names(self) -> tuple[int, list[str], list[str]]:
+        """(version, base names, active instance names), read atomically.
+
+        A higher version never carries older names, so consumers can drop
+        snapshots that arrive out of order from concurrent notifications.
+        """
+        with self._lock:
+            active = [n for n, i in self._instances.items() if i.state == "active"]
+            return self._version, list(self._bases), active
+
     def get_instances_for(self, base: str) -> list[dict]:
         with self._lock:
             return [_inst_dict(i) for i in self._instances.values() if i.base == base]
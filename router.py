@@ -1,102 +1,333 @@
-"""Message routing based on @mentions with per-channel loop guard."""
+"""Message routing based on @mentions with a per-thread loop guard.
+
+Agent names are compiled into a character trie, and every message is
+classified in one pass: mentions, the slash command left once all @handles
+are stripped, and any ```session draft block. The names, the online set and
+the trie live in an immutable RoutingSnapshot. Registry changes push a new
+snapshot and readers never lock. @all/@both expand from the snapshot's
+precomputed online list instead of calling back into the registry.
+
+Hops are counted per conversation thread, not per channel. A human
+message starts a thread, or rejoins one if it replies into it. An agent
+message joins the thread of the message it replies to, or else the thread
+that last triggered that agent. The loop guard pauses only the runaway
+thread, so independent agent conversations in one channel keep their own
+budgets. Thread state is shared by the event loop and MCP threads and is
+guarded by one lock; classification stays lock-free.
+"""
 
 import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+_SESSION_DRAFT_RE = re.compile(r'```session\s*\n(.*?)\n```', re.DOTALL)
+_HANDLE_RE = re.compile(r"[\w-]+\s*")  # what follows "@" in a stripped handle
+_BROADCAST_MENTIONS = ("both", "all")
+_END = ""  # trie key marking the end of a name
+MAX_THREADS = 1024   # thread states kept; least recently used are dropped
+MAX_MESSAGES = 8192  # message id -> thread entries kept for reply_to lookups
+
+
+def _is_handle_char(c: str) -> bool:
+    return c.isalnum() or c == "_" or c == "-"
+
+
+def _build_trie(names) -> dict:
+    trie: dict = {}
+    for name in names:
+        node = trie
+        for c in name:
+            node = node.setdefault(c, {})
+        node[_END] = name
+    return trie
+
+
+@dataclass(frozen=True)
+class RoutingSnapshot:
+    """Immutable routing view. online is None when no online set was pushed
+    (fall back to the online_checker); everyone is what @all expands to."""
+    agent_names: frozenset = frozenset()
+    online: frozenset | None = None
+    everyone: tuple = ()
+    trie: dict | None = None
+    version: int = 0
+
+
+@dataclass(frozen=True)
+class MessageInfo:
+    """Result of Router.classify: one scan of a message's text."""
+    mentions: list
+    stripped: str                # lowercased text with every @handle removed
+    command: str                 # first word of stripped if it is a /command
+    session_draft: str | None    # body of a ```session block, if any
+
+
+@dataclass(frozen=True)
+class Route:
+    """Result of Router.route: who to trigger and the thread it counted against."""
+    targets: list
+    thread: tuple       # (channel, origin); origin None is the channel's ambient thread
+    paused: bool        # the thread is paused by the loop guard
+    hop_count: int
 
 
 class Router:
     def __init__(self, agent_names: list[str], default_mention: str = "both",
                  max_hops: int = 4, online_checker=None):
-        self.agent_names = set(n.lower() for n in agent_names)
         self.default_mention = default_mention
         self.max_hops = max_hops
         self._online_checker = online_checker  # callable() -> set of online agent names
-        # Per-channel state: { channel: { hop_count, paused, guard_emitted } }
-        self._channels: dict[str, dict] = {}
-        self._build_pattern()
-
-    def _get_ch(self, channel: str) -> dict:
-        if channel not in self._channels:
-            self._channels[channel] = {
-                "hop_count": 0,
-                "paused": False,
-                "guard_emitted": False,
-            }
-        return self._channels[channel]
-
-    def _build_pattern(self):
-        # Sort longest-first so "gemini-2" is tried before "gemini"
-        names = [re.escape(n) for n in sorted(self.agent_names, key=len, reverse=True)]
-        alternatives = "|".join(names + ["both", "all"])
-        self._mention_re = re.compile(
-            rf"@({alternatives})(?![\w-])", re.IGNORECASE
-        )
+        # Per-thread state: { (channel, origin): { hop_count, paused, guard_emitted } }
+        self._threads: OrderedDict[tuple, dict] = OrderedDict()
+        self._msg_thread: OrderedDict[int, tuple] = OrderedDict()  # message id -> thread
+        self._agent_thread: dict[tuple, tuple] = {}  # (channel, agent) -> thread that last triggered it
+        self._next_origin = 0  # origins for human messages that carry no id
+        self._stats: dict[str, dict] = {}
+        self._lock = threading.Lock()  # guards the thread state above
+        self._snapshot_lock = threading.Lock()  # serialises snapshot swaps; readers don't take it
+        self._snapshot = RoutingSnapshot()
+        self.update_agents(agent_names)
 
-    def parse_mentions(self, text: str) -> list[str]:
-        mentions = set()
-        for match in self._mention_re.finditer(text):
-            name = match.group(1).lower()
-            if name in ("both", "all"):
-                # Only tag online agents when using @all
-                if self._online_checker:
-                    online = self._online_checker()
-                    mentions.update(n for n in self.agent_names if n in online)
-                else:
-                    mentions.update(self.agent_names)
+    @property
+    def agent_names(self) -> frozenset:
+        return self._snapshot.agent_names
+
+    @property
+    def snapshot(self) -> RoutingSnapshot:
+        return self._snapshot
+
+    # --- Threads ---
+
+    def _get_thread(self, key: tuple) -> dict:
+        th = self._threads.get(key)
+        if th is None:
+            th = self._threads[key] = {"hop_count": 0, "paused": False, "guard_emitted": False}
+            self._channel_stats(key[0])["threads"] += 1
+            if len(self._threads) > MAX_THREADS:
+                old, _ = self._threads.popitem(last=False)
+                self._agent_thread = {k: v for k, v in self._agent_thread.items() if v != old}
+        else:
+            self._threads.move_to_end(key)
+        return th
+
+    def _channel_stats(self, channel: str) -> dict:
+        st = self._stats.get(channel)
+        if st is None:
+            st = self._stats[channel] = {"hops": 0, "pauses": 0, "resumes": 0, "threads": 0}
+        return st
+
+    def _thread_for(self, sender: str, channel: str, is_agent: bool,
+                    msg_id, reply_to, thread) -> tuple:
+        if thread is not None:
+            return (channel, thread)
+        if reply_to is not None and reply_to in self._msg_thread:
+            return self._msg_thread[reply_to]
+        if is_agent:
+            return self._agent_thread.get((channel, sender.lower()), (channel, None))
+        if msg_id is None:
+            self._next_origin += 1
+            return (channel, f"h{self._next_origin}")
+        return (channel, msg_id)
+
+    def bind(self, channel: str, agents, thread: tuple):
+        """Record that these agents were triggered from thread, so their
+        next unthreaded message counts against it (e.g. resolved instance
+        names that differ from the mentioned base name)."""
+        with self._lock:
+            self._bind(channel, agents, thread)
+
+    def _bind(self, channel: str, agents, thread: tuple):
+        for name in agents:
+            self._agent_thread[(channel, name.lower())] = thread
+
+    # --- Snapshot updates ---
+
+    def update_snapshot(self, names: list[str], online=None, version: int | None = None) -> bool:
+        """Install a new name/online snapshot. Pushes carrying a version no
+        newer than the current one are stale (callbacks raced) and dropped.
+        Returns True if the snapshot was replaced."""
+        current = self._snapshot
+        if version is not None and version <= current.version:
+            return False
+        agent_names = frozenset(n.lower() for n in names)
+        online_set = None if online is None else frozenset(n.lower() for n in online)
+        trie = current.trie if agent_names == current.agent_names and current.trie is not None \
+            else _build_trie(list(agent_names) + list(_BROADCAST_MENTIONS))
+        everyone = tuple(sorted(agent_names if online_set is None else agent_names & online_set))
+        # Built outside the lock; the version compare and the swap are one step
+        with self._snapshot_lock:
+            latest = self._snapshot
+            if version is None:
+                version = latest.version + 1
+            elif version <= latest.version:
+                return False
+            self._snapshot = RoutingSnapshot(agent_names, online_set, everyone, trie, version)
+        return True
+
+    def update_agents(self, names: list[str]):
+        """Replace the agent name set, keeping the current online set."""
+        self.update_snapshot(names, self._snapshot.online)
+
+    def update_online(self, online, version: int | None = None) -> bool:
+        """Replace the online set used to expand @all/@both."""
+        return self.update_snapshot(self._snapshot.agent_names, online, version)
+
+    # --- Classification ---
+
+    def _everyone(self, snap: RoutingSnapshot) -> tuple:
+        if snap.online is None and self._online_checker:
+            online = self._online_checker()
+            return tuple(n for n in snap.everyone if n in online)
+        return snap.everyone
+
+    def classify(self, text: str) -> MessageInfo:
+        """Scan text once for mentions, the slash command and a session block.
+
+        A mention is "@" followed by the longest known name (case-insensitive)
+        that is not immediately followed by another handle character, so
+        "@telegram" never matches inside "@telegram-bridge".
+        """
+        snap = self._snapshot
+        trie = snap.trie
+        mentions: dict[str, None] = {}
+        pieces = []
+        n = len(text)
+        last = i = 0
+        while True:
+            i = text.find("@", i)
+            if i < 0:
+                break
+            node, j, found = trie, i + 1, None
+            while j < n:
+                node = node.get(text[j].lower())
+                if node is None:
+                    break
+                j += 1
+                if _END in node and (j == n or not _is_handle_char(text[j])):
+                    found = node[_END]
+            if found in _BROADCAST_MENTIONS:
+                mentions.update(dict.fromkeys(self._everyone(snap)))
+            elif found is not None:
+                mentions[found] = None
+            handle = _HANDLE_RE.match(text, i + 1)
+            if handle:
+                pieces.append(text[last:i])
+                last = handle.end()
+                i = last
             else:
-                mentions.add(name)
-        return list(mentions)
+                i += 1
+        pieces.append(text[last:])
+        stripped = "".join(pieces).strip().lower()
+        command = stripped.split(None, 1)[0] if stripped.startswith("/") else ""
+        draft = _SESSION_DRAFT_RE.search(text) if "```session" in text else None
+        return MessageInfo(list(mentions), stripped, command,
+                           draft.group(1) if draft else None)
+
+    def parse_mentions(self, text: str) -> list[str]:
+        return self.classify(text).mentions
 
     def _is_agent(self, sender: str) -> bool:
-        return sender.lower() in self.agent_names
+        return sender.lower() in self._snapshot.agent_names
 
-    def get_targets(self, sender: str, text: str, channel: str = "general") -> list[str]:
-        """Determine which agents should receive this message."""
-        ch = self._get_ch(channel)
-        mentions = self.parse_mentions(text)
-
-        if not self._is_agent(sender):
-            # Human message resets hop counter and unpauses
-            ch["hop_count"] = 0
-            ch["paused"] = False
-            ch["guard_emitted"] = False
+    def route(self, sender: str, text: str, channel: str = "general", *,
+              msg_id: int | None = None, reply_to: int | None = None,
+              thread=None, mentions: list[str] | None = None) -> Route:
+        """Determine which agents should receive this message and count the
+        hop against its thread. thread pins an explicit origin (e.g. a job).
+
+        Pass mentions from an earlier classify() to skip re-scanning text.
+        """
+        if mentions is None:
+            mentions = self.parse_mentions(text)
+        is_agent = self._is_agent(sender)
+        with self._lock:
+            return self._route_locked(sender, channel, is_agent, mentions, msg_id, reply_to, thread)
+
+    def _route_locked(self, sender: str, channel: str, is_agent: bool, mentions: list,
+                      msg_id, reply_to, thread) -> Route:
+        key = self._thread_for(sender, channel, is_agent, msg_id, reply_to, thread)
+        th = self._get_thread(key)
+        if msg_id is not None:
+            self._msg_thread[msg_id] = key
+            if len(self._msg_thread) > MAX_MESSAGES:
+                self._msg_thread.popitem(last=False)
+
+        if not is_agent:
+            # Human message resets its thread's hop counter and unpauses it
+            th["hop_count"] = 0
+            th["paused"] = False
+            th["guard_emitted"] = False
             if not mentions:
                 if self.default_mention in ("both", "all"):
-                    return list(self.agent_names)
+                    targets = list(self._snapshot.agent_names)
                 elif self.default_mention == "none":
-                    return []
-                return [self.default_mention]
-            return mentions
+                    targets = []
+                else:
+                    targets = [self.default_mention]
+            else:
+                targets = mentions
+        elif th["paused"] or not mentions:
+            # Agent message: blocked while loop guard is active, and only
+            # routed on an explicit @mention
+            targets = []
         else:
-            # Agent message: blocked while loop guard is active
-            if ch["paused"]:
-                return []
-            # Only route if explicit @mention
-            if not mentions:
-                return []
-            ch["hop_count"] += 1
-            if ch["hop_count"] > self.max_hops:
-                ch["paused"] = True
-                return []
-            # Don't route back to self
-            return [m for m in mentions if m != sender]
-
-    def continue_routing(self, channel: str = "general"):
-        """Resume after loop guard pause."""
-        ch = self._get_ch(channel)
-        ch["hop_count"] = 0
-        ch["paused"] = False
-        ch["guard_emitted"] = False
-
-    def is_paused(self, channel: str = "general") -> bool:
-        return self._get_ch(channel)["paused"]
-
-    def is_guard_emitted(self, channel: str = "general") -> bool:
-        return self._get_ch(channel)["guard_emitted"]
-
-    def set_guard_emitted(self, channel: str = "general"):
-        self._get_ch(channel)["guard_emitted"] = True
+            th["hop_count"] += 1
+            stats = self._channel_stats(channel)
+            stats["hops"] += 1
+            if th["hop_count"] > self.max_hops:
+                th["paused"] = True
+                stats["pauses"] += 1
+                targets = []
+            else:
+                # Don't route back to self
+                targets = [m for m in mentions if m != sender]
+        self._bind(channel, targets, key)
+        return Route(targets, key, th["paused"], th["hop_count"])
 
-    def update_agents(self, names: list[str]):
-        """Replace the agent name set and rebuild the mention regex."""
-        self.agent_names = set(n.lower() for n in names)
-        self._build_pattern()
+    def get_targets(self, sender: str, text: str, channel: str = "general",
+                    mentions: list[str] | None = None) -> list[str]:
+        """Determine which agents should receive this message."""
+        return self.route(sender, text, channel, mentions=mentions).targets
+
+    def _paused_threads(self, channel: str, thread: tuple | None) -> list[dict]:
+        if thread is not None:
+            th = self._threads.get(thread)
+            return [th] if th and th["paused"] else []
+        return [th for key, th in self._threads.items() if key[0] == channel and th["paused"]]
+
+    def continue_routing(self, channel: str = "general", thread: tuple | None = None):
+        """Resume after loop guard pause: one thread, or every paused thread in channel."""
+        with self._lock:
+            for th in self._paused_threads(channel, thread):
+                th["hop_count"] = 0
+                th["paused"] = False
+                th["guard_emitted"] = False
+                self._channel_stats(channel)["resumes"] += 1
+
+    def is_paused(self, channel: str = "general", thread: tuple | None = None) -> bool:
+        with self._lock:
+            return bool(self._paused_threads(channel, thread))
+
+    def is_guard_emitted(self, channel: str = "general", thread: tuple | None = None) -> bool:
+        with self._lock:
+            paused = self._paused_threads(channel, thread)
+            return bool(paused) and all(th["guard_emitted"] for th in paused)
+
+    def set_guard_emitted(self, channel: str = "general", thread: tuple | None = None):
+        with self._lock:
+            for th in self._paused_threads(channel, thread):
+                th["guard_emitted"] = True
+
+    def stats(self) -> dict:
+        """Per-channel counters: hops, pauses, resumes, threads started, and
+        the live/paused thread counts."""
+        with self._lock:
+            out = {ch: dict(st, live_threads=0, paused_threads=0) for ch, st in self._stats.items()}
+            threads = [(key[0], th["paused"]) for key, th in self._threads.items()]
+        for channel, paused in threads:
+            st = out.setdefault(channel, {"hops": 0, "pauses": 0, "resumes": 0, "threads": 0,
+                                          "live_threads": 0, "paused_threads": 0})
+            st["live_threads"] += 1
+            st["paused_threads"] += paused
+        return out
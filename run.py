@@ -1,4 +1,8 @@
-"""Entry point — starts MCP server (port 8200) + web UI (port 8300)."""
+"""Entry point — starts MCP server (port 8200) + web UI (port 8300).
+
+With [mcp] mount = true the MCP transports are served by the web UI's own
+server and event loop instead of separate ports.
+"""
 
 import argparse
 import asyncio
@@ -44,7 +48,7 @@ def main():
     # wrappers use identical extraction logic.
     _parse_args()
 
-    from config_loader import apply_cli_overrides, load_config
+    from config_loader import apply_cli_overrides, load_config, mcp_config
     apply_cli_overrides()
 
     config_path = ROOT / "config.toml"
@@ -73,24 +77,34 @@ def main():
     mcp_bridge.config = config
     mcp_bridge.router = app_router
     mcp_bridge.agents = app_agents
+    from ratelimit import RateLimiter
+    mcp_bridge.rate_limiter = RateLimiter.from_config(config.get("mcp", {}).get("rate_limits"))
 
     # Enable cursor and role persistence across restarts
     data_dir = ROOT / config.get("server", {}).get("data_dir", "./data")
     mcp_bridge._CURSORS_FILE = data_dir / "mcp_cursors.json"
     mcp_bridge._load_cursors()
+    mcp_bridge.start_cursor_writer()
+    mcp_bridge.presence.start()
     mcp_bridge._ROLES_FILE = data_dir / "roles.json"
     mcp_bridge._load_roles()
 
-    # Start MCP servers in background threads
-    http_port = config.get("mcp", {}).get("http_port", 8200)
-    sse_port = config.get("mcp", {}).get("sse_port", 8201)
-    mcp_bridge.mcp_http.settings.port = http_port
-    mcp_bridge.mcp_sse.settings.port = sse_port
-
-    threading.Thread(target=mcp_bridge.run_http_server, daemon=True).start()
-    threading.Thread(target=mcp_bridge.run_sse_server, daemon=True).start()
-    time.sleep(0.5)
-    logging.getLogger(__name__).info("MCP streamable-http on port %d, SSE on port %d", http_port, sse_port)
+    # Start MCP servers — mounted on the web app (one loop, one port) or
+    # as standalone servers in background threads
+    mcp_cfg = mcp_config(config)
+    http_port = mcp_cfg.get("http_port", 8200)
+    sse_port = mcp_cfg.get("sse_port", 8201)
+    if mcp_cfg.get("mount"):
+        mcp_bridge.mount_on(app)
+        logging.getLogger(__name__).info("MCP streamable-http and SSE mounted on the web server (port %d)", http_port)
+    else:
+        mcp_bridge.mcp_http.settings.port = http_port
+        mcp_bridge.mcp_sse.settings.port = sse_port
+
+        threading.Thread(target=mcp_bridge.run_http_server, daemon=True).start()
+        threading.Thread(target=mcp_bridge.run_sse_server, daemon=True).start()
+        time.sleep(0.5)
+        logging.getLogger(__name__).info("MCP streamable-http on port %d, SSE on port %d", http_port, sse_port)
 
     # Mount static files
     from fastapi.staticfiles import StaticFiles
@@ -121,6 +135,12 @@ def main():
         if session_engine:
             session_engine.resume_active_sessions()
 
+    @app.on_event("shutdown")
+    async def on_shutdown():
+        # Let an in-flight session advance finish saving before exit
+        if session_engine:
+            await asyncio.to_thread(session_engine.close)
+
     # Run web server
     import uvicorn
     host = config.get("server", {}).get("host", "127.0.0.1")
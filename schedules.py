@@ -1,12 +1,27 @@
-"""Schedule store — recurring prompts fired without human intervention."""
+"""Schedule store — recurring prompts fired without human intervention.
 
+ScheduleRunner fires them: schedules sit in a min-heap keyed by next_run
+and one thread sleeps until the earliest is due, woken early whenever a
+schedule is created, toggled or deleted.
+"""
+
+import functools
+import heapq
 import json
+import logging
+import random
 import re
 import time
 import threading
 import uuid
+from datetime import datetime, timedelta
 from pathlib import Path
 
+log = logging.getLogger(__name__)
+
+MISFIRE_POLICIES = ("fire_once", "skip")
+_MAX_SLEEP = 60  # re-check the wall clock at least this often (suspend, clock changes)
+
 
 # Interval parsing: "every 30m", "every 1h", "every 2h", "daily at 09:00"
 _INTERVAL_RE = re.compile(
@@ -51,13 +66,112 @@ def parse_schedule_spec(spec: str) -> tuple[int | None, str | None]:
     return (None, None)
 
 
+# Cron: "minute hour day-of-month month day-of-week", with *, lists, ranges,
+# steps and jan-dec / sun-sat names; day-of-week 0 and 7 are both Sunday.
+_CRON_FIELDS = (
+    ("minute", 0, 59, {}),
+    ("hour", 0, 23, {}),
+    ("day of month", 1, 31, {}),
+    ("month", 1, 12, {m: i + 1 for i, m in enumerate(
+        ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"))}),
+    ("day of week", 0, 7, {d: i for i, d in enumerate(("sun", "mon", "tue", "wed", "thu", "fri", "sat"))}),
+)
+_CRON_SPEC_RE = re.compile(r"^cron\s+(.+)$", re.IGNORECASE)
+_CRON_LEAD_FIELD_RE = re.compile(r"^[\d*][\d*,/\-]*$")
+
+
+def _cron_value(text: str, names: dict) -> int:
+    return names[text] if text in names else int(text)
+
+
+@functools.lru_cache(maxsize=256)
+def parse_cron(expr: str) -> tuple:
+    """Parse a 5-field cron expression.
+
+    Returns (minutes, hours, days, months, weekdays, dom_any, dow_any) where
+    the first five are frozensets and weekdays uses 0 = Sunday. Raises
+    ValueError for malformed expressions.
+    """
+    fields = expr.lower().split()
+    if len(fields) != 5:
+        raise ValueError(f"cron expression needs 5 fields, got {len(fields)}: {expr!r}")
+    sets = []
+    for text, (name, lo, hi, names) in zip(fields, _CRON_FIELDS):
+        values = set()
+        for part in text.split(","):
+            rng, _, step = part.partition("/")
+            try:
+                step_n = int(step) if step else 1
+                if rng == "*":
+                    a, b = lo, hi
+                elif "-" in rng:
+                    a, b = (_cron_value(x, names) for x in rng.split("-", 1))
+                else:
+                    a = _cron_value(rng, names)
+                    b = hi if step else a
+            except (ValueError, KeyError):
+                raise ValueError(f"bad {name} field {text!r} in cron expression {expr!r}") from None
+            if step_n < 1 or not lo <= a <= b <= hi:
+                raise ValueError(f"bad {name} field {text!r} in cron expression {expr!r}")
+            values.update(range(a, b + 1, step_n))
+        sets.append(frozenset(values))
+    weekdays = frozenset(d % 7 for d in sets[4])
+    # Classic cron: when both day fields are restricted, either may match
+    return (sets[0], sets[1], sets[2], sets[3], weekdays,
+            fields[2].startswith("*"), fields[4].startswith("*"))
+
+
+def cron_next(expr: str, after: float) -> float:
+    """First local-time minute strictly after `after` matching the expression."""
+    minutes, hours, days, months, weekdays, dom_any, dow_any = parse_cron(expr)
+    dt = datetime.fromtimestamp(after).replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = dt + timedelta(days=366 * 5)
+    while dt < limit:
+        if dt.month not in months:
+            dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            continue
+        dom_ok = dt.day in days
+        dow_ok = (dt.weekday() + 1) % 7 in weekdays
+        if not ((dom_ok and dow_ok) if dom_any or dow_any else (dom_ok or dow_ok)):
+            dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            continue
+        if dt.hour not in hours:
+            dt = dt.replace(minute=0) + timedelta(hours=1)
+            continue
+        if dt.minute not in minutes:
+            dt += timedelta(minutes=1)
+            continue
+        return dt.timestamp()
+    raise ValueError(f"cron expression never matches: {expr!r}")
+
+
+def cron_from_spec(spec: str) -> str | None:
+    """Return the cron expression in a schedule spec, or None if it isn't one.
+
+    Accepts "cron 0 9 * * mon-fri" or the bare five fields ("*/15 * * * *").
+    Raises ValueError if the spec is a cron expression but a malformed one.
+    """
+    spec = spec.strip()
+    m = _CRON_SPEC_RE.match(spec)
+    fields = (m.group(1) if m else spec).split()
+    if not m and (len(fields) != 5 or not all(_CRON_LEAD_FIELD_RE.match(f) for f in fields[:2])):
+        return None
+    expr = " ".join(fields)
+    parse_cron(expr)
+    return expr
+
+
 def compute_next_run(
     interval_seconds: int,
     last_run: float | None,
     daily_at: str | None = None,
+    cron: str | None = None,
 ) -> float:
-    """Compute next run timestamp. daily_at is "HH:MM" for daily schedules."""
+    """Compute next run timestamp. daily_at is "HH:MM" for daily schedules;
+    cron is a 5-field cron expression and takes precedence."""
     now = time.time()
+    if cron:
+        return cron_next(cron, now if last_run is None else last_run)
     if last_run is None:
         if daily_at:
             # First run: today at HH:MM, or tomorrow if already past
@@ -85,6 +199,27 @@ def compute_next_run(
     return last_run + interval_seconds
 
 
+def next_occurrence(schedule: dict, now: float) -> float:
+    """First un-jittered run time after both `now` and the current slot.
+
+    Intervals stay aligned to the previous slot (no drift from late firing
+    or jitter); runs missed entirely are skipped, not queued.
+    """
+    interval = schedule.get("interval_seconds") or 86400
+    prev = schedule.get("base_run") or schedule.get("next_run") or now
+    base = max(now, prev)
+    if schedule.get("cron") or schedule.get("daily_at"):
+        return compute_next_run(interval, base, daily_at=schedule.get("daily_at"),
+                                cron=schedule.get("cron"))
+    return prev + ((base - prev) // interval + 1) * interval
+
+
+def _jitter(schedule: dict) -> float:
+    """Random delay within the schedule's spread window (0 = fire on the slot)."""
+    window = schedule.get("jitter_seconds") or 0
+    return random.uniform(0, window) if window > 0 else 0.0
+
+
 class ScheduleStore:
     def __init__(self, path: str):
         self._path = Path(path)
@@ -145,10 +280,14 @@ class ScheduleStore:
         one_shot: bool = False,
         send_at: float | None = None,
         created_by: str = "user",
+        cron: str | None = None,
+        jitter_seconds: int = 0,
     ) -> dict:
-        """Create a schedule. Either interval_seconds or daily_at must be set.
+        """Create a schedule. One of interval_seconds, daily_at or cron must be set.
         If one_shot=True, the schedule auto-deletes after firing once.
-        If send_at is provided (epoch), use it as next_run directly.
+        If send_at is provided (epoch), use it as the first slot directly.
+        jitter_seconds spreads each run randomly over that many seconds after
+        its slot. Raises ValueError for a cron expression that never matches.
         """
         schedule_id = str(uuid.uuid4())[:8]
         now = time.time()
@@ -156,12 +295,13 @@ class ScheduleStore:
         if daily_at:
             interval_seconds = 86400
         if send_at:
-            next_run = send_at
+            base_run = send_at
         else:
-            next_run = compute_next_run(
+            base_run = compute_next_run(
                 interval_seconds or 86400,
                 last_run,
                 daily_at=daily_at,
+                cron=cron,
             )
         with self._lock:
             s = {
@@ -169,15 +309,18 @@ class ScheduleStore:
                 "prompt": prompt.strip()[:500],
                 "targets": [t.strip().lstrip("@") for t in targets if t.strip()],
                 "channel": channel or "general",
-                "interval_seconds": interval_seconds or 86400,
+                "interval_seconds": None if cron else interval_seconds or 86400,
                 "daily_at": daily_at,
-                "next_run": next_run,
+                "cron": cron,
+                "jitter_seconds": max(0, int(jitter_seconds or 0)),
+                "base_run": base_run,
                 "created_at": now,
                 "last_run": None,
                 "active": True,
                 "one_shot": one_shot,
                 "created_by": created_by,
             }
+            s["next_run"] = base_run + _jitter(s)
             self._schedules.append(s)
             self._save()
         self._fire("create", s)
@@ -190,19 +333,18 @@ class ScheduleStore:
             due = [s for s in self._schedules if s.get("active") and s.get("next_run", 0) <= now]
         return [dict(s) for s in due]
 
-    def mark_run(self, schedule_id: str) -> dict | None:
-        """Mark schedule as run, advance next_run. Returns updated schedule."""
+    def mark_run(self, schedule_id: str, now: float | None = None,
+                 skipped: bool = False) -> dict | None:
+        """Mark schedule as run (or skipped), advance next_run. Returns updated schedule."""
         with self._lock:
             for s in self._schedules:
                 if s.get("id") != schedule_id:
                     continue
-                now = time.time()
-                s["last_run"] = now
-                s["next_run"] = compute_next_run(
-                    s.get("interval_seconds", 3600),
-                    now,
-                    daily_at=s.get("daily_at"),
-                )
+                now = time.time() if now is None else now
+                if not skipped:
+                    s["last_run"] = now
+                s["base_run"] = next_occurrence(s, now)
+                s["next_run"] = s["base_run"] + _jitter(s)
                 self._save()
                 result = dict(s)
                 break
@@ -236,3 +378,103 @@ class ScheduleStore:
                 return None
         self._fire("update", result)
         return result
+
+
+class ScheduleRunner:
+    """Fires schedules from a ScheduleStore when they fall due.
+
+    fire(schedule) posts the prompt; the runner then advances the schedule
+    (or deletes a one-shot). A schedule found more than misfire_grace
+    seconds late — the machine was asleep or the server was down — is
+    handled by misfire_policy: "fire_once" fires it once and moves on to
+    the next future slot, "skip" just moves on.
+    """
+
+    def __init__(self, store: ScheduleStore, fire, misfire_policy: str = "fire_once",
+                 misfire_grace: float = 60, clock=time.time):
+        if misfire_policy not in MISFIRE_POLICIES:
+            raise ValueError(f"misfire_policy must be one of {MISFIRE_POLICIES}, not {misfire_policy!r}")
+        self._store = store
+        self._fire = fire
+        self.misfire_policy = misfire_policy
+        self.misfire_grace = misfire_grace
+        self._clock = clock
+        self._heap: list[tuple[float, str]] = []  # (next_run, schedule id)
+        self._due: dict[str, float] = {}          # id → live heap deadline
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        store.on_change(self._on_change)
+        for s in store.list_all(active_only=True):
+            self._on_change("create", s)
+
+    def _on_change(self, action: str, schedule: dict):
+        with self._lock:
+            sid = schedule.get("id")
+            if action == "delete" or not schedule.get("active", True):
+                self._due.pop(sid, None)
+            else:
+                deadline = schedule.get("next_run") or 0
+                if self._due.get(sid) != deadline:
+                    self._due[sid] = deadline
+                    heapq.heappush(self._heap, (deadline, sid))
+            self._wake.notify()
+
+    def run_pending(self) -> float | None:
+        """Fire every schedule that is due now. Returns the next deadline."""
+        now = self._clock()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, sid = heapq.heappop(self._heap)
+                if self._due.get(sid) == deadline:
+                    del self._due[sid]
+                    due.append((deadline, sid))
+        for deadline, sid in due:
+            schedule = self._store.get(sid)
+            if not schedule or not schedule.get("active", True):
+                continue
+            missed = now - deadline > self.misfire_grace
+            if missed and self.misfire_policy == "skip":
+                log.info("Schedule %s missed its %.0fs-old slot; skipping", sid, now - deadline)
+            else:
+                try:
+                    self._fire(schedule)
+                except Exception:
+                    log.exception("schedule %s failed to fire", sid)
+            # Store callbacks re-queue the advanced schedule via _on_change
+            if schedule.get("one_shot"):
+                self._store.delete(sid)
+            else:
+                self._store.mark_run(sid, now=now, skipped=missed and self.misfire_policy == "skip")
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def start(self):
+        """Run on a background thread that sleeps until the next schedule is due."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="schedules")
+            self._thread.start()
+
+    def close(self):
+        with self._wake:
+            self._closed = True
+            self._wake.notify_all()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_pending()
+            except Exception:
+                log.exception("schedule runner error")
+            with self._wake:
+                if self._closed:
+                    return
+                # Deadlines are wall-clock times; cap the sleep so a suspend or
+                # clock change is noticed within _MAX_SLEEP.
+                delay = _MAX_SLEEP
+                if self._heap:
+                    delay = min(delay, self._heap[0][0] - self._clock())
+                if delay > 0:
+                    self._wake.wait(delay)
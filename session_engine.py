@@ -1,5 +1,25 @@
-"""Session engine — orchestrates structured multi-agent sessions."""
-
+"""Session engine — orchestrates structured multi-agent sessions.
+
+Turn advances run on one scheduler thread fed by a delay queue (a min-heap
+of due times) rather than a threading.Timer per message. Each queued
+advance carries the phase/turn it was scheduled for and is dropped if the
+session has moved on by the time it runs. A second message for the same
+turn inside the delay window is a duplicate, not a second advance.
+
+A phase with "turn_order": "parallel" triggers all its participants at once
+and advances when "quorum" of them (default: all) have replied.
+
+A turn (or parallel phase) that goes unanswered for its "timeout" seconds
+(the phase's, else the engine's turn_timeout) runs a timeout action from the
+same queue. The actions are "retrigger" (wake the agent again), "substitute"
+(hand the turn to another agent), "skip" and "end". retrigger and
+substitute fall back to skip after max_retries attempts on one turn. A
+timeout that comes due while a human has paused the session is re-queued,
+not dropped. Each reply or timeout is appended to the run's turn_log with its latency.
+"""
+
+import heapq
+import itertools
 import logging
 import threading
 import time
@@ -12,6 +32,28 @@ _DISSENT_LINE = "Provide your own independent analysis. Do not repeat or defer t
 # Roles that get the dissent mandate
 _DISSENT_ROLES = {"reviewer", "red_team", "critic", "challenger", "against"}
 
+# Seconds an advance waits so the triggering message broadcasts before
+# phase/completion banners are added
+ADVANCE_DELAY = 0.3
+
+TIMEOUT_ACTIONS = ("retrigger", "substitute", "skip", "end")
+
+
+def turn_latency_by_agent(turn_log: list[dict]) -> dict[str, dict]:
+    """Summarise a run's turn_log: replies, timeouts, mean and max reply latency per agent."""
+    out: dict[str, dict] = {}
+    for entry in turn_log:
+        st = out.setdefault(entry.get("agent", ""), {"replies": 0, "timeouts": 0,
+                                                     "avg_latency": None, "max_latency": None})
+        latency = entry.get("latency")
+        if entry.get("outcome") == "timeout":
+            st["timeouts"] += 1
+        elif latency is not None:
+            n = st["replies"] = st["replies"] + 1
+            st["avg_latency"] = round(((st["avg_latency"] or 0) * (n - 1) + latency) / n, 3)
+            st["max_latency"] = max(st["max_latency"] or 0, latency)
+    return out
+
 
 class SessionEngine:
     """Orchestrates session turn flow on top of existing chat infrastructure.
@@ -20,16 +62,111 @@ class SessionEngine:
     agents via the AgentTrigger system.
     """
 
-    def __init__(self, session_store, message_store, agent_trigger, registry=None):
+    def __init__(self, session_store, message_store, agent_trigger, registry=None,
+                 advance_delay: float = ADVANCE_DELAY, turn_timeout: float = 0,
+                 timeout_action: str = "retrigger", max_retries: int = 1,
+                 clock=time.monotonic):
+        if timeout_action not in TIMEOUT_ACTIONS:
+            raise ValueError(f"timeout_action must be one of {TIMEOUT_ACTIONS}, not {timeout_action!r}")
         self._store = session_store
         self._messages = message_store
         self._trigger = agent_trigger
         self._registry = registry
+        self.advance_delay = advance_delay
+        self.turn_timeout = turn_timeout
+        self.timeout_action = timeout_action
+        self.max_retries = max_retries
+        self._clock = clock
         self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        # (due, seq, kind, session_id, phase, turn, message_id); seq keeps FIFO order.
+        # kind is "advance" (an expected reply arrived) or "timeout" (turn went unanswered)
+        self._queue: list[tuple] = []
+        self._pending: set[tuple] = set()  # (kind, session_id, phase, turn) queued
+        self._seq = itertools.count()
+        self._thread: threading.Thread | None = None
+        self._closed = False
 
         # Hook into message stream
         self._messages.on_message(self._on_message)
 
+    # --- Scheduler ---
+
+    def start(self):
+        """Run queued advances on a background scheduler thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="sessions")
+            self._thread.start()
+
+    def close(self):
+        """Stop the scheduler thread, letting an in-flight advance finish."""
+        with self._wake:
+            self._closed = True
+            self._wake.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def _schedule(self, kind: str, session: dict, delay: float, message_id: int | None = None) -> bool:
+        """Queue an advance or timeout for the session's current turn.
+        Returns False if one of that kind is already queued for the turn."""
+        key = (kind, session["id"], session["current_phase"], session["current_turn"])
+        with self._wake:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            heapq.heappush(self._queue, (self._clock() + delay, next(self._seq), *key, message_id))
+            self._wake.notify()
+        return True
+
+    def _schedule_advance(self, session: dict, message_id: int) -> bool:
+        return self._schedule("advance", session, self.advance_delay, message_id)
+
+    def run_pending(self) -> float | None:
+        """Run every advance that is due now, in order. Returns the next due time."""
+        now = self._clock()
+        due = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                entry = heapq.heappop(self._queue)
+                self._pending.discard(entry[2:6])  # handlers may re-arm the same key
+                due.append(entry)
+            # A reply already queued for a turn beats that turn's timeout
+            answered = {e[3:6] for e in due if e[2] == "advance"}
+            answered.update(k[1:] for k in self._pending if k[0] == "advance")
+        for _, _, kind, session_id, phase, turn, message_id in due:
+            try:
+                session = self._store.get(session_id)
+                same_turn = session and (session["current_phase"], session["current_turn"]) == (phase, turn)
+                if same_turn and kind == "timeout" and session.get("state") == "paused":
+                    # The clock doesn't run against agents while a human has
+                    # the floor; check again one full timeout later
+                    self._arm_timeout(session, self._current_phase(session) or {})
+                elif not (same_turn and session.get("state") in ("active", "waiting")):
+                    log.debug("Session %d: dropping stale %s for phase %d turn %d",
+                              session_id, kind, phase, turn)
+                elif kind == "timeout":
+                    if (session_id, phase, turn) not in answered:
+                        self._turn_timed_out(session)
+                else:
+                    self._advance(session, message_id)
+            except Exception:
+                log.exception("Session %d: %s failed", session_id, kind)
+        with self._lock:
+            return self._queue[0][0] if self._queue else None
+
+    def _run(self):
+        while True:
+            self.run_pending()
+            with self._wake:
+                if self._closed:
+                    return
+                if not self._queue:
+                    self._wake.wait()
+                else:
+                    delay = self._queue[0][0] - self._clock()
+                    if delay > 0:
+                        self._wake.wait(delay)
+
     # --- Public API ---
 
     def start_session(self, template_id: str, channel: str, cast: dict,
@@ -93,10 +230,17 @@ class SessionEngine:
     def get_allowed_agent(self, channel: str) -> str | None:
         """If a session is active on this channel, return the agent whose turn it is.
         Returns None if no session is active (meaning all agents are allowed)."""
+        allowed = self.get_allowed_agents(channel)
+        return allowed[0] if allowed else None
+
+    def get_allowed_agents(self, channel: str) -> list[str] | None:
+        """Agents whose turn it is on this channel: one for a sequential phase,
+        every participant yet to reply for a parallel one. Returns None if no
+        session is active (meaning all agents are allowed)."""
         session = self._store.get_active(channel)
         if not session or session.get("state") not in ("active", "waiting"):
             return None
-        return self._get_expected_agent(session)
+        return self._get_expected_agents(session) or None
 
     def list_active(self) -> list[dict]:
         """List all active/waiting/paused sessions, enriched for the frontend."""
@@ -119,6 +263,12 @@ class SessionEngine:
                          session["id"], session.get("template_name", "?"),
                          session["current_phase"], session["current_turn"])
                 self._trigger_current(session)
+            elif session.get("state") == "waiting":
+                # Triggers were sent before the restart, but the turn's
+                # timeout lived only in memory
+                phase = self._current_phase(session)
+                if phase:
+                    self._arm_timeout(session, phase)
 
     def _is_agent(self, name: str) -> bool:
         """Check if name belongs to a registered agent (not a human)."""
@@ -136,13 +286,16 @@ class SessionEngine:
         # Ignore system-generated messages (banners, phase markers, etc.)
         if sender == "system" or msg.get("type", "chat") != "chat":
             return
+        # Streaming placeholders arrive again once finished in place
+        if (msg.get("metadata") or {}).get("streaming"):
+            return
 
         session = self._store.get_active(channel)
         if not session:
             return
 
-        expected_agent = self._get_expected_agent(session)
-        if not expected_agent:
+        expected = self._get_expected_agents(session)
+        if not expected:
             return
 
         cast_agents = set(session.get("cast", {}).values())
@@ -153,23 +306,197 @@ class SessionEngine:
             return
 
         # Human spoke but it's not their turn — pause if an agent is expected
-        if not sender_is_agent and sender != expected_agent and self._is_agent(expected_agent):
+        if not sender_is_agent and sender not in expected and any(self._is_agent(a) for a in expected):
             self._store.pause(session["id"])
             log.info("Session %d paused: human interruption by %s", session["id"], sender)
             return
 
-        if sender == expected_agent:
+        if sender in expected:
             # Auto-resume if paused
             if session["state"] == "paused":
                 self._store.resume(session["id"])
+            phase = self._current_phase(session)
+            if phase and self._is_parallel(phase):
+                self._record_parallel_reply(session, phase, sender, msg["id"])
+                return
             # Defer advance slightly so the triggering message broadcasts
             # before phase/completion banners are added
-            threading.Timer(0.3, self._advance, args=(session, msg["id"])).start()
+            if not self._schedule_advance(session, msg["id"]):
+                log.debug("Session %d: advance for this turn already queued", session["id"])
+                return
+            participants = phase.get("participants", []) if phase else []
+            turn = session["current_turn"]
+            self._log_turn(session, sender, participants[turn] if turn < len(participants) else "",
+                           "replied")
             return
 
         # Wrong agent spoke - ignore
         return
 
+    # --- Parallel phases ---
+
+    @staticmethod
+    def _is_parallel(phase: dict) -> bool:
+        return phase.get("turn_order") == "parallel"
+
+    @staticmethod
+    def _quorum(phase: dict) -> int:
+        total = len(phase.get("participants", []))
+        return min(max(1, phase.get("quorum") or total), total)
+
+    @staticmethod
+    def _pending_roles(session: dict, phase: dict) -> list[str]:
+        replied = session.get("replied") or []
+        return [r for r in phase.get("participants", []) if r not in replied]
+
+    def _record_parallel_reply(self, session: dict, phase: dict, sender: str, message_id: int):
+        cast = session.get("cast", {})
+        roles = [r for r in self._pending_roles(session, phase) if cast.get(r) == sender]
+        session = self._store.record_replies(session["id"], roles, message_id)
+        if not session:
+            return  # already counted (duplicate message)
+        self._log_turn(session, sender, ", ".join(roles), "replied")
+        if len(session["replied"]) >= self._quorum(phase):
+            self._schedule_advance(session, message_id)
+        else:
+            remaining = dict.fromkeys(cast.get(r) for r in self._pending_roles(session, phase))
+            self._store.set_waiting(session["id"], ", ".join(a for a in remaining if a), start_clock=False)
+
+    def _phase_timed_out(self, session: dict, phase: dict):
+        replied = len(session.get("replied") or [])
+        total = len(phase.get("participants", []))
+        log.info("Session %d: phase '%s' timed out with %d/%d replies",
+                 session["id"], phase["name"], replied, total)
+        self._notify(session, f"Phase {phase['name']} timed out ({replied}/{total} replied) — moving on.")
+        self._advance(session, session.get("last_message_id") if replied else None)
+
+    # --- Turn timeouts ---
+
+    def _timeout_for(self, phase: dict) -> float:
+        return phase.get("timeout") or self.turn_timeout
+
+    def _arm_timeout(self, session: dict, phase: dict):
+        timeout = self._timeout_for(phase)
+        if timeout and timeout > 0:
+            self._schedule("timeout", session, timeout)
+
+    def _notify(self, session: dict, text: str):
+        self._messages.add(
+            sender="system",
+            text=text,
+            msg_type="system",
+            channel=session.get("channel", "general"),
+        )
+
+    def _log_turn(self, session: dict, agent: str, role: str, outcome: str):
+        started = session.get("turn_started_at")
+        latency = round(time.time() - started, 3) if started else None
+        self._store.log_turn(session["id"], {
+            "phase": session["current_phase"],
+            "turn": session["current_turn"],
+            "role": role,
+            "agent": agent,
+            "outcome": outcome,
+            "latency": latency,
+        })
+
+    def _stalled_roles(self, session: dict, phase: dict) -> list[str]:
+        if self._is_parallel(phase):
+            return self._pending_roles(session, phase)
+        participants = phase.get("participants", [])
+        turn = session["current_turn"]
+        return participants[turn:turn + 1]
+
+    def _substitute(self, session: dict, roles: list[str]) -> dict | None:
+        """Recast stalled roles onto other agents: idle cast members first
+        (they have the context), then any active agent. Returns the updated
+        session, or None if there is nobody to hand the turn to."""
+        cast = session.get("cast", {})
+        stalled = {cast.get(r) for r in roles}
+        pool = list(cast.values())
+        if self._registry:
+            pool += self._registry.get_active_names()
+        candidates = [a for a in dict.fromkeys(pool) if a not in stalled and self._is_agent(a)]
+        if not candidates:
+            return None
+        updated = None
+        for i, role in enumerate(roles):
+            new_agent = candidates[i % len(candidates)]
+            updated = self._store.substitute(session["id"], role, new_agent)
+            if updated:
+                self._notify(session, f"Session: {cast.get(role)} didn't reply — {new_agent} takes over as {role}.")
+        return updated
+
+    def _turn_timed_out(self, session: dict):
+        """Run the timeout action for a turn (or parallel phase) nobody answered."""
+        phase = self._current_phase(session)
+        if not phase:
+            return
+        roles = self._stalled_roles(session, phase)
+        cast = session.get("cast", {})
+        agents = [a for a in dict.fromkeys(cast.get(r) for r in roles) if a]
+        if not agents:
+            return
+        for role in roles:
+            self._log_turn(session, cast.get(role, ""), role, "timeout")
+
+        action = phase.get("timeout_action") or self.timeout_action
+        retries_left = session.get("turn_retries", 0) < self.max_retries
+        who = ", ".join(agents)
+        log.info("Session %d: %s timed out in phase '%s' (action: %s)",
+                 session["id"], who, phase["name"], action)
+
+        if action == "retrigger" and retries_left:
+            session = self._store.note_retry(session["id"]) or session
+            self._notify(session, f"Session: no reply from {who} — re-triggering.")
+            self._trigger_current(session)
+            return
+        if action == "substitute" and retries_left:
+            self._store.note_retry(session["id"])
+            updated = self._substitute(session, roles)
+            if updated:
+                self._trigger_current(updated)
+                return
+        if action == "end":
+            self._notify(session, f"Session ended: no reply from {who}.")
+            self._store.interrupt(session["id"], f"turn timeout ({who})")
+            return
+
+        # skip (also where retrigger/substitute land once retries run out)
+        if self._is_parallel(phase):
+            self._phase_timed_out(session, phase)
+            return
+        self._notify(session, f"Session: no reply from {who} — skipping their turn.")
+        self._advance(session, None)
+
+    def _trigger_parallel(self, session: dict, tmpl: dict, phase: dict):
+        """Trigger every participant who hasn't replied yet, all at once."""
+        cast = session.get("cast", {})
+        pending = self._pending_roles(session, phase)
+        for role in pending:
+            if not cast.get(role):
+                log.warning("Session %d: no agent cast for role '%s'", session["id"], role)
+                self._store.interrupt(session["id"], f"no agent for role '{role}'")
+                return
+
+        waiting = list(dict.fromkeys(cast[r] for r in pending))
+        self._store.set_waiting(session["id"], ", ".join(waiting))
+        self._arm_timeout(session, phase)
+
+        channel = session.get("channel", "general")
+        for role in pending:
+            agent = cast[role]
+            if not self._is_agent(agent):
+                continue  # human participant: just wait for them
+            prompt = self._assemble_prompt(session, tmpl, phase, role)
+            log.info("Session %d: triggering %s (%s) for parallel phase '%s'",
+                     session["id"], agent, role, phase["name"])
+            try:
+                self._trigger.trigger_sync(agent, channel=channel, prompt=prompt)
+            except Exception as exc:
+                log.error("Session %d: failed to trigger %s: %s",
+                          session["id"], agent, exc)
+
     # --- Engine core ---
 
     def _advance(self, session: dict, message_id: int):
@@ -191,7 +518,7 @@ class SessionEngine:
         participants = phase.get("participants", [])
 
         next_turn = turn_idx + 1
-        if next_turn < len(participants):
+        if next_turn < len(participants) and not self._is_parallel(phase):
             # More turns in this phase
             session = self._store.advance_turn(session["id"], message_id)
             if session:
@@ -236,6 +563,10 @@ class SessionEngine:
         phase = phases[phase_idx]
         participants = phase.get("participants", [])
 
+        if self._is_parallel(phase):
+            self._trigger_parallel(session, tmpl, phase)
+            return
+
         if turn_idx >= len(participants):
             return
 
@@ -253,8 +584,9 @@ class SessionEngine:
             self._store.set_waiting(session["id"], agent)
             return
 
-        # Mark waiting
+        # Mark waiting (starts the turn clock)
         self._store.set_waiting(session["id"], agent)
+        self._arm_timeout(session, phase)
 
         # Assemble the prompt
         prompt = self._assemble_prompt(session, tmpl, phase, role)
@@ -286,6 +618,11 @@ class SessionEngine:
         lines.append(f"PHASE: {phase['name']} ({phase_idx + 1}/{total_phases})")
         lines.append(f"YOUR ROLE: {role}")
         lines.append(f"INSTRUCTION: {phase.get('prompt', '')}")
+        if self._is_parallel(phase):
+            others = [r for r in phase.get("participants", []) if r != role]
+            if others:
+                lines.append(f"Other roles ({', '.join(others)}) are answering this phase at the same time; "
+                             "don't wait for them.")
 
         # Dissent mandate for review/critique roles
         if role.lower() in _DISSENT_ROLES:
@@ -301,31 +638,37 @@ class SessionEngine:
         # Use double newlines to ensure separation in TUIs that might collapse single newlines
         return "\n\n".join(lines)
 
-    def _get_expected_agent(self, session: dict) -> str | None:
-        """Get the agent name expected to respond next."""
+    def _current_phase(self, session: dict) -> dict | None:
         tmpl = self._store.get_template(session["template_id"])
         if not tmpl:
             return None
-
         phases = tmpl.get("phases", [])
         phase_idx = session["current_phase"]
-        turn_idx = session["current_turn"]
-
-        if phase_idx >= len(phases):
-            return None
+        return phases[phase_idx] if phase_idx < len(phases) else None
 
-        phase = phases[phase_idx]
-        participants = phase.get("participants", [])
-
-        if turn_idx >= len(participants):
-            return None
-
-        role = participants[turn_idx]
+    def _get_expected_agents(self, session: dict) -> list[str]:
+        """Agent names expected to respond next (several in a parallel phase)."""
+        phase = self._current_phase(session)
+        if not phase:
+            return []
         cast = session.get("cast", {})
-        return cast.get(role)
+        if self._is_parallel(phase):
+            roles = self._pending_roles(session, phase)
+        else:
+            participants = phase.get("participants", [])
+            turn_idx = session["current_turn"]
+            roles = participants[turn_idx:turn_idx + 1]
+        return [a for a in dict.fromkeys(cast.get(r) for r in roles) if a]
+
+    def _get_expected_agent(self, session: dict) -> str | None:
+        """Get the agent name expected to respond next."""
+        expected = self._get_expected_agents(session)
+        return expected[0] if expected else None
 
     def _enrich(self, session: dict) -> dict:
         """Add computed fields to a session dict for the frontend."""
+        if session.get("turn_log"):
+            session["agent_latency"] = turn_latency_by_agent(session["turn_log"])
         tmpl = self._store.get_template(session["template_id"])
         if tmpl:
             phases = tmpl.get("phases", [])
@@ -336,7 +679,16 @@ class SessionEngine:
                 session["phase_name"] = phase["name"]
                 participants = phase.get("participants", [])
                 turn_idx = session["current_turn"]
-                if turn_idx < len(participants):
+                if self._is_parallel(phase):
+                    pending = self._pending_roles(session, phase)
+                    cast = session.get("cast", {})
+                    session["parallel"] = True
+                    session["quorum"] = self._quorum(phase)
+                    session["replied_count"] = len(participants) - len(pending)
+                    session["current_role"] = ", ".join(pending)
+                    session["current_agent"] = ", ".join(
+                        a for a in dict.fromkeys(cast.get(r) for r in pending) if a)
+                elif turn_idx < len(participants):
                     role = participants[turn_idx]
                     session["current_role"] = role
                     session["current_agent"] = session.get("cast", {}).get(role)
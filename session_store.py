@@ -8,12 +8,16 @@ from pathlib import Path
 
 log = logging.getLogger(__name__)
 
+_LIVE_STATES = ("active", "waiting", "paused")
+
 
 class SessionStore:
     def __init__(self, path: str, templates_dir: str | None = None):
         self._path = Path(path)
         self._path.parent.mkdir(parents=True, exist_ok=True)
         self._sessions: list[dict] = []
+        self._by_id: dict[int, dict] = {}
+        self._live: dict[str, dict] = {}  # channel → its active/waiting/paused session
         self._next_id = 1
         self._lock = threading.Lock()
         self._callbacks: list = []
@@ -51,10 +55,14 @@ class SessionStore:
             raw = json.loads(self._path.read_text("utf-8"))
             if isinstance(raw, list):
                 self._sessions = raw
+                self._by_id = {s["id"]: s for s in raw}
+                self._live = {s.get("channel"): s for s in raw if s.get("state") in _LIVE_STATES}
                 if self._sessions:
                     self._next_id = max(s["id"] for s in self._sessions) + 1
         except (json.JSONDecodeError, KeyError):
             self._sessions = []
+            self._by_id = {}
+            self._live = {}
 
     def _save(self):
         self._path.write_text(
@@ -147,9 +155,8 @@ class SessionStore:
 
         with self._lock:
             # One active session per channel
-            for s in self._sessions:
-                if s.get("channel") == channel and s.get("state") in ("active", "waiting", "paused"):
-                    return None
+            if channel in self._live:
+                return None
 
             session = {
                 "id": self._next_id,
@@ -165,10 +172,15 @@ class SessionStore:
                 "updated_at": time.time(),
                 "last_message_id": None,
                 "output_message_id": None,
+                "replied": [],
+                "turn_retries": 0,
+                "turn_log": [],
                 "goal": goal.strip()[:500],
             }
             self._next_id += 1
             self._sessions.append(session)
+            self._by_id[session["id"]] = session
+            self._live[channel] = session
             self._save()
 
         self._fire("create", session)
@@ -176,18 +188,14 @@ class SessionStore:
 
     def get(self, session_id: int) -> dict | None:
         with self._lock:
-            for s in self._sessions:
-                if s["id"] == session_id:
-                    return dict(s)
-            return None
+            s = self._by_id.get(session_id)
+            return dict(s) if s else None
 
     def get_active(self, channel: str) -> dict | None:
         """Get the active/waiting/paused session for a channel."""
         with self._lock:
-            for s in self._sessions:
-                if s.get("channel") == channel and s.get("state") in ("active", "waiting", "paused"):
-                    return dict(s)
-            return None
+            s = self._live.get(channel)
+            return dict(s) if s else None
 
     def list_all(self, channel: str | None = None) -> list[dict]:
         with self._lock:
@@ -203,6 +211,7 @@ class SessionStore:
             if not session or session["state"] not in ("active", "waiting"):
                 return None
             session["current_turn"] += 1
+            session["turn_retries"] = 0
             session["state"] = "active"
             session["updated_at"] = time.time()
             if message_id is not None:
@@ -220,6 +229,8 @@ class SessionStore:
                 return None
             session["current_phase"] += 1
             session["current_turn"] = 0
+            session["replied"] = []
+            session["turn_retries"] = 0
             session["state"] = "active"
             session["updated_at"] = time.time()
             if message_id is not None:
@@ -229,8 +240,31 @@ class SessionStore:
         self._fire("update", result)
         return result
 
-    def set_waiting(self, session_id: int, agent: str) -> dict | None:
-        """Mark session as waiting on a specific agent."""
+    def record_replies(self, session_id: int, roles: list[str],
+                       message_id: int | None = None) -> dict | None:
+        """Mark roles as having replied in the current (parallel) phase.
+        Returns None if nothing new was recorded."""
+        with self._lock:
+            session = self._find(session_id)
+            if not session or session["state"] not in _LIVE_STATES:
+                return None
+            replied = session.setdefault("replied", [])
+            new = [r for r in roles if r not in replied]
+            if not new:
+                return None
+            replied.extend(new)
+            session["updated_at"] = time.time()
+            if message_id is not None:
+                session["last_message_id"] = message_id
+            self._save()
+            result = dict(session, replied=list(replied))
+        self._fire("update", result)
+        return result
+
+    def set_waiting(self, session_id: int, agent: str, start_clock: bool = True) -> dict | None:
+        """Mark session as waiting on a specific agent (or a comma-separated
+        list in a parallel phase). start_clock stamps turn_started_at, the
+        origin for turn latencies; pass False when just narrowing the list."""
         with self._lock:
             session = self._find(session_id)
             if not session:
@@ -238,6 +272,48 @@ class SessionStore:
             session["state"] = "waiting"
             session["waiting_on"] = agent
             session["updated_at"] = time.time()
+            if start_clock:
+                session["turn_started_at"] = session["updated_at"]
+            self._save()
+            result = dict(session)
+        self._fire("update", result)
+        return result
+
+    def log_turn(self, session_id: int, entry: dict) -> dict | None:
+        """Append a reply/timeout record (agent, role, outcome, latency) to turn_log."""
+        with self._lock:
+            session = self._find(session_id)
+            if not session:
+                return None
+            entry = dict(entry, at=time.time())
+            session.setdefault("turn_log", []).append(entry)
+            self._save()
+            return entry
+
+    def note_retry(self, session_id: int) -> dict | None:
+        """Count a timeout recovery (retrigger/substitute) on the current turn."""
+        with self._lock:
+            session = self._find(session_id)
+            if not session or session["state"] not in ("active", "waiting"):
+                return None
+            session["turn_retries"] = session.get("turn_retries", 0) + 1
+            session["updated_at"] = time.time()
+            self._save()
+            result = dict(session)
+        self._fire("update", result)
+        return result
+
+    def substitute(self, session_id: int, role: str, agent: str) -> dict | None:
+        """Recast a role onto another agent mid-session."""
+        with self._lock:
+            session = self._find(session_id)
+            if not session or session["state"] not in ("active", "waiting"):
+                return None
+            previous = session["cast"].get(role)
+            session["cast"] = dict(session["cast"], **{role: agent})
+            session.setdefault("substitutions", []).append(
+                {"role": role, "from": previous, "to": agent, "at": time.time()})
+            session["updated_at"] = time.time()
             self._save()
             result = dict(session)
         self._fire("update", result)
@@ -277,6 +353,7 @@ class SessionStore:
                 return None
             session["state"] = "complete"
             session["updated_at"] = time.time()
+            self._unlive(session)
             if output_message_id is not None:
                 session["output_message_id"] = output_message_id
             self._save()
@@ -293,6 +370,7 @@ class SessionStore:
             session["state"] = "interrupted"
             session["interrupt_reason"] = reason
             session["updated_at"] = time.time()
+            self._unlive(session)
             self._save()
             result = dict(session)
         self._fire("interrupt", result)
@@ -300,10 +378,12 @@ class SessionStore:
 
     def _find(self, session_id: int) -> dict | None:
         """Find session by ID (caller must hold lock)."""
-        for s in self._sessions:
-            if s["id"] == session_id:
-                return s
-        return None
+        return self._by_id.get(session_id)
+
+    def _unlive(self, session: dict):
+        """Drop a finished session from the channel index (caller must hold lock)."""
+        if self._live.get(session.get("channel")) is session:
+            del self._live[session["channel"]]
 
 
 def validate_session_template(tmpl: dict) -> list[str]:
@@ -342,6 +422,22 @@ def validate_session_template(tmpl: dict) -> list[str]:
             errors.append(f"Phase {i + 1}: 'participants' must be a non-empty array")
         elif len(participants) > 4:
             errors.append(f"Phase {i + 1}: too many participants ({len(participants)}, max 4)")
+        turn_order = phase.get("turn_order", "sequential")
+        if turn_order not in ("sequential", "parallel"):
+            errors.append(f"Phase {i + 1}: 'turn_order' must be 'sequential' or 'parallel'")
+        quorum = phase.get("quorum")
+        if quorum is not None:
+            if turn_order != "parallel":
+                errors.append(f"Phase {i + 1}: 'quorum' only applies to parallel phases")
+            elif (not isinstance(quorum, int) or isinstance(quorum, bool) or quorum < 1
+                  or (isinstance(participants, list) and quorum > len(participants))):
+                errors.append(f"Phase {i + 1}: 'quorum' must be between 1 and the number of participants")
+        timeout = phase.get("timeout")
+        if timeout is not None and (not isinstance(timeout, (int, float)) or isinstance(timeout, bool)
+                                    or not 0 < timeout <= 3600):
+            errors.append(f"Phase {i + 1}: 'timeout' must be 1-3600 seconds")
+        if phase.get("timeout_action") not in (None, "retrigger", "substitute", "skip", "end"):
+            errors.append(f"Phase {i + 1}: 'timeout_action' must be retrigger, substitute, skip or end")
         for p in (participants if isinstance(participants, list) else []):
             if p not in roles_set:
                 errors.append(f"Phase {i + 1}: participant '{p}' not in roles list")
@@ -3344,6 +3344,7 @@ function formatScheduleTime(ts) {
 }
 
 function formatScheduleInterval(s) {
+    if (s.cron) return 'cron ' + s.cron;
     if (s.daily_at) return 'daily at ' + s.daily_at;
     const sec = s.interval_seconds || 0;
     if (sec < 3600) return 'every ' + Math.round(sec / 60) + 'm';
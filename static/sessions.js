@@ -288,7 +288,9 @@ function updateSessionBar() {
 
     const waitingAgent = s.current_agent || s.waiting_on;
     if (s.state === 'waiting' && waitingAgent) {
-        waitingEl.textContent = `Waiting for ${waitingAgent}`;
+        waitingEl.textContent = s.parallel
+            ? `Waiting for ${waitingAgent} (${s.replied_count || 0}/${s.quorum} replied)`
+            : `Waiting for ${waitingAgent}`;
         waitingEl.style.display = '';
     } else if (s.state === 'paused') {
         waitingEl.textContent = 'Paused';
@@ -17,6 +17,9 @@ class MessageStore:
         self._next_id: int = 0  # monotonically increasing, survives deletions
         self._todos: dict[int, str] = {}  # msg_id → "todo" | "done"
         self._lock = threading.Lock()
+        self._new_message = threading.Condition(self._lock)  # notified by add() and finish_stream()
+        self._streams_finished: int = 0  # finish_stream() calls, for waiters
+        self._epoch: int = 0  # bumped when stored messages are deleted or rewritten
         self._callbacks: list = []  # called on each new message
         self._todo_callbacks: list = []  # called on todo changes
         self._delete_callbacks: list = []  # called on message deletion
@@ -28,6 +31,7 @@ class MessageStore:
         if not self._path.exists():
             return
         max_id = -1
+        index: dict[int, int] = {}  # id -> position in self._messages
         with open(self._path, "r", encoding="utf-8") as f:
             for i, line in enumerate(f):
                 line = line.strip()
@@ -40,7 +44,12 @@ class MessageStore:
                         msg["id"] = i
                     if msg["id"] > max_id:
                         max_id = msg["id"]
-                    self._messages.append(msg)
+                    if msg["id"] in index:
+                        # A later line for the same id (a finished stream) replaces it
+                        self._messages[index[msg["id"]]] = msg
+                    else:
+                        index[msg["id"]] = len(self._messages)
+                        self._messages.append(msg)
                 except json.JSONDecodeError:
                     continue
         self._next_id = max_id + 1
@@ -77,10 +86,8 @@ class MessageStore:
             self._next_id += 1
             self._messages.append(msg)
             if not _bulk:
-                with open(self._path, "a", encoding="utf-8") as f:
-                    f.write(json.dumps(msg, ensure_ascii=False) + "\n")
-                    f.flush()
-                    os.fsync(f.fileno())
+                self._append_jsonl(msg)
+            self._new_message.notify_all()
 
         # Fire callbacks outside the lock (skip during bulk import)
         if not _bulk:
@@ -108,6 +115,7 @@ class MessageStore:
 
     def _rewrite(self):
         """Rewrite the full JSONL file from memory (used after bulk edits)."""
+        self._epoch += 1
         with open(self._path, "w", encoding="utf-8") as f:
             for m in self._messages:
                 f.write(json.dumps(m, ensure_ascii=False) + "\n")
@@ -128,6 +136,36 @@ class MessageStore:
                 msgs = [m for m in msgs if m.get("channel", "general") == channel]
             return list(msgs[-count:])
 
+    def latest_id(self) -> int:
+        """Id of the newest message ever added (-1 if none)."""
+        with self._lock:
+            return self._next_id - 1
+
+    def epoch(self) -> int:
+        """Changes whenever existing messages are deleted or rewritten, so
+        incremental readers know to re-read instead of only fetching newer ids."""
+        with self._lock:
+            return self._epoch
+
+    def streams_finished(self) -> int:
+        """How many streaming placeholders have been finished so far."""
+        with self._lock:
+            return self._streams_finished
+
+    def wait_for_new(self, after_id: int, timeout: float, streams_finished: int | None = None) -> bool:
+        """Block until a message newer than after_id is added, or timeout.
+
+        Pass a streams_finished() value to also wake when a streaming
+        placeholder is finished after it was read. Returns True if either
+        happened. Used by long-polling readers (chat_wait).
+        """
+        def ready():
+            return self._next_id - 1 > after_id or (
+                streams_finished is not None and self._streams_finished != streams_finished)
+
+        with self._new_message:
+            return self._new_message.wait_for(ready, timeout)
+
     def get_since(self, since_id: int = 0, channel: str | None = None) -> list[dict]:
         with self._lock:
             msgs = [m for m in self._messages if m["id"] > since_id]
@@ -180,18 +218,75 @@ class MessageStore:
         """Register a callback(ids) called when messages are deleted."""
         self._delete_callbacks.append(callback)
 
-    def update_message(self, msg_id: int, updates: dict) -> dict | None:
-        """Update fields on a message in-place. Returns the updated message or None."""
+    def update_message(self, msg_id: int, updates: dict, persist: bool = True) -> dict | None:
+        """Update fields on a message in-place. Returns the updated message or None.
+
+        persist=False skips the JSONL rewrite — for high-frequency transient
+        updates (streaming drafts) whose final state is written separately.
+        """
         with self._lock:
             for m in self._messages:
                 if m["id"] == msg_id:
                     m.update(updates)
-                    self._rewrite_jsonl()
+                    if persist:
+                        self._rewrite_jsonl()
                     return dict(m)
             return None
 
+    def finish_stream(self, msg_id: int, text: str) -> dict | None:
+        """Fill a streaming placeholder with its final text, in place.
+
+        The message keeps its id, drops the streaming flag and gains
+        metadata["streamed"]. Waiters and on_message callbacks are notified
+        as for a new message, so routing and sessions see the complete
+        reply. The finished message is appended to the log as a second line
+        for its id, which replaces the placeholder on load. Returns None if
+        msg_id is not a streaming placeholder.
+        """
+        with self._lock:
+            msg = next((m for m in self._messages if m["id"] == msg_id), None)
+            if not msg or not (msg.get("metadata") or {}).get("streaming"):
+                return None
+            metadata = {k: v for k, v in msg["metadata"].items() if k != "streaming"}
+            metadata["streamed"] = True
+            msg.update(text=text, metadata=metadata)
+            self._append_jsonl(msg)
+            self._streams_finished += 1
+            self._new_message.notify_all()
+            msg = dict(msg)
+
+        for cb in self._callbacks:
+            try:
+                cb(msg)
+            except Exception:
+                pass
+        return msg
+
+    def close_streams(self, sender: str | None = None) -> tuple[list[dict], list[int]]:
+        """Settle streaming placeholders whose writer is gone (all of them,
+        or only sender's): ones with text are finished with what arrived,
+        empty ones are deleted. Returns (finished messages, deleted ids)."""
+        with self._lock:
+            orphans = [(m["id"], m["text"].strip()) for m in self._messages
+                       if (m.get("metadata") or {}).get("streaming")
+                       and (sender is None or m.get("sender") == sender)]
+        finished = []
+        for msg_id, text in orphans:
+            msg = self.finish_stream(msg_id, text) if text else None
+            if msg:
+                finished.append(msg)
+        empty = [msg_id for msg_id, text in orphans if not text]
+        return finished, self.delete(empty) if empty else []
+
+    def _append_jsonl(self, msg: dict):
+        with open(self._path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(msg, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
     def _rewrite_jsonl(self):
         """Rewrite the JSONL file from current in-memory messages."""
+        self._epoch += 1
         with open(self._path, "w", encoding="utf-8") as f:
             for m in self._messages:
                 f.write(json.dumps(m, ensure_ascii=False) + "\n")
@@ -215,6 +310,7 @@ class MessageStore:
             else:
                 self._messages.clear()
                 self._path.write_text("")
+                self._epoch += 1
                 self._todos.clear()
                 self._save_todos()
 
@@ -0,0 +1,57 @@
+"""Tests for the API wrapper's rolling per-channel context."""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from store import MessageStore
+from wrapper_api import ChannelContext
+
+
+class ChannelContextTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = MessageStore(str(Path(self.tmp.name) / "messages.jsonl"))
+        self.ctx = ChannelContext(max_messages=20, max_tokens=4000)
+        self.reads = []
+
+    def read(self, since_id=0, limit=20):
+        """Mirrors GET /api/messages plus its X-Message-Epoch header."""
+        self.reads.append(since_id)
+        epoch = str(self.store.epoch())
+        msgs = self.store.get_since(since_id) if since_id else self.store.get_recent(limit)
+        return msgs, epoch
+
+    def prompt(self):
+        return [e["content"] for e in self.ctx.refresh(self.read)]
+
+    def test_new_messages_are_fetched_incrementally(self):
+        self.store.add("ben", "first")
+        self.store.add("ben", "second")
+        self.assertEqual(self.prompt(), ["ben: first", "ben: second"])
+        self.store.add("codex", "third")
+        self.assertEqual(self.prompt(), ["ben: first", "ben: second", "codex: third"])
+        self.assertEqual(self.reads, [0, 1])
+
+    def test_deleted_message_leaves_the_next_prompt(self):
+        self.store.add("ben", "keep")
+        doomed = self.store.add("ben", "secret token")
+        self.store.add("ben", "also keep")
+        self.assertIn("ben: secret token", self.prompt())
+
+        self.store.delete([doomed["id"]])
+        self.assertEqual(self.prompt(), ["ben: keep", "ben: also keep"])
+
+        self.store.clear("general")
+        self.store.add("ben", "fresh start")
+        self.assertEqual(self.prompt(), ["ben: fresh start"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+"""Tests for the chat_wait long-poll tool."""
+
+import asyncio
+import json
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import mcp_bridge
+from store import MessageStore
+
+
+class ChatWaitTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = MessageStore(str(Path(self.tmp.name) / "messages.jsonl"))
+
+        saved = (mcp_bridge.store, mcp_bridge.registry, {k: dict(v) for k, v in mcp_bridge._cursors.items()})
+        mcp_bridge.store = self.store
+        mcp_bridge.registry = None
+        mcp_bridge._cursors.clear()
+
+        def restore():
+            mcp_bridge.store, mcp_bridge.registry = saved[0], saved[1]
+            mcp_bridge._cursors.clear()
+            mcp_bridge._cursors.update(saved[2])
+            mcp_bridge._cursor_journal_pending.clear()
+
+        self.addCleanup(restore)
+
+    def _post_later(self, delay, *args, **kwargs):
+        timer = threading.Timer(delay, self.store.add, args=args, kwargs=kwargs)
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+    def test_wakes_on_mention_and_returns_new_messages(self):
+        self.store.add("ben", "earlier")
+        self._post_later(0.1, "codex", "unrelated chatter")
+        self._post_later(0.2, "ben", "@claude can you check this?")
+
+        start = time.monotonic()
+        result = asyncio.run(mcp_bridge.chat_wait(sender="claude", timeout=5))
+
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertIn("can you check this", result)
+        self.assertIn("unrelated chatter", result)
+        self.assertNotIn("earlier", result)
+        self.assertEqual(mcp_bridge._cursors["claude"]["__all__"], self.store.latest_id())
+
+    def test_wakes_on_reply_to_own_message(self):
+        mine = self.store.add("claude", "question?")
+        self._post_later(0.1, "codex", "answer", reply_to=mine["id"])
+
+        result = asyncio.run(mcp_bridge.chat_wait(sender="claude", timeout=5))
+        self.assertIn("answer", result)
+
+    def test_channel_wait_wakes_on_any_activity_there(self):
+        self._post_later(0.1, "codex", "elsewhere", channel="other")
+        self._post_later(0.2, "codex", "plain update", channel="design")
+
+        result = asyncio.run(mcp_bridge.chat_wait(sender="claude", channel="design", timeout=5))
+        self.assertIn("plain update", result)
+        self.assertNotIn("elsewhere", result)
+
+    def test_channel_wait_skips_streaming_placeholder(self):
+        self._post_later(0.1, "codex", "", channel="dev", metadata={"streaming": True})
+        self._post_later(0.4, "gemini", "final answer", channel="dev")
+        result = asyncio.run(mcp_bridge.chat_wait(sender="claude", channel="dev", timeout=5))
+        self.assertIn("final answer", result)
+
+    def test_placeholder_read_before_it_finished_is_delivered_later(self):
+        self.store.add("ben", "earlier")  # id 0 reads as "no cursor"
+        placeholder = self.store.add("codex", "", metadata={"streaming": True})
+        mcp_bridge.chat_read(sender="claude")
+        timer = threading.Timer(0.1, self.store.finish_stream, args=(placeholder["id"], "@claude done"))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        result = asyncio.run(mcp_bridge.chat_wait(sender="claude", timeout=5))
+        self.assertIn("@claude done", result)
+        self.assertNotIn("@claude done", mcp_bridge.chat_read(sender="claude"))
+
+    def test_response_is_bounded_by_limit_and_budget(self):
+        self.store.add("ben", "earlier")  # id 0 reads as "no cursor"
+        self.store.add("ben", "read")
+        mcp_bridge.chat_read(sender="claude")
+        for i in range(200):
+            self.store.add("codex", f"backlog {i} " + "x" * 200)
+        self._post_later(0.1, "ben", "@claude ping")
+
+        result = asyncio.run(mcp_bridge.chat_wait(sender="claude", timeout=5, limit=10))
+        self.assertEqual(len(json.loads(result)), 10)
+        self.assertIn("ping", result)
+        self.assertNotIn("backlog 189 ", result)
+
+        self._post_later(0.1, "ben", "@claude again " + "y" * 5000)
+        result = asyncio.run(mcp_bridge.chat_wait(sender="claude", timeout=5, max_chars=2000))
+        self.assertLessEqual(len(result), 2000)
+        self.assertIn("again", result)
+
+    def test_times_out_without_relevant_messages(self):
+        self._post_later(0.1, "claude", "talking to myself @claude")
+        result = asyncio.run(mcp_bridge.chat_wait(sender="claude", timeout=1))
+        self.assertIn("Nothing relevant", result)
+
+    def test_deleted_newest_message_does_not_spin(self):
+        calls = []
+        real_get_since = self.store.get_since
+        self.store.get_since = lambda *a, **kw: calls.append(1) or real_get_since(*a, **kw)
+
+        def add_then_delete():  # e.g. a suppressed slash command
+            self.store.delete([self.store.add("codex", "/poetry")["id"]])
+
+        timer = threading.Timer(0.1, add_then_delete)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        self._post_later(0.6, "ben", "@claude ping")
+
+        result = asyncio.run(mcp_bridge.chat_wait(sender="claude", timeout=5))
+        self.assertIn("ping", result)
+        self.assertLess(len(calls), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
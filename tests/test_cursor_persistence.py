@@ -0,0 +1,79 @@
+"""Tests for buffered cursor persistence (journal + snapshot) in mcp_bridge."""
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import mcp_bridge
+
+
+class CursorPersistenceTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "mcp_cursors.json"
+
+        saved_file = mcp_bridge._CURSORS_FILE
+        saved_cursors = {k: dict(v) for k, v in mcp_bridge._cursors.items()}
+        mcp_bridge._CURSORS_FILE = self.path
+        mcp_bridge._cursors.clear()
+        mcp_bridge._cursor_journal_pending.clear()
+        mcp_bridge._cursor_journal_lines = 0
+        mcp_bridge._cursor_last_snapshot = mcp_bridge.time.time()
+
+        def restore():
+            mcp_bridge._CURSORS_FILE = saved_file
+            mcp_bridge._cursors.clear()
+            mcp_bridge._cursors.update(saved_cursors)
+            mcp_bridge._cursor_journal_pending.clear()
+            mcp_bridge._cursor_snapshot_due = False
+
+        self.addCleanup(restore)
+
+    def _reload(self):
+        mcp_bridge._cursors.clear()
+        mcp_bridge._load_cursors()
+        return mcp_bridge._cursors
+
+    def test_cursor_updates_do_not_touch_disk_until_flushed(self):
+        mcp_bridge._update_cursor("claude", [{"id": 4}], "general")
+        self.assertFalse(self.path.exists())
+        self.assertFalse(self.path.with_suffix(".journal").exists())
+
+        mcp_bridge.flush_cursors()
+        journal = self.path.with_suffix(".journal").read_text("utf-8").splitlines()
+        self.assertEqual([json.loads(line) for line in journal], [["claude", "general", 4]])
+
+    def test_journal_is_replayed_over_snapshot(self):
+        mcp_bridge._update_cursor("claude", [{"id": 4}], "general")
+        mcp_bridge.flush_cursors(force_snapshot=True)
+        mcp_bridge._update_cursor("claude", [{"id": 9}], "general")
+        mcp_bridge._update_cursor("codex", [{"id": 7}], None)
+        mcp_bridge.flush_cursors()
+        # Simulate a crash that left a torn final journal line
+        with open(self.path.with_suffix(".journal"), "a", encoding="utf-8") as f:
+            f.write('["claude", "gen')
+
+        cursors = self._reload()
+        self.assertEqual(cursors["claude"]["general"], 9)
+        self.assertEqual(cursors["codex"]["__all__"], 7)
+
+    def test_structural_change_forces_snapshot_and_truncates_journal(self):
+        mcp_bridge._update_cursor("claude", [{"id": 3}], "general")
+        mcp_bridge.flush_cursors()
+        mcp_bridge.migrate_cursors_rename("general", "main")
+        mcp_bridge.flush_cursors()
+
+        self.assertFalse(self.path.with_suffix(".journal").exists())
+        self.assertEqual(json.loads(self.path.read_text("utf-8")), {"claude": {"main": 3}})
+        self.assertEqual(self._reload(), {"claude": {"main": 3}})
+
+
+if __name__ == "__main__":
+    unittest.main()
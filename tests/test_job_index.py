@@ -0,0 +1,63 @@
+"""Tests for JobStore's id map and status/channel buckets."""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from jobs import JobStore
+
+
+class JobIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        self.store = JobStore(str(self.root / "jobs.json"))
+        for i, (channel, status) in enumerate([("general", "open"), ("dev", "open"),
+                                               ("general", "done"), ("dev", "done")]):
+            self.store.create(f"job {i + 1}", "job", channel, "ben", status=status)
+
+    def ids(self, jobs):
+        return [j["id"] for j in jobs]
+
+    def test_filters_stay_in_id_order_after_status_moves(self):
+        self.store.update_status(3, "open")
+        self.store.update_status(1, "done")
+        self.assertEqual(self.ids(self.store.list_all(status="open")), [2, 3])
+        self.assertEqual(self.ids(self.store.list_all(status="done")), [1, 4])
+        self.assertEqual(self.ids(self.store.list_all(channel="general")), [1, 3])
+        self.assertEqual(self.ids(self.store.list_all(channel="dev", status="done")), [4])
+        self.assertEqual(self.ids(self.store.list_all()), [1, 2, 3, 4])
+        self.assertEqual(self.store.list_all(status="archived"), [])
+
+    def test_moved_job_lands_on_top_of_target_lane(self):
+        self.store.reorder("open", [2, 1])
+        moved = self.store.update_status(4, "open")
+        orders = {j["id"]: j["sort_order"] for j in self.store.list_all(status="open")}
+        self.assertEqual(moved["sort_order"], max(orders.values()))
+        self.assertGreater(orders[2], orders[1])
+
+    def test_delete_drops_job_from_every_index(self):
+        self.store.delete(2)
+        self.assertIsNone(self.store.get(2))
+        self.assertEqual(self.ids(self.store.list_all(status="open")), [1])
+        self.assertEqual(self.store.list_all(channel="dev", status="open"), [])
+        reloaded = JobStore(str(self.root / "jobs.json"))
+        self.assertEqual(self.ids(reloaded.list_all(channel="dev")), [4])
+
+    def test_reads_do_not_touch_disk(self):
+        paths = list(self.root.rglob("*"))
+        stamps = [p.stat().st_mtime_ns for p in paths]
+        self.store.list_all()
+        self.store.list_all(channel="general", status="open")
+        self.store.get(1)
+        self.assertEqual([p.stat().st_mtime_ns for p in self.root.rglob("*")], stamps)
+
+
+if __name__ == "__main__":
+    unittest.main()
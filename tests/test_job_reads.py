@@ -0,0 +1,97 @@
+"""Tests for cursor-based job thread reads (chat_read job_id, paginated messages)."""
+
+import asyncio
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import app
+import mcp_bridge
+from jobs import JobStore
+
+
+class JobReadTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.jobs = JobStore(str(Path(self.tmp.name) / "jobs.json"))
+        self.job = self.jobs.create("Ship it", "job", "general", "ben", body="Release 1.2")
+        for i in range(5):
+            self.jobs.add_message(self.job["id"], "ben", f"step {i}")
+
+        saved = (mcp_bridge.jobs, mcp_bridge.registry)
+        mcp_bridge.jobs = self.jobs
+        mcp_bridge.registry = None
+
+        def restore():
+            mcp_bridge.jobs, mcp_bridge.registry = saved
+            with mcp_bridge._cursors_lock:
+                mcp_bridge._cursors.pop("codex", None)
+
+        self.addCleanup(restore)
+
+    def _read(self, **kwargs):
+        return json.loads(mcp_bridge.chat_read(job_id=self.job["id"], **kwargs))
+
+    def test_first_read_has_header_then_only_new_messages(self):
+        first = self._read(sender="codex", limit=3)
+        self.assertEqual(first[0]["type"], "job_header")
+        self.assertEqual(first[0]["body"], "Release 1.2")
+        self.assertEqual([m["text"] for m in first[1:]], ["step 2", "step 3", "step 4"])
+
+        self.assertEqual(self._read(sender="codex"), [])
+        self.jobs.add_message(self.job["id"], "claude", "done")
+        self.assertEqual([m["text"] for m in self._read(sender="codex")], ["done"])
+
+        resync = json.loads(mcp_bridge.chat_resync(sender="codex", job_id=self.job["id"], limit=2))
+        self.assertEqual(resync[0]["type"], "job_header")
+        self.assertEqual(len(resync), 3)
+
+    def test_deleted_job_cursor_does_not_hide_a_reused_id(self):
+        job = self.jobs.create("Old", "job", "general", "ben")
+        self.jobs.add_message(job["id"], "ben", "old news")
+        self._read_job(job["id"])
+
+        saved = app.jobs
+        app.jobs = self.jobs
+        self.addCleanup(setattr, app, "jobs", saved)
+        request = type("FakeRequest", (), {"query_params": {"permanent": "true"}})()
+        asyncio.run(app.delete_job(job["id"], request))
+
+        self.jobs = mcp_bridge.jobs = JobStore(str(Path(self.tmp.name) / "jobs.json"))  # restart
+        reused = self.jobs.create("New", "job", "general", "ben")
+        self.assertEqual(reused["id"], job["id"])
+        self.jobs.add_message(reused["id"], "ben", "fresh")
+        read = self._read_job(reused["id"])
+        self.assertEqual(read[0]["title"], "New")
+        self.assertEqual([m["text"] for m in read[1:]], ["fresh"])
+
+    def _read_job(self, job_id):
+        return json.loads(mcp_bridge.chat_read(sender="codex", job_id=job_id))
+
+    def test_cursor_starts_from_the_first_message(self):
+        job = self.jobs.create("Empty", "job", "general", "ben")
+        read = lambda: json.loads(mcp_bridge.chat_read(sender="codex", job_id=job["id"]))
+        self.assertEqual(len(read()), 1)  # header only
+        self.jobs.add_message(job["id"], "ben", "first")
+        self.assertEqual([m["id"] for m in read()], [0])
+        self.assertEqual(read(), [])
+
+    def test_since_id_and_limit_page_forward(self):
+        page = self.jobs.get_messages(self.job["id"], since_id=None, limit=2)
+        self.assertEqual([m["id"] for m in page], [0, 1])
+        page = self.jobs.get_messages(self.job["id"], since_id=page[-1]["id"], limit=2)
+        self.assertEqual([m["id"] for m in page], [2, 3])
+        self.assertEqual([m["id"] for m in self.jobs.get_messages(self.job["id"], since_id=3)], [4])
+        self.assertIsNone(self.jobs.get_messages(999))
+        self.assertEqual([m["id"] for m in self._read(since_id=2)], [3, 4])  # explicit since_id: no header
+
+
+if __name__ == "__main__":
+    unittest.main()
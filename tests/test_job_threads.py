@@ -0,0 +1,90 @@
+"""Tests for JobStore's split metadata/thread persistence."""
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import jobs as jobs_module
+from jobs import JobStore
+
+
+class JobThreadStorageTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        self.path = self.root / "jobs.json"
+
+    def test_message_appends_to_thread_log_without_rewriting_snapshot(self):
+        store = JobStore(str(self.path))
+        job = store.create("Fix the build", "job", "general", "ben", status="open")
+        snapshot_before = self.path.exists() and self.path.read_text("utf-8")
+        store.add_message(job["id"], "codex", "on it")
+        store.add_message(job["id"], "claude", "me too")
+
+        thread = self.root / "job_threads" / f"{job['id']}.jsonl"
+        self.assertEqual(len(thread.read_text("utf-8").splitlines()), 2)
+        self.assertEqual(self.path.exists() and self.path.read_text("utf-8"), snapshot_before)
+
+        reloaded = JobStore(str(self.path))
+        restored = reloaded.get(job["id"])
+        self.assertEqual([m["text"] for m in restored["messages"]], ["on it", "me too"])
+        self.assertEqual(restored["updated_at"], store.get(job["id"])["updated_at"])
+        self.assertEqual(restored["status"], "open")
+
+    def test_message_edits_replace_earlier_lines_on_reload(self):
+        store = JobStore(str(self.path))
+        job = store.create("Review", "job", "general", "ben")
+        store.add_message(job["id"], "codex", "first")
+        store.add_message(job["id"], "codex", "try this", msg_type="suggestion")
+        store.delete_message(job["id"], 0)
+        self.assertEqual(store.resolve_message(job["id"], 1, "accepted")["resolved"], "accepted")
+        self.assertIsNone(store.resolve_message(job["id"], 5, "accepted"))
+
+        msgs = JobStore(str(self.path)).get_messages(job["id"])
+        self.assertEqual(len(msgs), 2)
+        self.assertTrue(msgs[0]["deleted"])
+        self.assertEqual(msgs[1]["resolved"], "accepted")
+
+    def test_legacy_embedded_messages_are_migrated(self):
+        legacy = [{
+            "id": 3, "uid": "j3", "type": "job", "title": "Old", "body": "", "status": "done",
+            "channel": "general", "created_by": "ben", "assignee": "", "anchor_msg_id": None,
+            "created_at": 1.0, "updated_at": 2.0, "sort_order": 1,
+            "messages": [{"id": 0, "uid": "m0", "sender": "ben", "text": "hello",
+                          "time": "00:00:01", "timestamp": 1.0, "attachments": []}],
+        }]
+        self.path.write_text(json.dumps(legacy), "utf-8")
+
+        store = JobStore(str(self.path))
+        self.assertEqual(store.get_messages(3)[0]["text"], "hello")
+        self.assertNotIn("messages", json.loads(self.path.read_text("utf-8"))[0])
+        self.assertTrue((self.root / "job_threads" / "3.jsonl").exists())
+        self.assertEqual(store.create("New", "job", "general", "ben")["id"], 4)
+
+    def test_journal_compacts_into_snapshot(self):
+        with mock.patch.object(jobs_module, "JOURNAL_MAX_LINES", 3):
+            store = JobStore(str(self.path))
+            job = store.create("A", "job", "general", "ben")
+            for title in ("B", "C", "D", "E"):
+                store.update_title(job["id"], title)
+        journal = self.root / "jobs.journal"
+        self.assertLess(len(journal.read_text("utf-8").splitlines()) if journal.exists() else 0, 3)
+        self.assertEqual(json.loads(self.path.read_text("utf-8"))[0]["title"], "D")
+
+        reloaded = JobStore(str(self.path))
+        self.assertEqual(reloaded.get(job["id"])["title"], "E")
+        reloaded.delete(job["id"])
+        self.assertEqual(JobStore(str(self.path)).list_all(), [])
+        self.assertFalse((self.root / "job_threads" / f"{job['id']}.jsonl").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+"""Tests for serving the MCP transports from the web app ([mcp] mount)."""
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app as app_module
+import mcp_bridge
+from config_loader import mcp_config
+from store import MessageStore
+
+
+class FakeRegistry:
+    """Just enough of the registry for token-authenticated tool calls."""
+
+    def __init__(self, tokens):
+        self._tokens = tokens
+
+    def resolve_token(self, token):
+        name = self._tokens.get(token)
+        return {"name": name, "label": name} if name else None
+
+    def is_registered(self, name):
+        return name in self._tokens.values()
+
+    is_agent_family = is_registered
+
+    def resolve_name(self, name):
+        return name
+
+    def is_pending(self, name):
+        return False
+
+    def get_bases(self):
+        return []
+
+    def get_instance(self, name):
+        return None
+
+
+class McpMountTests(unittest.TestCase):
+    def test_mount_resolves_both_transports_to_the_web_port(self):
+        config = {"server": {"port": 8310}, "mcp": {"http_port": 8200, "sse_port": 8201, "mount": True}}
+        cfg = mcp_config(config)
+        self.assertEqual((cfg["http_port"], cfg["sse_port"]), (8310, 8310))
+        self.assertEqual(config["mcp"]["http_port"], 8200)  # input not mutated
+
+    def test_separate_ports_by_default(self):
+        cfg = mcp_config({"server": {"port": 8310}, "mcp": {"http_port": 8200, "sse_port": 8201}})
+        self.assertEqual((cfg["http_port"], cfg["sse_port"]), (8200, 8201))
+
+    def test_mount_on_adds_transport_routes_and_lifecycle_hooks(self):
+        app = FastAPI()
+        mcp_bridge.mount_on(app)
+        paths = {getattr(route, "path", "") for route in app.router.routes}
+        self.assertTrue({"/mcp", "/sse", "/messages"} <= paths)
+        self.assertEqual(len(app.router.on_startup), 1)
+        self.assertEqual(len(app.router.on_shutdown), 1)
+
+
+
+class McpMountedCallTests(unittest.TestCase):
+    """One initialize + tools/call round-trip through the web app's
+    middleware and the mounted streamable-http transport."""
+
+    HEADERS = {"accept": "application/json, text/event-stream", "content-type": "application/json"}
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = MessageStore(str(Path(self.tmp.name) / "messages.jsonl"))
+        saved = (mcp_bridge.store, mcp_bridge.registry, mcp_bridge.rate_limiter,
+                 mcp_bridge.mcp_http, mcp_bridge.mcp_sse,
+                 app_module.registry, app_module.session_token)
+        mcp_bridge.store = self.store
+        mcp_bridge.registry = app_module.registry = FakeRegistry({"tok-claude": "claude"})
+        mcp_bridge.rate_limiter = None
+        # A session manager only runs once, so each app gets fresh servers
+        mcp_bridge.mcp_http = mcp_bridge._create_server(8200)
+        mcp_bridge.mcp_sse = mcp_bridge._create_server(8201)
+
+        def restore():
+            (mcp_bridge.store, mcp_bridge.registry, mcp_bridge.rate_limiter,
+             mcp_bridge.mcp_http, mcp_bridge.mcp_sse,
+             app_module.registry, app_module.session_token) = saved
+
+        self.addCleanup(restore)
+
+        self.web = FastAPI()
+        app_module._install_security_middleware("web-token", {"mcp": {"mount": True}}, target=self.web)
+        mcp_bridge.mount_on(self.web)
+
+    @staticmethod
+    def _result(response):
+        """A JSON-RPC result from a JSON or single-event SSE response."""
+        body = response.text
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            body = next(line[5:] for line in body.splitlines() if line.startswith("data:"))
+        return json.loads(body)
+
+    def _rpc(self, client, method, params=None, session=None, rpc_id=1):
+        headers = dict(self.HEADERS, authorization="Bearer tok-claude")
+        if session:
+            headers["mcp-session-id"] = session
+        payload = {"jsonrpc": "2.0", "method": method, "params": params or {}}
+        if rpc_id is not None:
+            payload["id"] = rpc_id
+        return client.post("/mcp/", headers=headers, json=payload)
+
+    def test_tool_call_round_trip_injects_identity(self):
+        with TestClient(self.web, base_url="http://127.0.0.1:8300", client=("127.0.0.1", 50000)) as client:
+            init = self._rpc(client, "initialize", {
+                "protocolVersion": "2025-03-26", "capabilities": {},
+                "clientInfo": {"name": "test", "version": "1"}})
+            self.assertEqual(init.status_code, 200, init.text)
+            session = init.headers["mcp-session-id"]
+            self._rpc(client, "notifications/initialized", session=session, rpc_id=None)
+
+            # No session header: rejected by the transport, not the web token check
+            self.assertEqual(self._rpc(client, "tools/call", {"name": "chat_read", "arguments": {}}).status_code, 400)
+
+            call = self._rpc(client, "tools/call", {
+                "name": "chat_send", "arguments": {"sender": "", "message": "hello from mcp"}},
+                session=session, rpc_id=2)
+            self.assertEqual(call.status_code, 200, call.text)
+            self.assertFalse(self._result(call)["result"].get("isError"), call.text)
+
+        sent = self.store.get_recent()
+        self.assertEqual([(m["sender"], m["text"]) for m in sent], [("claude", "hello from mcp")])
+
+    def test_remote_clients_are_refused(self):
+        with TestClient(self.web, base_url="http://127.0.0.1:8300", client=("10.0.0.5", 50000)) as client:
+            response = self._rpc(client, "initialize")
+        self.assertEqual(response.status_code, 403)
+        self.assertIn("loopback", response.text)
+
+
+if __name__ == "__main__":
+    unittest.main()
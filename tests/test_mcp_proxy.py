@@ -0,0 +1,161 @@
+"""Tests for the MCP identity proxies (asyncio and threaded)."""
+
+import http.client
+import json
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from mcp_proxy import McpIdentityProxy, ThreadedMcpIdentityProxy, _inject_sender
+
+
+TOOL_CALL = json.dumps({
+    "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+    "params": {"name": "chat_send", "arguments": {"sender": "someone-else", "message": "hi"}},
+}).encode()
+
+
+class _Upstream(ThreadingHTTPServer):
+    """Keep-alive stub MCP server that records what it was sent."""
+    daemon_threads = True
+
+    def __init__(self):
+        self.requests = []
+        self.connections = 0
+        self.release = threading.Event()
+        super().__init__(("127.0.0.1", 0), _UpstreamHandler)
+
+
+class _UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests.append((self.headers, body))
+        if self.path == "/stream":
+            # streamable-http answering a POST with an SSE stream
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Mcp-Session-Id", "s1")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self._chunk(b"event: message\ndata: progress\n\n")
+            self.server.release.wait(5)
+            self._chunk(b"event: message\ndata: done\n\n")
+            self._chunk(b"")
+            return
+        reply = json.dumps({"jsonrpc": "2.0", "id": 1, "result": {}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Mcp-Session-Id", "s1")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._chunk(b"event: endpoint\ndata: http://127.0.0.1:8201/messages/?session_id=abc\n\n")
+        self._chunk(b"event: message\ndata: {}\n\n")
+        self._chunk(b"")
+
+
+class McpIdentityProxyTests(unittest.TestCase):
+    proxy_class = McpIdentityProxy
+
+    def setUp(self):
+        self.upstream = _Upstream()
+        threading.Thread(target=self.upstream.serve_forever, daemon=True).start()
+        self.addCleanup(self.upstream.server_close)
+        self.addCleanup(self.upstream.shutdown)
+        base = f"http://127.0.0.1:{self.upstream.server_address[1]}"
+        self.proxy = self.proxy_class(base, "/mcp", "claude", "tok123")
+        self.proxy.start()
+        self.addCleanup(self.proxy.stop)
+        self.client = http.client.HTTPConnection("127.0.0.1", self.proxy.port, timeout=5)
+        self.addCleanup(self.client.close)
+
+    def _post(self, body: bytes):
+        self.client.request("POST", "/mcp", body=body, headers={"Content-Type": "application/json"})
+        resp = self.client.getresponse()
+        return resp, resp.read()
+
+    def test_stamps_sender_and_token(self):
+        resp, body = self._post(TOOL_CALL)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(resp.getheader("Mcp-Session-Id"), "s1")
+        self.assertEqual(json.loads(body)["id"], 1)
+        self._post(b'{"jsonrpc": "2.0", "method": "notifications/initialized"}')
+
+        (headers, sent), (_, notification) = self.upstream.requests
+        self.assertEqual(json.loads(sent)["params"]["arguments"]["sender"], "claude")
+        self.assertEqual(headers["Authorization"], "Bearer tok123")
+        self.assertEqual(headers["X-Agent-Token"], "tok123")
+        self.assertIn(b"notifications/initialized", notification)
+
+    def test_streams_sse_post_response_incrementally(self):
+        self.client.request("POST", "/stream", body=TOOL_CALL, headers={"Content-Type": "application/json"})
+        resp = self.client.getresponse()
+        self.assertEqual(resp.getheader("Mcp-Session-Id"), "s1")  # once, not "s1, s1"
+        first = b""
+        while b"\n\n" not in first:
+            first += resp.read1(1024)  # arrives while the upstream is still open
+        self.assertEqual(first, b"event: message\ndata: progress\n\n")
+        self.upstream.release.set()
+        self.assertEqual(resp.read(), b"event: message\ndata: done\n\n")
+        resp2, _ = self._post(TOOL_CALL)  # client connection still usable
+        self.assertEqual(resp2.status, 200)
+
+    def test_rewrites_sse_endpoint_in_chunked_stream(self):
+        self.client.request("GET", "/sse")
+        resp = self.client.getresponse()
+        body = resp.read()
+        self.assertIn(f"data: {self.proxy.url}/messages/?session_id=abc".encode(), body)
+        self.assertTrue(body.endswith(b"event: message\ndata: {}\n\n"))
+
+    def test_upstream_down_returns_502(self):
+        self.upstream.shutdown()
+        self.upstream.server_close()
+        resp, body = self._post(TOOL_CALL)
+        self.assertEqual(resp.status, 502)
+        self.assertIn(b"Upstream error", body)
+
+    def test_reuses_upstream_connection(self):
+        self._post(TOOL_CALL)
+        self._post(TOOL_CALL)
+        self.assertEqual(self.upstream.connections, 1)
+
+    def test_inject_sender_skips_parsing_bodies_without_tool_calls(self):
+        raw = b'{"jsonrpc": "2.0", "id": 2, "method": "tools/list"}'
+        self.assertIs(_inject_sender(raw, "claude"), raw)
+        stamped = json.loads(_inject_sender(TOOL_CALL, "claude"))
+        self.assertEqual(stamped["params"]["arguments"]["sender"], "claude")
+
+
+class ThreadedMcpIdentityProxyTests(McpIdentityProxyTests):
+    proxy_class = ThreadedMcpIdentityProxy
+
+    test_reuses_upstream_connection = None  # fresh urllib connection per request
+
+
+if __name__ == "__main__":
+    unittest.main()
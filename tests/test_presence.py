@@ -0,0 +1,112 @@
+"""Tests for the expiry-heap presence tracker."""
+
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from presence import PresenceTracker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class PresenceTrackerTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.tracker = PresenceTracker(presence_timeout=10, activity_timeout=8, clock=self.clock)
+        self.events = []
+        self.tracker.on_change(lambda event, name: self.events.append((event, name)))
+
+    def test_touch_fires_online_once_and_expires_exactly_at_deadline(self):
+        self.tracker.touch("claude")
+        self.tracker.touch("claude")
+        self.assertEqual(self.events, [("online", "claude")])
+
+        self.clock.now += 6
+        self.tracker.touch("claude")  # pushes the deadline out without a heap entry
+        self.clock.now += 9.9
+        self.assertEqual(self.tracker.expire(), 1016.0)
+        self.assertTrue(self.tracker.is_online("claude"))
+
+        self.clock.now += 0.1
+        self.assertIsNone(self.tracker.expire())
+        self.assertEqual(self.events[-1], ("offline", "claude"))
+        self.assertFalse(self.tracker.is_online("claude"))
+        self.assertEqual(self.tracker.snapshot().online, frozenset())
+
+    def test_activity_goes_idle_on_timeout_and_when_agent_goes_offline(self):
+        self.tracker.touch("codex")
+        self.tracker.set_active("codex", True)
+        self.assertTrue(self.tracker.is_active("codex"))
+        self.clock.now += 8.5
+        self.tracker.expire()
+        self.assertEqual(self.events[-1], ("idle", "codex"))
+
+        self.tracker.touch("codex")
+        self.tracker.set_active("codex", True)
+        self.clock.now += 5
+        self.tracker.expire()
+        self.assertIn("codex", self.tracker.snapshot().active)
+        self.clock.now += 10
+        self.tracker.expire()
+        self.assertEqual(self.events[-2:], [("idle", "codex"), ("offline", "codex")])
+
+    def test_rename_moves_state_without_offline(self):
+        self.tracker.touch("claude")
+        self.tracker.rename("claude", "claude-1")
+        self.assertEqual(self.events, [("online", "claude"), ("renamed", "claude"), ("online", "claude-1")])
+        self.assertEqual(self.tracker.online(), ["claude-1"])
+
+        self.clock.now += 11
+        self.tracker.expire()
+        self.assertEqual(self.events[-1], ("offline", "claude-1"))
+        self.assertNotIn(("offline", "claude"), self.events)
+
+    def test_remove_fires_offline_and_drops_pending_deadline(self):
+        self.tracker.touch("gemini")
+        self.tracker.remove("gemini")
+        self.assertEqual(self.events[-1], ("offline", "gemini"))
+        self.clock.now += 11
+        self.tracker.expire()
+        self.assertEqual(len(self.events), 2)
+        self.assertEqual(self.tracker.last_seen("gemini"), 0)
+
+    def test_lost_fires_after_crash_timeout_unless_agent_returns(self):
+        tracker = PresenceTracker(presence_timeout=10, activity_timeout=8, lost_timeout=15, clock=self.clock)
+        events = []
+        tracker.on_change(lambda event, name: events.append((event, name)))
+        tracker.touch("claude")
+        tracker.touch("codex")
+        self.clock.now += 10
+        tracker.expire()
+        tracker.touch("codex")  # came back before the crash timeout
+        self.clock.now += 5
+        tracker.expire()
+        self.assertIn(("lost", "claude"), events)
+        self.assertNotIn(("lost", "codex"), events)
+
+    def test_background_thread_fires_transition_without_polling(self):
+        tracker = PresenceTracker(presence_timeout=0.05, activity_timeout=0.05)
+        offline = threading.Event()
+        tracker.on_change(lambda event, name: event == "offline" and offline.set())
+        tracker.start()
+        self.addCleanup(tracker.close)
+        start = time.monotonic()
+        tracker.touch("kimi")
+        self.assertTrue(offline.wait(2))
+        self.assertLess(time.monotonic() - start, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""Tests for per-agent, per-tool MCP rate limiting."""
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import mcp_bridge
+import ratelimit
+from ratelimit import RateLimiter
+from store import MessageStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimiterTests(unittest.TestCase):
+    def test_bucket_allows_burst_then_refills_at_rate(self):
+        clock = FakeClock()
+        limiter = RateLimiter(per_minute=60, burst=3, clock=clock)
+        self.assertEqual([limiter.check("claude", "chat_read") for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(limiter.check("claude", "chat_read"), 1.0)
+        self.assertEqual(limiter.check("codex", "chat_read"), 0)  # separate bucket per identity
+        self.assertEqual(limiter.check("claude", "chat_send"), 0)  # and per tool
+
+        clock.now += 1
+        self.assertEqual(limiter.check("claude", "chat_read"), 0)
+        stats = limiter.stats()
+        self.assertEqual(stats["rejected"], {"chat_read": 1})
+        self.assertEqual(stats["rejected_by_agent"], {"claude": 1})
+
+    def test_config_overrides_and_unlimited_tools(self):
+        limiter = RateLimiter.from_config({"per_minute": 10, "burst": 1, "chat_wait": 0, "chat_send": 2})
+        self.assertEqual(limiter.limit_for("chat_send"), 2)
+        self.assertEqual(limiter.limit_for("chat_read"), 10)
+        self.assertTrue(all(limiter.check("a", "chat_wait") == 0 for _ in range(100)))
+        self.assertIsNone(RateLimiter.from_config(None))
+        self.assertIsNone(RateLimiter.from_config({"enabled": False, "per_minute": 10}))
+        self.assertIsNone(RateLimiter.from_config({"per_minute": 0, "burst": 20, "chat_wait": 0}))
+        self.assertIsNotNone(RateLimiter.from_config({"per_minute": 0, "chat_send": 30}))
+
+    def test_refilled_buckets_are_swept(self):
+        clock = FakeClock()
+        limiter = RateLimiter(per_minute=1, burst=2, clock=clock)
+        limiter.check("gone", "chat_read")
+        clock.now += ratelimit.SWEEP_INTERVAL - 1
+        limiter.check("busy", "chat_read")
+        limiter.check("busy", "chat_read")
+        clock.now += 1
+        limiter.check("busy", "chat_send")
+        self.assertEqual(set(limiter._buckets), {("busy", "chat_read"), ("busy", "chat_send")})
+
+
+class ToolRateLimitTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        saved = (mcp_bridge.store, mcp_bridge.registry, mcp_bridge.rate_limiter)
+        mcp_bridge.store = MessageStore(str(Path(self.tmp.name) / "messages.jsonl"))
+        mcp_bridge.registry = None
+        mcp_bridge.rate_limiter = RateLimiter(per_minute=60, burst=2, tools={"chat_send": 1})
+
+        def restore():
+            mcp_bridge.store, mcp_bridge.registry, mcp_bridge.rate_limiter = saved
+
+        self.addCleanup(restore)
+
+    def test_over_limit_send_is_rejected_with_structured_error(self):
+        self.assertTrue(mcp_bridge.chat_send(sender="bot", message="one").startswith("Sent"))
+        rejected = json.loads(mcp_bridge.chat_send(sender="bot", message="two"))
+        self.assertEqual(rejected["error"], "rate_limited")
+        self.assertEqual(rejected["tool"], "chat_send")
+        self.assertGreater(rejected["retry_after"], 0)
+        self.assertEqual(len(mcp_bridge.store.get_recent()), 1)
+        # Other tools and other agents are unaffected
+        self.assertIn("one", mcp_bridge.chat_read(sender="bot"))
+        self.assertTrue(mcp_bridge.chat_send(sender="human", message="hi").startswith("Sent"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""Tests for chat_read size budgets, long-body elision and summary substitution."""
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import mcp_bridge
+from store import MessageStore
+from summaries import SummaryStore
+
+
+class ReadBudgetTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        root = Path(self.tmp.name)
+        self.store = MessageStore(str(root / "messages.jsonl"))
+        self.summaries = SummaryStore(str(root / "summaries.json"))
+
+        saved = (mcp_bridge.store, mcp_bridge.summaries, mcp_bridge.registry)
+        mcp_bridge.store = self.store
+        mcp_bridge.summaries = self.summaries
+        mcp_bridge.registry = None
+
+        def restore():
+            mcp_bridge.store, mcp_bridge.summaries, mcp_bridge.registry = saved
+
+        self.addCleanup(restore)
+
+    def _read(self, **kwargs):
+        return json.loads(mcp_bridge.chat_read(**kwargs))
+
+    def test_long_bodies_are_elided_and_fetchable_in_full(self):
+        log = "start-" + "x" * 40_000 + "-end"
+        msg = self.store.add("ben", log)
+
+        entry = self._read(limit=5)[0]
+        self.assertLess(len(entry["text"]), mcp_bridge.READ_ELIDE_CHARS + 200)
+        self.assertTrue(entry["text"].startswith("start-"))
+        self.assertTrue(entry["text"].endswith("-end"))
+        self.assertIn(f"chat_get_message(id={msg['id']})", entry["text"])
+
+        full = json.loads(mcp_bridge.chat_get_message(id=msg["id"]))
+        self.assertEqual(full["text"], log)
+
+    def test_budget_keeps_newest_messages_and_notes_the_rest(self):
+        for i in range(10):
+            self.store.add("ben", f"message {i} " + "y" * 200)
+
+        out = self._read(limit=10, max_chars=1200)
+        self.assertLessEqual(len(json.dumps(out, ensure_ascii=False)), 1200 + 300)
+        notice, kept = out[0], out[1:]
+        self.assertEqual(notice["type"], "notice")
+        self.assertEqual(kept[-1]["id"], 9)
+        self.assertIn(f"ids 0-{kept[0]['id'] - 1}", notice["text"])
+
+    def test_max_tokens_is_converted_to_chars(self):
+        for i in range(10):
+            self.store.add("ben", "z" * 400)
+        by_tokens = self._read(limit=10, max_tokens=300)
+        by_chars = self._read(limit=10, max_chars=1200)
+        self.assertEqual(len(by_tokens), len(by_chars))
+
+    def test_summary_replaces_covered_messages(self):
+        for i in range(5):
+            self.store.add("ben", f"old {i}", channel="design")
+        self.summaries.write("design", "We picked option B.", "claude", message_id=2)
+
+        out = self._read(limit=10, channel="design", use_summary=True)
+        self.assertEqual(out[0]["type"], "summary")
+        self.assertEqual(out[0]["replaced"], 3)
+        self.assertEqual([m["id"] for m in out[1:]], [3, 4])
+
+    def test_compact_format_omits_defaults_and_repeated_channels(self):
+        self.store.add("ben", "hello", channel="design")
+        self.store.add("claude", "hi", channel="design", reply_to=0)
+        self.store.add("ben", "elsewhere", channel="general",
+                       attachments=[{"name": "a.png", "url": "/uploads/a.png"}])
+
+        compact = self._read(limit=10, compact=True)
+        self.assertEqual(compact["cols"], ["id", "sender", "time", "text"])
+        rows = compact["rows"]
+        self.assertEqual(rows[0][4], {"channel": "design"})
+        self.assertEqual(rows[1][4], {"reply_to": 0})
+        self.assertEqual(rows[2][4]["channel"], "general")
+        self.assertTrue(Path(rows[2][4]["files"][0]).is_absolute())
+
+        verbose = mcp_bridge.chat_read(limit=10)
+        self.assertLess(len(mcp_bridge.chat_read(limit=10, compact=True)), len(verbose) * 0.7)
+
+    def test_compact_budget_is_measured_on_compact_rows(self):
+        for i in range(10):
+            self.store.add("ben", f"message {i} " + "y" * 200)
+        rows = self._read(limit=10, max_chars=1200, compact=True)["rows"]
+        self.assertEqual(rows[0][4]["type"], "notice")
+        self.assertEqual(rows[-1][0], 9)
+        verbose = self._read(limit=10, max_chars=1200)
+        self.assertGreaterEqual(len(rows), len(verbose))  # same budget fits at least as many
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,14 @@
 import sys
+import threading
 import unittest
 from pathlib import Path
+from unittest import mock
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+import router as router_module
 from router import Router
 
 
@@ -39,5 +42,136 @@ class RouterMentionTests(unittest.TestCase):
         self.assertEqual(router.get_targets("ben", "@telegram-bot check"), [])
 
 
+class RouterClassifyTests(unittest.TestCase):
+    def test_classify_finds_mentions_command_and_session_block(self):
+        router = Router(["claude", "codex"], default_mention="none")
+        info = router.classify("@Claude @codex-2 /Poetry limerick\n```session\n{\"a\": 1}\n```")
+
+        self.assertEqual(info.mentions, ["claude"])
+        self.assertEqual(info.command, "/poetry")
+        self.assertTrue(info.stripped.startswith("/poetry limerick"))
+        self.assertEqual(info.session_draft, '{"a": 1}')
+        self.assertEqual(router.classify("mail ben@example.com").command, "")
+        self.assertIsNone(router.classify("no block").session_draft)
+
+    def test_all_expands_from_pushed_online_snapshot_without_checker(self):
+        calls = []
+        router = Router(["claude", "codex", "gemini"], default_mention="none",
+                        online_checker=lambda: calls.append(1) or {"claude"})
+        self.assertEqual(router.parse_mentions("@all hi"), ["claude"])  # no snapshot yet
+        self.assertEqual(len(calls), 1)
+
+        router.update_snapshot(["claude", "codex", "gemini"], online=["codex", "gemini"], version=5)
+        self.assertEqual(sorted(router.parse_mentions("@both and @all")), ["codex", "gemini"])
+        self.assertEqual(len(calls), 1)
+
+    def test_stale_snapshot_versions_are_dropped(self):
+        router = Router(["claude"], default_mention="none")
+        self.assertTrue(router.update_snapshot(["claude", "codex"], online=[], version=10))
+        self.assertFalse(router.update_snapshot(["claude"], online=["claude"], version=9))
+        self.assertEqual(router.agent_names, {"claude", "codex"})
+        self.assertEqual(router.parse_mentions("@codex"), ["codex"])
+        router.update_agents(["claude"])  # unversioned updates still advance
+        self.assertEqual(router.snapshot.version, 11)
+        self.assertEqual(router.parse_mentions("@codex"), [])
+
+    def test_older_push_racing_a_newer_one_loses(self):
+        router = Router(["claude"], default_mention="none")
+        building, release = threading.Event(), threading.Event()
+        real_build = router_module._build_trie
+
+        def slow_build(names):
+            if "slow" in names:
+                building.set()
+                release.wait(5)
+            return real_build(names)
+
+        results = []
+        with mock.patch.object(router_module, "_build_trie", slow_build):
+            older = threading.Thread(target=lambda: results.append(
+                router.update_snapshot(["claude", "slow"], online=[], version=5)))
+            older.start()
+            building.wait(5)
+            self.assertTrue(router.update_snapshot(["claude", "codex"], online=[], version=6))
+            release.set()
+            older.join()
+        self.assertEqual(results, [False])
+        self.assertEqual((router.snapshot.version, router.agent_names), (6, {"claude", "codex"}))
+
+    def test_names_with_non_handle_characters(self):
+        router = Router(["gpt", "gpt.4"], default_mention="none")
+
+        self.assertEqual(router.parse_mentions("ask @GPT.4 now"), ["gpt.4"])
+        self.assertEqual(router.parse_mentions("ask @gpt. now"), ["gpt"])
+
+
+class RouterThreadGuardTests(unittest.TestCase):
+    def setUp(self):
+        self.router = Router(["claude", "codex", "gemini", "qwen"], default_mention="none", max_hops=2)
+
+    def test_runaway_thread_pauses_without_stalling_another(self):
+        r = self.router
+        r.route("ben", "@claude @codex ping", msg_id=1)
+        r.route("ben", "@gemini @qwen pong", msg_id=2)
+
+        self.assertEqual(r.route("claude", "@codex", msg_id=3).targets, ["codex"])
+        self.assertEqual(r.route("codex", "@claude", msg_id=4).targets, ["claude"])
+        runaway = r.route("claude", "@codex", msg_id=5)
+        self.assertTrue(runaway.paused)
+        self.assertEqual(runaway.targets, [])
+        self.assertTrue(r.is_paused("general"))
+
+        other = r.route("gemini", "@qwen", msg_id=6)
+        self.assertEqual(other.targets, ["qwen"])
+        self.assertFalse(r.is_paused("general", other.thread))
+
+        r.continue_routing("general")
+        self.assertFalse(r.is_paused("general"))
+        self.assertEqual(r.route("codex", "@claude", msg_id=7).targets, ["claude"])
+
+    def test_replies_join_the_thread_they_answer(self):
+        r = self.router
+        r.route("ben", "@claude go", msg_id=1)
+        r.route("ben", "@gemini go", msg_id=2)
+        for i in range(3):
+            r.route("claude", "@gemini", msg_id=10 + i, reply_to=1)
+        self.assertTrue(r.is_paused("general", ("general", 1)))
+        self.assertFalse(r.is_paused("general", ("general", 2)))
+
+        # A human reply into the paused thread resets just that thread
+        self.assertFalse(r.route("ben", "@claude again", msg_id=20, reply_to=12).paused)
+        self.assertFalse(r.is_paused("general"))
+
+    def test_stats_count_hops_and_pauses_per_channel(self):
+        r = self.router
+        r.route("ben", "@claude", channel="dev")
+        for _ in range(3):
+            r.route("claude", "@codex", channel="dev")
+        stats = r.stats()["dev"]
+        self.assertEqual((stats["hops"], stats["pauses"], stats["paused_threads"]), (3, 1, 1))
+        self.assertFalse(r.is_guard_emitted("dev"))
+        r.set_guard_emitted("dev")
+        self.assertTrue(r.is_guard_emitted("dev"))
+        self.assertNotIn("general", r.stats())
+
+    def test_stats_while_other_threads_route(self):
+        r, stop = self.router, threading.Event()
+
+        def route_forever():
+            i = 0
+            while not stop.is_set():
+                r.route("ben", "@claude", channel=f"c{i % 50}", msg_id=i)
+                i += 1
+
+        worker = threading.Thread(target=route_forever)
+        worker.start()
+        try:
+            for _ in range(2000):
+                r.stats()  # raised "dictionary changed size" without the lock
+        finally:
+            stop.set()
+            worker.join()
+
+
 if __name__ == "__main__":
     unittest.main()
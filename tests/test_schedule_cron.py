@@ -0,0 +1,75 @@
+"""Tests for cron schedule specs and per-schedule jitter."""
+
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import schedules as schedules_module
+from schedules import ScheduleStore, cron_from_spec, cron_next, next_occurrence
+
+
+def ts(*args):
+    return datetime(*args).timestamp()
+
+
+class CronTests(unittest.TestCase):
+    def test_next_matches_fields(self):
+        start = ts(2026, 3, 6, 9, 30)  # Friday
+        self.assertEqual(cron_next("*/15 * * * *", start), ts(2026, 3, 6, 9, 45))
+        self.assertEqual(cron_next("0 9 * * mon-fri", start), ts(2026, 3, 9, 9, 0))
+        self.assertEqual(cron_next("30 9 * * *", start), ts(2026, 3, 7, 9, 30))  # strictly after
+        self.assertEqual(cron_next("0 0 1 jan,jul *", start), ts(2026, 7, 1, 0, 0))
+        self.assertEqual(cron_next("0 12 * * 7", start), ts(2026, 3, 8, 12, 0))  # 7 is Sunday
+        self.assertEqual(cron_next("0 8-18/4 * * *", start), ts(2026, 3, 6, 12, 0))
+
+    def test_restricted_day_fields_match_either(self):
+        # 15th of the month OR any Monday, whichever comes first
+        self.assertEqual(cron_next("0 0 15 * mon", ts(2026, 3, 10, 12, 0)), ts(2026, 3, 15, 0, 0))
+        self.assertEqual(cron_next("0 0 15 * mon", ts(2026, 3, 6, 12, 0)), ts(2026, 3, 9, 0, 0))
+
+    def test_spec_detection_and_errors(self):
+        self.assertEqual(cron_from_spec("cron 0 9 * * MON-FRI"), "0 9 * * MON-FRI")
+        self.assertEqual(cron_from_spec("  */5  * * * * "), "*/5 * * * *")
+        self.assertIsNone(cron_from_spec("every 30m"))
+        self.assertIsNone(cron_from_spec("daily at 09:00"))
+        for bad in ("cron 61 * * * *", "cron * * * *", "0 9 * * funday", "*/0 * * * *"):
+            with self.assertRaises(ValueError):
+                cron_from_spec(bad)
+        with self.assertRaises(ValueError):
+            cron_next("0 0 31 2 *", ts(2026, 1, 1))
+
+
+class JitterTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = ScheduleStore(str(Path(self.tmp.name) / "schedules.json"))
+
+    def test_jitter_delays_run_without_shifting_cadence(self):
+        start = ts(2026, 3, 6, 9, 0)
+        with mock.patch.object(schedules_module.random, "uniform", return_value=42.0):
+            s = self.store.create("ping", ["claude"], interval_seconds=600, send_at=start,
+                                  jitter_seconds=120)
+            self.assertEqual(s["base_run"], start)
+            self.assertEqual(s["next_run"], start + 42)
+            updated = self.store.mark_run(s["id"], now=start + 42)
+        self.assertEqual(updated["base_run"], start + 600)
+        self.assertEqual(updated["next_run"], start + 642)
+
+    def test_cron_schedule_advances_on_cron_slots(self):
+        s = self.store.create("standup", ["claude"], cron="0 9 * * mon-fri")
+        self.assertIsNone(s["interval_seconds"])
+        self.assertEqual(s["next_run"], s["base_run"])  # no jitter window
+        schedule = {"cron": "0 9 * * mon-fri", "base_run": ts(2026, 3, 6, 9, 0)}
+        self.assertEqual(next_occurrence(schedule, ts(2026, 3, 6, 9, 1)), ts(2026, 3, 9, 9, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
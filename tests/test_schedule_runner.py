@@ -0,0 +1,116 @@
+"""Tests for the heap-based schedule runner."""
+
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from schedules import ScheduleRunner, ScheduleStore, next_occurrence
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class ScheduleRunnerTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = ScheduleStore(str(Path(self.tmp.name) / "schedules.json"))
+        self.clock = FakeClock(1_000_000.0)
+        self.fired = []
+
+    def runner(self, **kwargs):
+        return ScheduleRunner(self.store, lambda s: self.fired.append(s["id"]), clock=self.clock, **kwargs)
+
+    def create(self, next_run: float, interval: int = 600, **kwargs):
+        return self.store.create("standup", ["claude"], interval_seconds=interval,
+                                 send_at=next_run, **kwargs)
+
+    def test_fires_exactly_at_next_run_and_keeps_cadence(self):
+        runner = self.runner()
+        s = self.create(self.clock.now + 600)
+        self.clock.now += 599.9
+        self.assertEqual(runner.run_pending(), s["next_run"])
+        self.assertEqual(self.fired, [])
+
+        self.clock.now += 5  # fired late still keeps the original slots
+        self.assertEqual(runner.run_pending(), s["next_run"] + 600)
+        self.assertEqual(self.fired, [s["id"]])
+        self.assertEqual(self.store.get(s["id"])["last_run"], self.clock.now)
+
+    def test_toggle_and_delete_wake_and_cancel(self):
+        runner = self.runner()
+        s = self.create(self.clock.now + 60)
+        self.store.toggle(s["id"])
+        self.clock.now += 60
+        self.assertIsNone(runner.run_pending())  # paused: no live entry
+        self.store.toggle(s["id"])
+        runner.run_pending()
+        self.assertEqual(self.fired, [s["id"]])
+
+        other = self.create(self.clock.now + 60)
+        self.store.delete(other["id"])
+        self.clock.now += 60
+        runner.run_pending()
+        self.assertNotIn(other["id"], self.fired)
+
+    def test_misfire_fire_once_fires_single_catch_up(self):
+        s = self.create(self.clock.now + 600)
+        self.clock.now += 600 * 10 + 30  # ten slots missed (suspend / restart)
+        runner = self.runner(misfire_policy="fire_once", misfire_grace=60)
+        runner.run_pending()
+        runner.run_pending()
+        self.assertEqual(self.fired, [s["id"]])
+        self.assertGreater(self.store.get(s["id"])["next_run"], self.clock.now)
+
+    def test_misfire_skip_waits_for_next_slot(self):
+        s = self.create(self.clock.now + 600)
+        one_shot = self.create(self.clock.now + 600, one_shot=True)
+        self.clock.now += 3600
+        runner = self.runner(misfire_policy="skip", misfire_grace=60)
+        runner.run_pending()
+        self.assertEqual(self.fired, [])
+        updated = self.store.get(s["id"])
+        self.assertIsNone(updated["last_run"])
+        self.assertEqual(updated["next_run"], s["next_run"] + 3600)
+        self.assertIsNone(self.store.get(one_shot["id"]))
+
+    def test_one_shot_is_deleted_after_firing(self):
+        runner = self.runner()
+        s = self.create(self.clock.now + 5, one_shot=True)
+        self.clock.now += 5
+        runner.run_pending()
+        self.assertEqual(self.fired, [s["id"]])
+        self.assertIsNone(self.store.get(s["id"]))
+
+    def test_daily_next_occurrence_skips_to_first_future_day(self):
+        base = datetime(2026, 3, 2, 9, 0)
+        schedule = {"interval_seconds": 86400, "daily_at": "09:00", "next_run": base.timestamp()}
+        now = (base + timedelta(days=2, hours=1)).timestamp()
+        self.assertEqual(next_occurrence(schedule, now), (base + timedelta(days=3)).timestamp())
+
+    def test_background_thread_wakes_on_create(self):
+        fired = threading.Event()
+        runner = ScheduleRunner(self.store, lambda s: fired.set())
+        runner.start()
+        self.addCleanup(runner.close)
+        start = time.monotonic()
+        self.store.create("now", ["claude"], interval_seconds=600, send_at=time.time() + 0.05)
+        self.assertTrue(fired.wait(2))
+        self.assertLess(time.monotonic() - start, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
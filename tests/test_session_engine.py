@@ -0,0 +1,288 @@
+"""Tests for SessionEngine's turn scheduler, parallel phases, turn timeouts
+and SessionStore indexes."""
+
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from session_engine import SessionEngine
+from session_store import SessionStore, validate_session_template
+
+
+class FakeClock:
+    def __init__(self, now: float = 100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeMessages:
+    def __init__(self):
+        self._callbacks = []
+        self.added = []
+        self._next_id = 1
+
+    def on_message(self, cb):
+        self._callbacks.append(cb)
+
+    def add(self, sender, text, msg_type="chat", channel="general", metadata=None):
+        msg = {"id": self._next_id, "sender": sender, "text": text, "type": msg_type,
+               "channel": channel, "metadata": metadata}
+        self._next_id += 1
+        self.added.append(msg)
+        for cb in self._callbacks:
+            cb(msg)
+        return msg
+
+
+class FakeTrigger:
+    def __init__(self):
+        self.calls = []
+
+    def trigger_sync(self, agent, channel="general", prompt=""):
+        self.calls.append(agent)
+
+
+class FakeRegistry:
+    def __init__(self, names):
+        self.names = set(names)
+
+    def is_registered(self, name):
+        return name in self.names
+
+    def get_active_names(self):
+        return sorted(self.names)
+
+
+CAST = {"builder": "claude", "reviewer": "codex", "red_team": "gemini", "synthesiser": "qwen"}
+
+
+class SessionEngineTestCase(unittest.TestCase):
+    engine_kwargs: dict = {}
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = SessionStore(str(Path(self.tmp.name) / "session_runs.json"),
+                                  templates_dir=str(ROOT / "session_templates"))
+        self.messages = FakeMessages()
+        self.trigger = FakeTrigger()
+        self.clock = FakeClock()
+        self.engine = SessionEngine(self.store, self.messages, self.trigger,
+                                    FakeRegistry(CAST.values()), clock=self.clock,
+                                    **self.engine_kwargs)
+
+    def say(self, sender, text="done"):
+        return self.messages.add(sender, text)
+
+    def tick(self, seconds=1.0):
+        self.clock.now += seconds
+        return self.engine.run_pending()
+
+
+class SessionSchedulerTests(SessionEngineTestCase):
+    def test_advance_waits_for_delay_then_triggers_next_turn(self):
+        session = self.engine.start_session("code-review", "general", CAST, "ben")
+        self.assertEqual(self.trigger.calls, ["claude"])
+
+        self.say("claude")
+        self.assertEqual(self.engine.run_pending(), self.clock.now + self.engine.advance_delay)
+        self.assertEqual(self.store.get(session["id"])["current_phase"], 0)
+
+        self.assertIsNone(self.tick())
+        self.assertEqual(self.store.get(session["id"])["current_phase"], 1)
+        self.assertEqual(self.trigger.calls, ["claude", "codex", "gemini"])
+
+    def test_duplicate_messages_in_delay_window_advance_once(self):
+        session = self.engine.start_session("code-review", "general", CAST, "ben")
+        self.tick()
+        self.say("claude", "part one")
+        self.say("claude", "part two")
+        self.tick()
+
+        current = self.store.get(session["id"])
+        self.assertEqual((current["current_phase"], current["current_turn"]), (1, 0))
+        self.assertEqual(self.trigger.calls, ["claude", "codex", "gemini"])
+
+    def test_stale_advance_is_dropped_after_session_ends(self):
+        session = self.engine.start_session("code-review", "general", CAST, "ben")
+        self.say("claude")
+        self.engine.end_session(session["id"])
+        self.tick()
+        self.assertEqual(self.trigger.calls, ["claude"])
+        self.assertEqual(self.store.get(session["id"])["state"], "interrupted")
+
+    def test_scheduler_thread_runs_advances_without_timers(self):
+        engine = SessionEngine(self.store, FakeMessages(), self.trigger,
+                               FakeRegistry(CAST.values()), advance_delay=0.01)
+        engine.start()
+        self.addCleanup(engine.close)
+        session = engine.start_session("code-review", "dev", CAST, "ben")
+        threads_before = threading.active_count()
+        engine._messages.add("claude", "done", channel="dev")
+        deadline = time.monotonic() + 2
+        while self.store.get(session["id"])["current_phase"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.store.get(session["id"])["current_phase"], 1)
+        self.assertEqual(threading.active_count(), threads_before)
+
+
+class ParallelPhaseTests(SessionEngineTestCase):
+    def start_review(self, **phase_overrides):
+        tmpl = self.store.get_template("code-review")
+        tmpl["phases"][1].update(phase_overrides)
+        session = self.engine.start_session("code-review", "general", CAST, "ben")
+        self.say("claude")
+        self.tick()
+        return session
+
+    def test_all_participants_triggered_at_once_and_phase_waits_for_all(self):
+        session = self.start_review()
+        self.assertEqual(self.trigger.calls, ["claude", "codex", "gemini"])
+        self.assertEqual(self.engine.get_allowed_agents("general"), ["codex", "gemini"])
+
+        self.say("gemini")
+        self.say("gemini", "again")  # duplicate reply doesn't count twice
+        self.tick()
+        current = self.store.get(session["id"])
+        self.assertEqual((current["current_phase"], current["replied"]), (1, ["red_team"]))
+        self.assertEqual(self.engine.get_allowed_agents("general"), ["codex"])
+        self.assertEqual(self.engine.get_active("general")["replied_count"], 1)
+
+        self.say("codex")
+        self.tick()
+        current = self.store.get(session["id"])
+        self.assertEqual((current["current_phase"], current["replied"]), (2, []))
+        self.assertEqual(self.trigger.calls[-1], "claude")
+
+    def test_quorum_advances_before_everyone_replies(self):
+        session = self.start_review(quorum=1)
+        self.say("codex")
+        self.tick()
+        self.assertEqual(self.store.get(session["id"])["current_phase"], 2)
+
+    def test_timeout_moves_on_with_partial_replies(self):
+        session = self.start_review(timeout=30, timeout_action="skip")
+        self.say("codex")
+        self.tick(29)
+        self.assertEqual(self.store.get(session["id"])["current_phase"], 1)
+        self.tick(2)
+        self.assertEqual(self.store.get(session["id"])["current_phase"], 2)
+        self.assertIn("timed out (1/2 replied)", self.messages.added[-2]["text"])
+
+    def test_template_validation(self):
+        tmpl = {"name": "x", "roles": ["a", "b"], "phases": [
+            {"name": "p", "participants": ["a", "b"], "turn_order": "parallel",
+             "quorum": 2, "timeout": 60, "is_output": True}]}
+        self.assertEqual(validate_session_template(tmpl), [])
+        tmpl["phases"][0].update(quorum=3, timeout=0)
+        self.assertEqual(len(validate_session_template(tmpl)), 2)
+        tmpl["phases"][0].update(turn_order="random", quorum=None, timeout=None)
+        self.assertEqual(len(validate_session_template(tmpl)), 1)
+        for tid in ("code-review", "debate"):
+            self.assertEqual(validate_session_template(self.store.get_template(tid)), [])
+
+
+class TurnTimeoutTests(SessionEngineTestCase):
+    engine_kwargs = {"turn_timeout": 60}
+
+    def start(self, **submit_overrides):
+        self.store.get_template("code-review")["phases"][0].update(submit_overrides)
+        return self.engine.start_session("code-review", "general", CAST, "ben")
+
+    def test_retrigger_then_skip_when_retries_run_out(self):
+        session = self.start()
+        self.tick(61)
+        self.assertEqual(self.trigger.calls, ["claude", "claude"])
+        self.assertEqual(self.store.get(session["id"])["turn_retries"], 1)
+
+        self.tick(61)
+        current = self.store.get(session["id"])
+        self.assertEqual((current["current_phase"], current["turn_retries"]), (1, 0))
+        self.assertEqual(self.trigger.calls[2:], ["codex", "gemini"])
+        outcomes = [(e["agent"], e["outcome"]) for e in current["turn_log"]]
+        self.assertEqual(outcomes, [("claude", "timeout"), ("claude", "timeout")])
+
+    def test_substitute_hands_turn_to_another_cast_agent(self):
+        session = self.start(timeout_action="substitute")
+        self.tick(61)
+        current = self.store.get(session["id"])
+        self.assertEqual(current["cast"]["builder"], "codex")
+        self.assertEqual(current["substitutions"][0]["from"], "claude")
+        self.assertEqual(self.trigger.calls, ["claude", "codex"])
+
+        self.say("codex")
+        self.tick()
+        self.assertEqual(self.store.get(session["id"])["current_phase"], 1)
+
+    def test_end_action_interrupts_session(self):
+        session = self.start(timeout_action="end", timeout=5)
+        self.tick(6)
+        self.assertEqual(self.store.get(session["id"])["state"], "interrupted")
+        self.assertIsNone(self.engine.get_allowed_agents("general"))
+
+    def test_reply_in_same_batch_beats_timeout_and_logs_latency(self):
+        session = self.start()
+        self.clock.now += 59.9
+        self.say("claude")
+        self.tick(5)
+        current = self.store.get(session["id"])
+        self.assertEqual(current["current_phase"], 1)
+        self.assertEqual(self.trigger.calls, ["claude", "codex", "gemini"])
+        entry = current["turn_log"][0]
+        self.assertEqual((entry["agent"], entry["role"], entry["outcome"]), ("claude", "builder", "replied"))
+        self.assertGreaterEqual(entry["latency"], 0)
+        summary = self.engine.get_active("general")["agent_latency"]["claude"]
+        self.assertEqual((summary["replies"], summary["timeouts"]), (1, 0))
+
+    def test_timeout_due_while_paused_is_requeued(self):
+        session = self.start()
+        self.say("claude")
+        self.tick()  # parallel Review: codex and gemini triggered
+        self.say("ben", "hang on")
+        self.assertEqual(self.store.get(session["id"])["state"], "paused")
+
+        self.tick(61)
+        self.say("codex")  # auto-resumes, still waiting on gemini
+        self.assertEqual(self.engine.get_allowed_agents("general"), ["gemini"])
+        self.tick(61)
+        self.assertEqual(self.trigger.calls[-1], "gemini")
+        self.assertEqual(self.store.get(session["id"])["turn_retries"], 1)
+
+        self.tick(61)
+        current = self.store.get(session["id"])
+        self.assertEqual((current["current_phase"], current["state"]), (2, "waiting"))
+
+    def test_invalid_action_rejected(self):
+        with self.assertRaises(ValueError):
+            SessionEngine(self.store, FakeMessages(), self.trigger, timeout_action="wait")
+
+
+class SessionStoreIndexTests(SessionEngineTestCase):
+    def test_live_session_index_follows_state(self):
+        first = self.store.create("code-review", "general", CAST, "ben")
+        self.assertIsNone(self.store.create("debate", "general", {}, "ben"))
+        self.assertEqual(self.store.get_active("general")["id"], first["id"])
+
+        self.store.pause(first["id"])
+        self.assertEqual(self.store.get_active("general")["state"], "paused")
+        self.store.complete(first["id"])
+        self.assertIsNone(self.store.get_active("general"))
+
+        second = self.store.create("debate", "general", {}, "ben")
+        reloaded = SessionStore(str(Path(self.tmp.name) / "session_runs.json"),
+                                templates_dir=str(ROOT / "session_templates"))
+        self.assertEqual(reloaded.get_active("general")["id"], second["id"])
+        self.assertEqual(reloaded.get(first["id"])["state"], "complete")
+
+
+if __name__ == "__main__":
+    unittest.main()
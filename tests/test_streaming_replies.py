@@ -0,0 +1,125 @@
+"""Tests for streamed API-agent replies (placeholder + incremental updates)."""
+
+import asyncio
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import app
+from store import MessageStore
+
+
+class FakeRegistry:
+    def __init__(self, tokens):
+        self._tokens = tokens
+
+    def resolve_token(self, token):
+        name = self._tokens.get(token)
+        return {"name": name} if name else None
+
+
+class FakeRequest:
+    def __init__(self, body, token):
+        self._body = body
+        self.headers = {"authorization": f"Bearer {token}"}
+
+    async def json(self):
+        return self._body
+
+
+class StreamingReplyTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "messages.jsonl"
+        self.store = MessageStore(str(self.path))
+
+        saved = (app.store, app.registry)
+        app.store = self.store
+        app.registry = FakeRegistry({"tok-qwen": "qwen", "tok-other": "other"})
+
+        def restore():
+            app.store, app.registry = saved
+
+        self.addCleanup(restore)
+
+    def _call(self, coro):
+        response = asyncio.run(coro)
+        return response.status_code, json.loads(response.body.decode("utf-8"))
+
+    def _placeholder(self):
+        status, msg = self._call(app.api_send(FakeRequest({"text": "", "streaming": True}, "tok-qwen")))
+        self.assertEqual(status, 200)
+        return msg
+
+    def test_placeholder_is_flagged_and_partial_updates_stay_in_memory(self):
+        msg = self._placeholder()
+        self.assertTrue(msg["metadata"]["streaming"])
+
+        status, _ = self._call(app.api_stream_update(
+            msg["id"], FakeRequest({"text": "Hello wor"}, "tok-qwen")))
+        self.assertEqual(status, 200)
+        self.assertEqual(self.store.get_by_id(msg["id"])["text"], "Hello wor")
+        on_disk = [json.loads(line) for line in self.path.read_text("utf-8").splitlines()]
+        self.assertEqual(on_disk[0]["text"], "")
+
+    def test_done_finishes_placeholder_in_place(self):
+        msg = self._placeholder()
+        routed = []
+        self.store.on_message(routed.append)
+        status, final = self._call(app.api_stream_update(
+            msg["id"], FakeRequest({"text": "Hello world ", "done": True}, "tok-qwen")))
+
+        self.assertEqual(status, 200)
+        self.assertEqual((final["id"], final["text"]), (msg["id"], "Hello world"))
+        self.assertEqual(final["metadata"], {"streamed": True})
+        self.assertEqual(routed, [final])
+        self.assertEqual(self.store.streams_finished(), 1)
+        on_disk = [json.loads(line) for line in self.path.read_text("utf-8").splitlines()]
+        self.assertEqual(on_disk[-1], final)  # appended; replaces the placeholder on load
+        self.assertEqual(MessageStore(str(self.path)).get_recent(), [final])
+
+    def test_empty_reply_deletes_placeholder(self):
+        msg = self._placeholder()
+        status, _ = self._call(app.api_stream_update(
+            msg["id"], FakeRequest({"text": "  ", "done": True}, "tok-qwen")))
+        self.assertEqual(status, 200)
+        self.assertIsNone(self.store.get_by_id(msg["id"]))
+
+    def test_orphaned_placeholders_are_settled(self):
+        partial = self._placeholder()
+        self.store.update_message(partial["id"], {"text": "half a rep"}, persist=False)
+        empty = self._placeholder()
+        other = self.store.add("codex", "", metadata={"streaming": True})
+
+        finished, deleted = self.store.close_streams("qwen")
+        self.assertEqual([(m["id"], m["text"]) for m in finished], [(partial["id"], "half a rep")])
+        self.assertEqual(deleted, [empty["id"]])
+        self.assertTrue(self.store.get_by_id(other["id"])["metadata"]["streaming"])
+
+        # On restart nothing can still be streaming
+        reloaded = MessageStore(str(self.path))
+        reloaded.close_streams()
+        self.assertEqual([m["id"] for m in reloaded.get_recent()], [partial["id"]])
+
+    def test_only_the_sender_can_update(self):
+        msg = self._placeholder()
+        status, _ = self._call(app.api_stream_update(
+            msg["id"], FakeRequest({"text": "hijack"}, "tok-other")))
+        self.assertEqual(status, 403)
+
+    def test_regular_messages_cannot_be_streamed_into(self):
+        regular = self.store.add("qwen", "done already")
+        status, _ = self._call(app.api_stream_update(
+            regular["id"], FakeRequest({"text": "more"}, "tok-qwen")))
+        self.assertEqual(status, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
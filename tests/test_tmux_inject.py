@@ -0,0 +1,59 @@
+"""Tests for wrapper_unix.inject over the tmux control client."""
+
+import sys
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import wrapper_unix
+from wrapper_unix import TmuxControlClient
+
+
+class FakeControlClient(TmuxControlClient):
+    """A control client whose replies are scripted per command."""
+
+    def __init__(self, replies):
+        super().__init__("agent")
+        self.replies = list(replies)  # "ok", "error" or "timeout" per command
+        self.sent = []
+
+    def command_async(self, *args):
+        self.sent.append(args)
+        reply = self.replies.pop(0)
+        slot = [threading.Event(), reply == "ok", []]
+        if reply != "timeout":
+            slot[0].set()
+        return slot
+
+    def try_command(self, *args, timeout=2.0):
+        return super().try_command(*args, timeout=0.01)
+
+
+class InjectTests(unittest.TestCase):
+    def inject(self, client):
+        with mock.patch.object(wrapper_unix, "_ready_client", return_value=client), \
+                mock.patch.object(wrapper_unix.subprocess, "run") as run, \
+                mock.patch.object(wrapper_unix.time, "sleep"):
+            wrapper_unix.inject("hello", tmux_session="agent")
+        return [call.args[0][-1] for call in run.call_args_list]
+
+    def test_timeout_is_not_retried_with_a_forked_send_keys(self):
+        client = FakeControlClient(["timeout", "timeout"])
+        self.assertEqual(self.inject(client), [])
+        self.assertEqual([args[-1] for args in client.sent], ["hello", "Enter"])
+
+    def test_tmux_error_falls_back_to_send_keys(self):
+        client = FakeControlClient(["error", "ok"])
+        self.assertEqual(self.inject(client), ["hello"])
+
+    def test_no_client_uses_send_keys(self):
+        self.assertEqual(self.inject(None), ["hello", "Enter"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -391,11 +391,17 @@ def _auth_headers(token: str, *, include_json: bool = False) -> dict[str, str]:
 # Queue watcher
 # ---------------------------------------------------------------------------
 
-def _notify_recovery(data_dir: Path, agent_name: str):
-    """Write a flag file that the server picks up and broadcasts as a system message."""
+def _notify_recovery(server_port: int, agent_name: str, token: str):
+    """Tell the server we auto-recovered so it posts a system message."""
     try:
-        flag = data_dir / f"{agent_name}_recovered"
-        flag.write_text(agent_name, "utf-8")
+        import urllib.request
+        req = urllib.request.Request(
+            f"http://127.0.0.1:{server_port}/api/recovered/{agent_name}",
+            method="POST",
+            data=b"",
+            headers=_auth_headers(token),
+        )
+        urllib.request.urlopen(req, timeout=5).close()
     except Exception:
         pass
 
@@ -561,7 +567,7 @@ def main():
     import urllib.error
     import urllib.request
 
-    from config_loader import apply_cli_overrides, load_config
+    from config_loader import apply_cli_overrides, load_config, mcp_config
 
     # Apply AGENTCHATTR_* overrides (from CLI flags or env) BEFORE loading
     # config so the wrapper connects to the same data_dir/ports as a server
@@ -592,7 +598,7 @@ def main():
     data_dir = ROOT / config.get("server", {}).get("data_dir", "./data")
     data_dir.mkdir(parents=True, exist_ok=True)
     server_port = config.get("server", {}).get("port", 8300)
-    mcp_cfg = config.get("mcp", {})
+    mcp_cfg = mcp_config(config)
 
     try:
         registration = _register_instance(server_port, agent, args.label)
@@ -620,7 +626,7 @@ def main():
     needs_proxy = inject_mode in ("proxy_flag", "") or not inject_mode
 
     if needs_proxy:
-        from mcp_proxy import McpIdentityProxy
+        from mcp_proxy import McpIdentityProxy, ThreadedMcpIdentityProxy
 
         transport = inject_cfg.get("mcp_transport", "http")
         if transport == "sse":
@@ -630,13 +636,20 @@ def main():
             upstream_base = f"http://127.0.0.1:{mcp_cfg.get('http_port', 8200)}"
             proxy_path = "/mcp"
 
-        proxy = McpIdentityProxy(
+        proxy_args = dict(
             upstream_base=upstream_base,
             upstream_path=proxy_path,
             agent_name=assigned_name,
             instance_token=assigned_token,
         )
-        if proxy.start() is False:
+        proxy = McpIdentityProxy(**proxy_args)
+        try:
+            started = proxy.start()
+        except Exception as exc:
+            print(f"  Async MCP proxy failed ({exc}); using threaded proxy.")
+            proxy = ThreadedMcpIdentityProxy(**proxy_args)
+            started = proxy.start()
+        if started is False:
             print("  Failed to start MCP proxy.")
             sys.exit(1)
         proxy_url = f"{proxy.url}{proxy_path}"
@@ -763,7 +776,7 @@ def main():
                     try:
                         replacement = _register_instance(server_port, agent, args.label)
                         set_runtime_identity(replacement["name"], replacement["token"])
-                        _notify_recovery(data_dir, replacement["name"])
+                        _notify_recovery(server_port, replacement["name"], replacement["token"])
                     except Exception:
                         pass
                 time.sleep(5)
@@ -810,7 +823,7 @@ def main():
                 )
                 _watcher_thread.start()
                 current_name, _ = get_identity()
-                _notify_recovery(data_dir, current_name)
+                _notify_recovery(server_port, current_name, get_token())
 
     threading.Thread(target=_watcher_monitor, daemon=True).start()
 
@@ -825,7 +838,13 @@ def main():
         last_report_time = 0
         REPORT_INTERVAL = 3  # re-send state every 3s while active (keeps server lease fresh)
         while True:
-            time.sleep(1)
+            # Event-driven checkers (tmux control mode) can wake the loop the
+            # moment output arrives; everything else polls once a second.
+            waiter = getattr(_activity_checker, "wait", None)
+            if waiter and not last_active:
+                waiter(1)
+            else:
+                time.sleep(1)
             if not _activity_checker:
                 continue
             try:
@@ -12,9 +12,14 @@ How it works:
   1. Loads config (config.toml + config.local.toml).
   2. Registers with the chat server via POST /api/register.
   3. Starts a heartbeat thread (same pattern as wrapper.py).
-  4. Polls the queue file for @mentions.
-  5. On trigger: reads recent chat context, formats into OpenAI messages,
-     POSTs to the model's /v1/chat/completions, sends reply via POST /api/send.
+  4. Polls the queue file for @mentions and hands each triggered channel to
+     a worker pool (max_concurrency workers, one in-flight call per channel).
+  5. On trigger: pulls new chat messages into a per-channel rolling context,
+     formats it into OpenAI messages (stable prefix first, so the model
+     server's prefix cache hits), POSTs to /v1/chat/completions, and sends
+     the reply via POST /api/send.
+     With `stream = true` the reply is posted as a placeholder and filled in
+     as tokens arrive (POST /api/messages/{id}/stream).
   6. On exit: deregisters cleanly.
 """
 
@@ -24,11 +29,13 @@ import os
 import sys
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import urllib.error
 import urllib.request
 from pathlib import Path
 
 ROOT = Path(__file__).parent
+STREAM_UPDATE_INTERVAL = 0.5  # seconds between placeholder updates while streaming
 
 
 def _auth_headers(token: str, *, include_json: bool = False) -> dict[str, str]:
@@ -38,6 +45,86 @@ def _auth_headers(token: str, *, include_json: bool = False) -> dict[str, str]:
     return headers
 
 
+class ChannelContext:
+    """Rolling prompt history for one channel.
+
+    Each refresh fetches only messages newer than the last one seen
+    (since_id) instead of re-reading the window. read(since_id=, limit=)
+    returns (messages, epoch); the server bumps the epoch whenever stored
+    messages are deleted or rewritten, and the history is then re-seeded
+    so deleted messages and channel clears leave the prompt.
+    """
+
+    def __init__(self, max_messages: int, max_tokens: int):
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.history = []
+        self.last_id = None
+        self.streaming = set()  # placeholders still generating, filled in behind last_id
+        self.epoch = None
+
+    def _entry(self, msg):
+        sender = msg.get("sender", "")
+        text = msg.get("text", "")
+        # A single huge message can't eat the whole budget
+        max_chars = self.max_tokens * 4 // 2
+        if len(text) > max_chars:
+            text = text[:max_chars] + " [...truncated]"
+        content = f"{sender}: {text}"
+        return {"id": msg["id"], "sender": sender, "content": content,
+                "tokens": len(content) // 4 + 4}  # ~4 chars/token + per-message overhead
+
+    def _trim(self, history):
+        total = sum(e["tokens"] for e in history)
+        if len(history) <= self.max_messages and total <= self.max_tokens:
+            return history
+        # Over a limit — drop the oldest messages down to 3/4 of it in one go
+        # rather than one per call, so the kept prefix stays byte-identical
+        # (and cached by the model server) for the next several calls.
+        keep_count = max(1, self.max_messages * 3 // 4)
+        keep_tokens = self.max_tokens * 3 // 4
+        kept, used = [], 0
+        for entry in reversed(history):
+            if len(kept) >= keep_count or (kept and used + entry["tokens"] > keep_tokens):
+                break
+            kept.append(entry)
+            used += entry["tokens"]
+        kept.reverse()
+        return kept
+
+    def refresh(self, read):
+        if self.last_id is not None:
+            # Re-read from the oldest placeholder still generating: its
+            # reply is filled in place, behind last_id
+            since = min([self.last_id, *(i - 1 for i in self.streaming)])
+            fresh, epoch = read(since_id=since)
+            if epoch != self.epoch:
+                self.history, self.last_id, self.streaming = [], None, set()
+        if self.last_id is None:
+            fresh, epoch = read(limit=self.max_messages)
+        self.epoch = epoch
+        seen = set()
+        for msg in fresh:
+            seen.add(msg["id"])
+            held = msg["id"] in self.streaming
+            if not held and self.last_id is not None and msg["id"] <= self.last_id:
+                continue
+            self.last_id = max(msg["id"], self.last_id or 0)
+            # Hold half-generated streaming placeholders until they finish
+            if (msg.get("metadata") or {}).get("streaming"):
+                self.streaming.add(msg["id"])
+                continue
+            self.streaming.discard(msg["id"])
+            # Skip system notices
+            if msg.get("sender") == "system":
+                continue
+            self.history.append(self._entry(msg))
+        # Placeholders deleted after an empty reply
+        self.streaming &= seen
+        self.history = self._trim(self.history)
+        return self.history
+
+
 def main():
     from config_loader import apply_cli_overrides, load_config
     from wrapper import _register_instance
@@ -94,6 +181,10 @@ def main():
         if temperature > 2.0:
             temperature = 2.0
     context_messages = int(agent_cfg.get("context_messages", 20))
+    context_tokens = int(agent_cfg.get("context_tokens", 4000))  # history budget (~4 chars/token)
+    stream = bool(agent_cfg.get("stream", False))
+    # Match the model server's parallel slots (e.g. llama-server -np)
+    max_concurrency = max(1, int(agent_cfg.get("max_concurrency", 1)))
     system_prompt = agent_cfg.get("system_prompt",
         f"You are {agent_cfg.get('label', agent)}, a helpful AI assistant participating "
         "in a developer chat room. Keep responses concise and relevant. "
@@ -113,7 +204,7 @@ def main():
 
     # Thread-safe identity state (can change via heartbeat rename)
     _lock = threading.Lock()
-    _state = {"name": name, "token": token, "working": False}
+    _state = {"name": name, "token": token, "working": 0}  # in-flight triggers
 
     def get_name():
         with _lock:
@@ -132,11 +223,11 @@ def main():
 
     def set_working(val):
         with _lock:
-            _state["working"] = val
+            _state["working"] += 1 if val else -1
 
     def is_working():
         with _lock:
-            return _state["working"]
+            return _state["working"] > 0
 
     # Heartbeat thread — same pattern as wrapper.py
     def _heartbeat():
@@ -170,23 +261,9 @@ def main():
 
     threading.Thread(target=_heartbeat, daemon=True).start()
 
-    # Get this agent's role from server status
-    def get_my_role():
-        try:
-            req = urllib.request.Request(
-                f"http://127.0.0.1:{server_port}/api/status",
-                headers=_auth_headers(get_token()),
-            )
-            with urllib.request.urlopen(req, timeout=5) as resp:
-                status = json.loads(resp.read())
-            my_name = get_name()
-            info = status.get(my_name, {})
-            return info.get("role", "") if isinstance(info, dict) else ""
-        except Exception:
-            return ""
-
-    # Get online agents from server
-    def get_online_agents():
+    # One /api/status call per trigger gives both this agent's role and
+    # the online list
+    def get_room_status():
         try:
             req = urllib.request.Request(
                 f"http://127.0.0.1:{server_port}/api/status",
@@ -194,13 +271,15 @@ def main():
             )
             with urllib.request.urlopen(req, timeout=5) as resp:
                 status = json.loads(resp.read())
-            online = [n for n, info in status.items()
-                      if isinstance(info, dict) and info.get("available")]
-            return online
         except Exception:
-            return []
-
-    # Read recent messages from chat server
+            return "", []
+        info = status.get(get_name(), {})
+        role = info.get("role", "") if isinstance(info, dict) else ""
+        online = [n for n, info in status.items()
+                  if isinstance(info, dict) and info.get("available")]
+        return role, online
+
+    # Read recent messages from chat server, with the store's history epoch
     def read_messages(channel="general", since_id=0, limit=20):
         params = f"limit={limit}&channel={channel}"
         if since_id:
@@ -210,11 +289,14 @@ def main():
             headers=_auth_headers(get_token()),
         )
         with urllib.request.urlopen(req, timeout=10) as resp:
-            return json.loads(resp.read())
+            return json.loads(resp.read()), resp.headers.get("X-Message-Epoch")
 
     # Send message back to chat
-    def send_message(text, channel="general"):
-        body = json.dumps({"text": text, "channel": channel}).encode()
+    def send_message(text, channel="general", streaming=False):
+        payload = {"text": text, "channel": channel}
+        if streaming:
+            payload["streaming"] = True
+        body = json.dumps(payload).encode()
         req = urllib.request.Request(
             f"http://127.0.0.1:{server_port}/api/send",
             method="POST",
@@ -224,77 +306,165 @@ def main():
         with urllib.request.urlopen(req, timeout=10) as resp:
             return json.loads(resp.read())
 
-    # Call OpenAI-compatible chat completions API
-    def call_model(messages):
+    # Update a streaming placeholder with the text generated so far
+    def update_stream(msg_id, text, done=False):
+        body = json.dumps({"text": text, "done": done}).encode()
+        req = urllib.request.Request(
+            f"http://127.0.0.1:{server_port}/api/messages/{msg_id}/stream",
+            method="POST",
+            data=body,
+            headers=_auth_headers(get_token(), include_json=True),
+        )
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return json.loads(resp.read())
+
+    def _model_request(messages, streaming=False):
         url = f"{base_url}/chat/completions"
         payload = {"messages": messages}
         if model:
             payload["model"] = model
         if temperature is not None:
             payload["temperature"] = temperature
+        if streaming:
+            payload["stream"] = True
         body = json.dumps(payload).encode()
 
         headers = {"Content-Type": "application/json"}
         if api_key:
             headers["Authorization"] = f"Bearer {api_key}"
 
-        req = urllib.request.Request(url, method="POST", data=body, headers=headers)
+        return urllib.request.Request(url, method="POST", data=body, headers=headers)
+
+    # Call OpenAI-compatible chat completions API
+    def call_model(messages):
+        req = _model_request(messages)
         with urllib.request.urlopen(req, timeout=120) as resp:
             data = json.loads(resp.read())
         return data["choices"][0]["message"]["content"]
 
-    # Format chat messages into OpenAI format
-    def format_messages(chat_msgs):
+    # Streaming variant — yields content deltas from the SSE response
+    def call_model_stream(messages):
+        req = _model_request(messages, streaming=True)
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            for raw in resp:
+                line = raw.decode("utf-8", "replace").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                choices = chunk.get("choices") or []
+                if not choices:
+                    continue
+                content = (choices[0].get("delta") or {}).get("content")
+                if content:
+                    yield content
+
+    # Per-channel rolling context (see ChannelContext)
+    _contexts = {}
+    _contexts_lock = threading.Lock()
+
+    def refresh_context(channel):
+        with _contexts_lock:
+            ctx = _contexts.get(channel)
+            if ctx is None:
+                ctx = _contexts[channel] = ChannelContext(context_messages, context_tokens)
+        return ctx.refresh(lambda since_id=0, limit=20: read_messages(channel, since_id, limit))
+
+    # Format chat context into OpenAI messages. The stable parts come first
+    # (system prompt, then history oldest-first) so consecutive requests
+    # share a byte-identical prefix for llama.cpp/vLLM prefix caching; the
+    # volatile room state (online list, role) goes at the very end.
+    def format_messages(history, my_role="", online=()):
         my_name = get_name()
-
-        # Build dynamic system prompt with online status, role, and mention instructions
-        online = get_online_agents()
+        system = (f"{system_prompt} Your name in this chat is {my_name}. Do not "
+                  "prefix your messages with your own name. To mention another "
+                  "agent and trigger them to respond, use @name.")
+        messages = [{"role": "system", "content": system}]
+        for entry in history:
+            role = "assistant" if entry["sender"] == my_name else "user"
+            messages.append({"role": role, "content": entry["content"]})
+
+        notes = []
         others = [n for n in online if n != my_name]
-        parts = [system_prompt]
-        # Inject role if set
-        my_role = get_my_role()
-        if my_role:
-            parts.append(f"role: {my_role}")
         if others:
-            parts.append(f"Currently online: {', '.join(others)}.")
-            parts.append("To mention another agent and trigger them to respond, "
-                         "use @name (e.g. " + ", ".join(f"@{n}" for n in others[:3]) + ").")
-        parts.append(f"Your name in this chat is {my_name}. Do not prefix your "
-                     "messages with your own name.")
-
-        messages = [{"role": "system", "content": " ".join(parts)}]
-        for msg in chat_msgs:
-            sender = msg.get("sender", "")
-            text = msg.get("text", "")
-            if sender == "system":
-                continue
-            role = "assistant" if sender == my_name else "user"
-            messages.append({"role": role, "content": f"{sender}: {text}"})
+            notes.append(f"Currently online: {', '.join(others)}.")
+        if my_role:
+            notes.append(f"Your role: {my_role}.")
+        if notes:
+            note = "[" + " ".join(notes) + "]"
+            if messages[-1]["role"] == "user":
+                last = messages[-1]
+                messages[-1] = {"role": "user", "content": f"{last['content']}\n\n{note}"}
+            else:
+                messages.append({"role": "user", "content": note})
         return messages
 
+    # Strip self-prefix if the model echoes its own name
+    def strip_own_name(text, my_name):
+        prefixes = [f"{my_name}: ", f"{my_name}:"]
+        for prefix in prefixes:
+            if text.startswith(prefix):
+                return text[len(prefix):]
+        return text
+
+    # Stream a reply into a placeholder message; returns the final text
+    def stream_reply(messages, channel, my_name):
+        placeholder = send_message("", channel=channel, streaming=True)
+        msg_id = placeholder["id"]
+        text = ""
+        last_update = 0.0
+        sent = ""
+        try:
+            for delta in call_model_stream(messages):
+                text += delta
+                now = time.time()
+                if now - last_update >= STREAM_UPDATE_INTERVAL:
+                    partial = strip_own_name(text.lstrip(), my_name)
+                    if partial != sent:
+                        update_stream(msg_id, partial)
+                        sent = partial
+                    last_update = now
+        finally:
+            # Always finalize so the placeholder never lingers — on error
+            # whatever arrived so far is posted (or the draft is dropped).
+            # A failure here must not mask the model error being raised.
+            final = strip_own_name(text.strip(), my_name)
+            try:
+                update_stream(msg_id, final, done=True)
+            except Exception as e:
+                print(f"  Failed to finish streamed reply {msg_id}: {e}")
+        return final
+
     # Handle a trigger — read context, call model, respond
     def handle_trigger(channel="general"):
         my_name = get_name()
         set_working(True)
         try:
-            chat_msgs = read_messages(channel=channel, limit=context_messages)
-            if not chat_msgs:
+            history = refresh_context(channel)
+            if not history:
                 return
 
-            messages = format_messages(chat_msgs)
+            my_role, online = get_room_status()
+            messages = format_messages(history, my_role, online)
             print(f"  [{channel}] Calling model with {len(messages)} messages...")
 
+            if stream:
+                response = stream_reply(messages, channel, my_name)
+                if response:
+                    print(f"  [{channel}] Responded ({len(response)} chars, streamed)")
+                return
+
             response = call_model(messages)
             response = response.strip()
             if not response:
                 return
 
-            # Strip self-prefix if the model echoes its own name
-            prefixes = [f"{my_name}: ", f"{my_name}:"]
-            for prefix in prefixes:
-                if response.startswith(prefix):
-                    response = response[len(prefix):]
-                    break
+            response = strip_own_name(response, my_name)
 
             send_message(response, channel=channel)
             print(f"  [{channel}] Responded ({len(response)} chars)")
@@ -303,6 +473,32 @@ def main():
         finally:
             set_working(False)
 
+    # Trigger dispatch — channels run concurrently up to max_concurrency,
+    # but each channel has at most one model call in flight. A trigger that
+    # arrives mid-call is coalesced into one re-run after it finishes (the
+    # re-run re-reads context, so it sees every message that came in).
+    pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="trigger")
+    _flight_lock = threading.Lock()
+    _in_flight = set()
+    _rerun = set()
+
+    def _run_channel(channel):
+        while True:
+            handle_trigger(channel=channel)
+            with _flight_lock:
+                if channel not in _rerun:
+                    _in_flight.discard(channel)
+                    return
+                _rerun.discard(channel)
+
+    def dispatch_trigger(channel):
+        with _flight_lock:
+            if channel in _in_flight:
+                _rerun.add(channel)
+                return
+            _in_flight.add(channel)
+        pool.submit(_run_channel, channel)
+
     # Queue watcher — polls queue file for @mentions
     queue_file = data_dir / f"{name}_queue.jsonl"
     if queue_file.exists():
@@ -312,7 +508,7 @@ def main():
     print(f"  Model endpoint: {base_url}/chat/completions")
     if model:
         print(f"  Model: {model}")
-    print(f"  @{name} mentions trigger model calls")
+    print(f"  @{name} mentions trigger model calls (up to {max_concurrency} at once)")
     print(f"  Ctrl+C to stop\n")
 
     try:
@@ -340,7 +536,7 @@ def main():
                             channels_triggered.add("general")
 
                     for ch in channels_triggered:
-                        handle_trigger(channel=ch)
+                        dispatch_trigger(ch)
             except Exception:
                 pass
 
@@ -348,6 +544,7 @@ def main():
     except KeyboardInterrupt:
         print("\n  Shutting down...")
     finally:
+        pool.shutdown(wait=False, cancel_futures=True)
         try:
             n = get_name()
             t = get_token()
@@ -9,17 +9,27 @@ How it works:
   2. Queue watcher sends keystrokes via 'tmux send-keys'
   3. Wrapper attaches to the session so you see the full TUI
   4. Ctrl+B, D to detach (agent keeps running in background)
+  5. Activity is read from %output events on a tmux control-mode (-C) client
 """
 
 import shlex
 import shutil
 import subprocess
 import sys
+import threading
 import time
+from collections import deque
 
 
 def _session_exists(session_name: str) -> bool:
     """Return True while the tmux session is still alive."""
+    client = _ready_client(session_name)
+    if client is not None:
+        # Round-trip over the pipe: if the session died, tmux has already
+        # sent %exit and the command fails instead of answering stale.
+        # A failure (or slow reply) is confirmed the old way below.
+        if client.has_session():
+            return True
     result = subprocess.run(
         ["tmux", "has-session", "-t", session_name],
         capture_output=True,
@@ -40,30 +50,47 @@ def _check_tmux():
 
 
 def inject(text: str, *, tmux_session: str, delay: float = 0.3):
-    """Send text + Enter to a tmux session via send-keys."""
+    """Send text + Enter to a tmux session via send-keys.
+
+    Goes over the session's control client when connected (no fork, and
+    the text round-trip is recorded in client.last_inject_latency);
+    otherwise falls back to one `tmux send-keys` process per key press.
+    Only a missing client or a tmux error falls back: a reply that times
+    out may still have been delivered, so it is not retried.
+    """
     # Use -l to send text literally (avoids misinterpreting as key names),
     # then send Enter as a separate key press
-    subprocess.run(
-        ["tmux", "send-keys", "-t", tmux_session, "-l", text],
-        capture_output=True,
-    )
+    client = _ready_client(tmux_session, wait=1.0)
+    sent = False
+    if client is not None:
+        start = time.perf_counter()
+        sent = client.try_command("send-keys", "-t", tmux_session, "-l", text)[0]
+        if sent:
+            client.last_inject_latency = time.perf_counter() - start
+    if sent is False:
+        subprocess.run(
+            ["tmux", "send-keys", "-t", tmux_session, "-l", text],
+            capture_output=True,
+        )
     # Scale delay with text length so longer prompts get more processing time
     time.sleep(max(delay, len(text) * 0.001))
+    if client is not None and client.try_command("send-keys", "-t", tmux_session, "Enter")[0] is not False:
+        return
     subprocess.run(
         ["tmux", "send-keys", "-t", tmux_session, "Enter"],
         capture_output=True,
     )
 
 
-def get_activity_checker(session_name, trigger_flag=None):
-    """Return a callable that detects tmux pane output by hashing content."""
+def _capture_pane_checker(session_name):
+    """Return a callable that detects pane output by hashing capture-pane text.
+
+    Costs one tmux fork and a full-screen copy per call — only used when a
+    control-mode connection can't be established.
+    """
     last_hash = [None]
 
     def check():
-        # External trigger: queue watcher injected a message
-        if trigger_flag is not None and trigger_flag[0]:
-            trigger_flag[0] = False
-            return True
         try:
             result = subprocess.run(
                 ["tmux", "capture-pane", "-t", session_name, "-p"],
@@ -79,6 +106,270 @@ def get_activity_checker(session_name, trigger_flag=None):
     return check
 
 
+def _quote(arg: str) -> str:
+    """Quote one argument for a tmux command line (control-mode stdin)."""
+    out = ['"']
+    for ch in arg:
+        if ch in '\\"$':
+            out.append("\\" + ch)
+        elif ch == "\n":
+            out.append("\\n")
+        elif ch == "\r":
+            out.append("\\r")
+        elif ch == "\t":
+            out.append("\\t")
+        elif ord(ch) < 0x20 or ord(ch) == 0x7F:
+            out.append("\\%03o" % ord(ch))
+        else:
+            out.append(ch)
+    out.append('"')
+    return "".join(out)
+
+
+class TmuxControlClient:
+    """A persistent `tmux -C` client attached to one session.
+
+    One pipe carries everything the wrapper needs from tmux: `%output`
+    notifications for activity detection, and command round-trips
+    (send-keys, has-session, capture-pane) without a fork per call.
+    Commands are answered in order inside %begin/%end blocks; blocks with
+    flags=1 belong to commands we wrote, flags=0 to tmux's own attach.
+    """
+
+    def __init__(self, session_name: str):
+        self.session_name = session_name
+        self.output_event = threading.Event()
+        self.last_inject_latency = None  # seconds, text send-keys round-trip
+        self._proc = None
+        self._ready = False
+        self._write_lock = threading.Lock()
+        self._pending = deque()  # [event, ok, lines] per in-flight command
+
+    def start(self) -> bool:
+        try:
+            self._proc = subprocess.Popen(
+                ["tmux", "-C", "attach-session", "-t", self.session_name],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError:
+            return False
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        # Control clients default to 80x24 — don't let ours shrink the real
+        # terminal (ignore-size needs tmux 3.2+; older versions just reply %error).
+        self.command_async("refresh-client", "-f", "ignore-size")
+        return True
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    @property
+    def ready(self) -> bool:
+        """True once tmux has acknowledged the attach."""
+        return self._ready and self.alive
+
+    def command_async(self, *args):
+        """Write a command without waiting; returns its response slot or None."""
+        slot = [threading.Event(), False, []]
+        line = " ".join(_quote(a) if i else a for i, a in enumerate(args))
+        with self._write_lock:
+            if not self.alive:
+                return None
+            self._pending.append(slot)
+            try:
+                self._proc.stdin.write(line.encode() + b"\n")
+                self._proc.stdin.flush()
+            except (OSError, ValueError):
+                self._pending.remove(slot)
+                return None
+        return slot
+
+    def command(self, *args, timeout: float = 2.0):
+        """Run a tmux command over the pipe.
+
+        Returns its output lines, or None if tmux reported an error, the
+        client is gone, or no reply arrived within timeout.
+        """
+        return self.try_command(*args, timeout=timeout)[1]
+
+    def try_command(self, *args, timeout: float = 2.0):
+        """Like command(), but tells the failures apart.
+
+        Returns (True, lines) on success, (False, None) if tmux reported an
+        error or the client is gone, and (None, None) if no reply arrived
+        within timeout (tmux may still have run the command).
+        """
+        slot = self.command_async(*args)
+        if slot is None:
+            return False, None
+        if not slot[0].wait(timeout):
+            return None, None
+        return (True, slot[2]) if slot[1] else (False, None)
+
+    def has_session(self) -> bool:
+        return self.command("has-session", "-t", self.session_name) is not None
+
+    def capture(self):
+        """Return the visible pane text, or None."""
+        lines = self.command("capture-pane", "-p", "-t", self.session_name)
+        return None if lines is None else "\n".join(lines)
+
+    def wait_closed(self, timeout=None):
+        """Block until the client exits (session ended or server gone)."""
+        if self._proc is None:
+            return
+        try:
+            self._proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def _read_loop(self):
+        proc = self._proc
+        block = None  # (slot or None, lines) while inside %begin/%end
+        try:
+            for raw in proc.stdout:
+                line = raw.rstrip(b"\r\n")
+                if block is not None:
+                    if line.startswith((b"%end ", b"%error ")):
+                        slot, lines = block
+                        block = None
+                        if slot is not None:
+                            slot[1] = line.startswith(b"%end ")
+                            slot[2] = lines
+                            slot[0].set()
+                    else:
+                        block[1].append(line.decode("utf-8", "replace"))
+                elif line.startswith(b"%output ") or line.startswith(b"%extended-output "):
+                    self.output_event.set()
+                elif line.startswith(b"%begin "):
+                    self._ready = True
+                    ours = line.rsplit(b" ", 1)[-1] == b"1"
+                    slot = None
+                    if ours:
+                        with self._write_lock:
+                            slot = self._pending.popleft() if self._pending else None
+                    block = (slot, [])
+                elif line.startswith(b"%exit"):
+                    break
+                elif line.startswith(b"%session-changed"):
+                    self._ready = True
+        except (OSError, ValueError):
+            pass
+        self.close()
+        with self._write_lock:
+            pending, self._pending = list(self._pending), deque()
+        for slot in pending:
+            slot[0].set()
+
+    def close(self):
+        proc = self._proc
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+_clients: dict[str, TmuxControlClient] = {}
+_client_attempts: dict[str, float] = {}
+_clients_lock = threading.Lock()
+_RECONNECT_INTERVAL = 2.0
+
+
+def get_control_client(session_name: str):
+    """Return the live control client for a session, connecting if needed.
+
+    Shared by injection, liveness checks and the activity monitor so each
+    wrapper holds one pipe. Reconnects are rate-limited; returns None while
+    no client is connected.
+    """
+    with _clients_lock:
+        client = _clients.get(session_name)
+        if client is not None and client.alive:
+            return client
+        now = time.monotonic()
+        if now - _client_attempts.get(session_name, 0.0) < _RECONNECT_INTERVAL:
+            return None
+        _client_attempts[session_name] = now
+        client = TmuxControlClient(session_name)
+        if not client.start():
+            return None
+        _clients[session_name] = client
+        return client
+
+
+def _ready_client(session_name: str, wait: float = 0.0):
+    """Return a connected client that has finished attaching, or None."""
+    client = get_control_client(session_name)
+    if client is None:
+        return None
+    deadline = time.monotonic() + wait
+    while not client.ready:
+        if not client.alive or time.monotonic() >= deadline:
+            return None
+        time.sleep(0.02)
+    return client
+
+
+class ActivityMonitor:
+    """Detects agent activity from tmux `%output` events.
+
+    Callable with the same contract as the old capture-pane checker (True if
+    the pane produced output since the last call). `wait()` lets the monitor
+    loop block until output arrives instead of polling. Falls back to
+    capture-pane hashing while no control client is available (session
+    not created yet, or a tmux without control mode).
+    """
+
+    def __init__(self, session_name: str, trigger_flag=None):
+        self.session_name = session_name
+        self.trigger_flag = trigger_flag
+        self._client = None
+        self._fallback = _capture_pane_checker(session_name)
+
+    def __call__(self) -> bool:
+        # External trigger: queue watcher injected a message
+        if self.trigger_flag is not None and self.trigger_flag[0]:
+            self.trigger_flag[0] = False
+            return True
+        client = get_control_client(self.session_name)
+        self._client = client  # wait() blocks on this client's events
+        if client is None or not client.ready:
+            return self._fallback()
+        if client.output_event.is_set():
+            client.output_event.clear()
+            return True
+        return False
+
+    def wait(self, timeout: float) -> bool:
+        """Block until pane output arrives or timeout elapses."""
+        client = self._client
+        if client is None or not client.ready:
+            time.sleep(timeout)
+            return False
+        return client.output_event.wait(timeout)
+
+    def close(self):
+        with _clients_lock:
+            client = _clients.pop(self.session_name, None)
+            _client_attempts.pop(self.session_name, None)
+        if client is not None:
+            client.close()
+        self._client = None
+
+
+def get_activity_checker(session_name, trigger_flag=None):
+    """Return an activity checker for the agent's tmux session."""
+    return ActivityMonitor(session_name, trigger_flag=trigger_flag)
+
+
 def run_agent(
     command,
     extra_args,
@@ -157,7 +448,12 @@ def run_agent(
                 print(f"\n  Detached. {agent.capitalize()} still running in tmux.")
                 print(f"  Reattach: tmux attach -t {session_name}")
                 while _session_exists(session_name):
-                    time.sleep(1)
+                    client = get_control_client(session_name)
+                    if client is not None:
+                        # Control client exits with the session — no polling
+                        client.wait_closed()
+                    else:
+                        time.sleep(1)
                 break
 
             # Session gone — agent exited